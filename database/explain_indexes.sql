@@ -0,0 +1,105 @@
+-- Compares the plans and timings of the pipeline's, report's and dashboard's busiest queries
+-- on a synthetic million-row arrival table, before and after migrations/001.
+-- Everything happens in a scratch schema which is dropped at the end, so this can be run
+-- against the live database with: bash run_migration.sh explain_indexes.sql
+
+\set ON_ERROR_STOP on
+
+DROP SCHEMA IF EXISTS index_benchmark CASCADE;
+CREATE SCHEMA index_benchmark;
+SET search_path TO index_benchmark;
+
+CREATE TABLE station (
+    station_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    station_crs VARCHAR UNIQUE NOT NULL
+);
+
+CREATE TABLE service (
+    service_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    service_uid VARCHAR(6) UNIQUE NOT NULL
+);
+
+CREATE TABLE arrival (
+    arrival_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    arrival_date DATE,
+    scheduled_time TIME,
+    actual_time TIME,
+    platform_changed BOOLEAN,
+    location_cancelled BOOLEAN,
+    arrival_station_id INT,
+    service_id INT NOT NULL
+);
+
+CREATE TABLE incident (
+    incident_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    incident_start TIMESTAMP NOT NULL,
+    incident_end TIMESTAMP
+);
+
+CREATE TABLE service_assignment (
+    service_assignment_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    service_id INT NOT NULL,
+    incident_id INT NOT NULL
+);
+
+CREATE TABLE subscription (
+    subscription_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    station_id INT,
+    customer_id INT NOT NULL
+);
+
+SELECT setseed(0.42);
+
+-- 2,600 stations and 50,000 services
+INSERT INTO station (station_crs)
+SELECT 'S' || i FROM generate_series(1, 2600) AS i;
+
+INSERT INTO service (service_uid)
+SELECT 'Z' || LPAD(i::TEXT, 5, '0') FROM generate_series(1, 50000) AS i;
+
+-- 1,000,000 arrivals over the last 60 days in date order, as the pipeline inserts them:
+-- 16,667 a day, from 834 services calling at 20 stations each
+INSERT INTO arrival (arrival_date, scheduled_time, actual_time, platform_changed,
+                     location_cancelled, arrival_station_id, service_id)
+SELECT CURRENT_DATE - 59 + day,
+       TIME '05:00' + (stop_index / 20 % 1000) * INTERVAL '1 minute' + stop_index % 20 * INTERVAL '4 minutes',
+       CASE WHEN random() < 0.05 THEN NULL
+            ELSE TIME '05:00' + (stop_index / 20 % 1000) * INTERVAL '1 minute'
+                 + stop_index % 20 * INTERVAL '4 minutes' + FLOOR(random() * 10) * INTERVAL '1 minute' END,
+       random() < 0.05,
+       random() < 0.02,
+       (service_index * 7 + stop_index % 20 * 131) % 2600 + 1,
+       service_index % 50000 + 1
+FROM (SELECT i / 16667 AS day,
+             i % 16667 AS stop_index,
+             i / 16667 * 834 + i % 16667 / 20 AS service_index
+      FROM generate_series(0, 999999) AS i) AS synthetic;
+
+-- 2,000 incidents over the same days, the last 20 still open, each affecting 10 services
+INSERT INTO incident (incident_start, incident_end)
+SELECT CURRENT_DATE - 59 + i * INTERVAL '43 minutes',
+       CASE WHEN i > 1980 THEN NULL ELSE CURRENT_DATE - 59 + i * INTERVAL '43 minutes' + INTERVAL '3 hours' END
+FROM generate_series(1, 2000) AS i;
+
+INSERT INTO service_assignment (service_id, incident_id)
+SELECT FLOOR(random() * 50000)::INT + 1, i / 10 + 1
+FROM generate_series(0, 19999) AS i;
+
+INSERT INTO subscription (station_id, customer_id)
+SELECT FLOOR(random() * 2600)::INT + 1, i
+FROM generate_series(1, 5000) AS i;
+
+ANALYZE;
+
+\echo
+\echo '======== Before migrations/001 ========'
+\ir explain_queries.sql
+
+\ir migrations/001_arrival_natural_key_and_indexes.sql
+
+\echo
+\echo '======== After migrations/001 ========'
+\ir explain_queries.sql
+
+RESET search_path;
+DROP SCHEMA index_benchmark CASCADE;
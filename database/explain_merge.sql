@@ -0,0 +1,39 @@
+-- The arrival MERGE from metrics_pipeline/load.py, explained against the current arrival_staging.
+
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+MERGE INTO arrival AS A
+USING (SELECT ST.*, SV.service_id
+       FROM arrival_staging AS ST
+       JOIN service AS SV ON SV.service_uid = ST.service_uid) AS S
+ON A.arrival_date = S.arrival_date
+AND A.arrival_station_id = S.arrival_station_id
+AND A.service_id = S.service_id
+WHEN MATCHED AND (
+    A.scheduled_time IS DISTINCT FROM S.scheduled_time
+    OR
+    A.actual_time IS DISTINCT FROM S.actual_time
+    OR
+    A.platform_changed IS DISTINCT FROM S.platform_changed
+    OR
+    A.location_cancelled IS DISTINCT FROM S.location_cancelled)
+THEN
+    UPDATE SET
+        scheduled_time = S.scheduled_time,
+        actual_time = S.actual_time,
+        platform_changed = S.platform_changed,
+        location_cancelled = S.location_cancelled
+WHEN NOT MATCHED THEN
+    INSERT (arrival_date,
+            scheduled_time,
+            actual_time,
+            platform_changed,
+            location_cancelled,
+            arrival_station_id,
+            service_id)
+    VALUES (S.arrival_date,
+            S.scheduled_time,
+            S.actual_time,
+            S.platform_changed,
+            S.location_cancelled,
+            S.arrival_station_id,
+            S.service_id);
@@ -0,0 +1,72 @@
+-- The queries compared by explain_indexes.sql. The MERGEs run inside a rolled back transaction,
+-- so both passes see the same data.
+
+\echo
+\echo '-- Hourly arrival MERGE of a full day of arrivals (metrics_pipeline/load.py)'
+BEGIN;
+CREATE TEMPORARY TABLE arrival_staging ON COMMIT DROP AS
+SELECT A.arrival_date, A.scheduled_time, A.actual_time + INTERVAL '1 minute' AS actual_time,
+       A.platform_changed, A.location_cancelled, A.arrival_station_id, SV.service_uid
+FROM arrival AS A
+JOIN service AS SV USING (service_id)
+WHERE A.arrival_date = CURRENT_DATE;
+ANALYZE arrival_staging;
+\ir explain_merge.sql
+ROLLBACK;
+
+\echo
+\echo '-- Daemon poll MERGE of 200 changed arrivals (metrics_pipeline/daemon.py)'
+BEGIN;
+CREATE TEMPORARY TABLE arrival_staging ON COMMIT DROP AS
+SELECT A.arrival_date, A.scheduled_time, A.actual_time + INTERVAL '1 minute' AS actual_time,
+       A.platform_changed, A.location_cancelled, A.arrival_station_id, SV.service_uid
+FROM arrival AS A
+JOIN service AS SV USING (service_id)
+WHERE A.arrival_date = CURRENT_DATE
+LIMIT 200;
+ANALYZE arrival_staging;
+\ir explain_merge.sql
+ROLLBACK;
+
+\echo
+\echo '-- Services running today (report/metrics.py)'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT COUNT(DISTINCT service_id)
+FROM arrival
+WHERE arrival_date = CURRENT_DATE;
+
+\echo
+\echo '-- Arrivals per station over the last week (metrics_pipeline/scheduler.py)'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT arrival_station_id, COUNT(*)
+FROM arrival
+WHERE arrival_date >= CURRENT_DATE - 7
+GROUP BY arrival_station_id;
+
+\echo
+\echo '-- Services affected by an incident (incidents_pipeline/alert.py)'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT service.service_uid
+FROM incident
+JOIN service_assignment USING (incident_id)
+JOIN service USING (service_id)
+WHERE incident_id = 1990;
+
+\echo
+\echo '-- Users affected by active incidents (dashboard/incidents_page.py)'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT COUNT(DISTINCT sub.customer_id) AS users_affected,
+       COUNT(DISTINCT sub.station_id) AS stations_with_subscribers
+FROM incident AS i
+JOIN service_assignment AS sa
+    ON sa.incident_id = i.incident_id
+JOIN arrival AS a
+    ON a.service_id = sa.service_id
+JOIN subscription AS sub
+    ON sub.station_id = a.arrival_station_id
+WHERE i.incident_start <= NOW()
+  AND (i.incident_end IS NULL OR i.incident_end >= NOW())
+  AND (
+        (a.arrival_date + a.actual_time) >= NOW() - INTERVAL '24 hours'
+     OR (a.arrival_date + a.scheduled_time) >= NOW() - INTERVAL '24 hours'
+  );
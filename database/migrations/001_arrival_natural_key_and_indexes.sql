@@ -0,0 +1,41 @@
+-- Adds the indexes behind the hourly MERGE, the report's date filters and the incident joins.
+-- Run outside of a transaction, as CREATE INDEX CONCURRENTLY doesn't block the pipeline's writes.
+
+-- The arrival MERGE matched on its natural key without an index, so any duplicates left by
+-- overlapping loads are removed first, keeping the most recently inserted row.
+DELETE FROM arrival AS A
+USING arrival AS B
+WHERE A.arrival_date = B.arrival_date
+AND A.arrival_station_id = B.arrival_station_id
+AND A.service_id = B.service_id
+AND A.arrival_id < B.arrival_id;
+
+-- Matches the arrival MERGE's ON clause, and leads with arrival_date for single-day filters.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS arrival_natural_key
+ON arrival (arrival_date, arrival_station_id, service_id);
+
+-- Arrivals are inserted roughly in date order, so a BRIN index covers date ranges at a fraction
+-- of a btree's size.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS arrival_date_brin
+ON arrival USING BRIN (arrival_date);
+
+-- Joins from service_assignment, and cascading deletes from service.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS arrival_service_id
+ON arrival (service_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS service_assignment_incident_id
+ON service_assignment (incident_id, service_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS service_assignment_service_id
+ON service_assignment (service_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS subscription_station_id
+ON subscription (station_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS incident_period
+ON incident (incident_start, incident_end);
+
+ANALYZE arrival;
+ANALYZE service_assignment;
+ANALYZE subscription;
+ANALYZE incident;
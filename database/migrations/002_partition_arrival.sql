@@ -0,0 +1,75 @@
+-- Converts arrival into a table range-partitioned by month of arrival_date.
+-- Run after 001, in a quiet period: the rows are copied while arrival is locked, in one transaction.
+-- The old table is kept as arrival_unpartitioned until the new one has been checked,
+-- after which it can be dropped with: DROP TABLE arrival_unpartitioned;
+
+BEGIN;
+
+LOCK TABLE arrival IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE arrival RENAME TO arrival_unpartitioned;
+ALTER TABLE arrival_unpartitioned RENAME CONSTRAINT arrival_pkey TO arrival_unpartitioned_pkey;
+ALTER INDEX arrival_natural_key RENAME TO arrival_unpartitioned_natural_key;
+ALTER INDEX arrival_date_brin RENAME TO arrival_unpartitioned_date_brin;
+ALTER INDEX arrival_service_id RENAME TO arrival_unpartitioned_service_id;
+
+-- Identity columns aren't supported on partitioned tables before PostgreSQL 17,
+-- so arrival_id takes its default from a sequence carrying on from the old ids.
+CREATE SEQUENCE arrival_id_seq AS INT;
+
+SELECT setval('arrival_id_seq', COALESCE(MAX(arrival_id), 0) + 1, FALSE)
+FROM arrival_unpartitioned;
+
+-- Primary and unique keys of a partitioned table must include arrival_date.
+CREATE TABLE arrival (
+    arrival_id INT NOT NULL DEFAULT nextval('arrival_id_seq'),
+    arrival_date DATE NOT NULL,
+    scheduled_time TIME,
+    actual_time TIME,
+    platform_changed BOOLEAN,
+    location_cancelled BOOLEAN,
+    arrival_station_id INT,
+    service_id INT NOT NULL,
+    PRIMARY KEY (arrival_id, arrival_date),
+    FOREIGN KEY (arrival_station_id) REFERENCES station(station_id) ON DELETE CASCADE,
+    FOREIGN KEY (service_id) REFERENCES service(service_id) ON DELETE CASCADE
+) PARTITION BY RANGE (arrival_date);
+
+ALTER SEQUENCE arrival_id_seq OWNED BY arrival.arrival_id;
+
+-- A partition for every month with arrivals, up to two months ahead as the pipeline keeps them.
+DO $$
+DECLARE
+    partition_month DATE;
+BEGIN
+    FOR partition_month IN
+        SELECT generate_series(
+            DATE_TRUNC('month', COALESCE(MIN(arrival_date), CURRENT_DATE)),
+            DATE_TRUNC('month', GREATEST(MAX(arrival_date), CURRENT_DATE)) + INTERVAL '2 months',
+            INTERVAL '1 month')::DATE
+        FROM arrival_unpartitioned
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF arrival FOR VALUES FROM (%L) TO (%L);',
+                       'arrival_' || TO_CHAR(partition_month, 'YYYY_MM'), partition_month,
+                       (partition_month + INTERVAL '1 month')::DATE);
+    END LOOP;
+END $$;
+
+CREATE UNIQUE INDEX arrival_natural_key
+ON arrival (arrival_date, arrival_station_id, service_id);
+
+CREATE INDEX arrival_date_brin ON arrival USING BRIN (arrival_date);
+
+CREATE INDEX arrival_service_id ON arrival (service_id);
+
+-- Rows without an arrival_date can't be routed to a partition and stay in arrival_unpartitioned.
+INSERT INTO arrival (arrival_id, arrival_date, scheduled_time, actual_time, platform_changed,
+                     location_cancelled, arrival_station_id, service_id)
+SELECT arrival_id, arrival_date, scheduled_time, actual_time, platform_changed,
+       location_cancelled, arrival_station_id, service_id
+FROM arrival_unpartitioned
+WHERE arrival_date IS NOT NULL;
+
+COMMIT;
+
+ANALYZE arrival;
@@ -0,0 +1,23 @@
+-- Adds arrival_hourly, the rollup of arrivals by date, hour, station and operator which
+-- the pipeline keeps up to date as it loads. Fill it afterwards with: python3 rollup.py
+-- from the metrics_pipeline directory.
+
+CREATE TABLE IF NOT EXISTS arrival_hourly (
+    arrival_date DATE NOT NULL,
+    arrival_hour SMALLINT NOT NULL,
+    station_id INT NOT NULL,
+    operator_id INT,
+    arrivals INT NOT NULL,
+    cancelled INT NOT NULL,
+    reported INT NOT NULL,
+    delay_minutes FLOAT NOT NULL,
+    on_time INT NOT NULL,
+    delayed_1_to_4 INT NOT NULL,
+    delayed_5_to_14 INT NOT NULL,
+    delayed_15_to_29 INT NOT NULL,
+    delayed_30_plus INT NOT NULL,
+    FOREIGN KEY (station_id) REFERENCES station(station_id) ON DELETE CASCADE,
+    FOREIGN KEY (operator_id) REFERENCES operator(operator_id) ON DELETE CASCADE,
+    CONSTRAINT arrival_hourly_key
+        UNIQUE NULLS NOT DISTINCT (arrival_date, station_id, arrival_hour, operator_id)
+);
@@ -0,0 +1,3 @@
+source .env
+
+PGPASSWORD=${DB_PASSWORD} psql ${DB_NAME} -h ${DB_HOST} -p ${DB_PORT} -U ${DB_USERNAME} -v ON_ERROR_STOP=1 -f "$1"
@@ -2,12 +2,17 @@
 
 DROP TABLE IF EXISTS service_assignment CASCADE;
 DROP TABLE IF EXISTS incident CASCADE;
+DROP TABLE IF EXISTS arrival_hourly CASCADE;
 DROP TABLE IF EXISTS arrival CASCADE;
+DROP TABLE IF EXISTS arrival_unpartitioned CASCADE;
+DROP SCHEMA IF EXISTS arrival_archive CASCADE;
 DROP TABLE IF EXISTS service CASCADE;
 DROP TABLE IF EXISTS operator CASCADE;
 DROP TABLE IF EXISTS station CASCADE;
 DROP TABLE IF EXISTS customer CASCADE;
 DROP TABLE IF EXISTS subscription CASCADE;
+DROP TABLE IF EXISTS service_claim CASCADE;
+DROP TABLE IF EXISTS station_alias CASCADE;
 
 
 CREATE TABLE IF NOT EXISTS station (
@@ -18,6 +23,13 @@ CREATE TABLE IF NOT EXISTS station (
     station_crs VARCHAR UNIQUE NOT NULL
 );
 
+CREATE TABLE IF NOT EXISTS station_alias (
+    alias_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    alias_name VARCHAR UNIQUE NOT NULL,
+    station_id INT NOT NULL,
+    FOREIGN KEY (station_id) REFERENCES station(station_id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS operator (
     operator_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
     operator_name VARCHAR UNIQUE NOT NULL,
@@ -35,17 +47,48 @@ CREATE TABLE IF NOT EXISTS service (
     FOREIGN KEY (operator_id) REFERENCES operator(operator_id) ON DELETE CASCADE
 );
 
+-- Partitioned by month of arrival_date. The pipeline creates the partitions
+-- (metrics_pipeline/partitions.py), so arrival_id uses a sequence rather than
+-- an identity, which partitioned tables only support from PostgreSQL 17.
+CREATE SEQUENCE IF NOT EXISTS arrival_id_seq AS INT;
+
 CREATE TABLE IF NOT EXISTS arrival (
-    arrival_id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
-    arrival_date DATE,
+    arrival_id INT NOT NULL DEFAULT nextval('arrival_id_seq'),
+    arrival_date DATE NOT NULL,
     scheduled_time TIME,
     actual_time TIME,
     platform_changed BOOLEAN,
     location_cancelled BOOLEAN,
     arrival_station_id INT,
     service_id INT NOT NULL,
+    PRIMARY KEY (arrival_id, arrival_date),
     FOREIGN KEY (arrival_station_id) REFERENCES station(station_id) ON DELETE CASCADE,
     FOREIGN KEY (service_id) REFERENCES service(service_id) ON DELETE CASCADE
+) PARTITION BY RANGE (arrival_date);
+
+ALTER SEQUENCE arrival_id_seq OWNED BY arrival.arrival_id;
+
+-- Rollup of arrival by date, hour, station and operator, refreshed by each load
+-- (metrics_pipeline/rollup.py). delay_minutes sums the minutes late of arrivals which
+-- weren't cancelled, and reported counts those with both times.
+CREATE TABLE IF NOT EXISTS arrival_hourly (
+    arrival_date DATE NOT NULL,
+    arrival_hour SMALLINT NOT NULL,
+    station_id INT NOT NULL,
+    operator_id INT,
+    arrivals INT NOT NULL,
+    cancelled INT NOT NULL,
+    reported INT NOT NULL,
+    delay_minutes FLOAT NOT NULL,
+    on_time INT NOT NULL,
+    delayed_1_to_4 INT NOT NULL,
+    delayed_5_to_14 INT NOT NULL,
+    delayed_15_to_29 INT NOT NULL,
+    delayed_30_plus INT NOT NULL,
+    FOREIGN KEY (station_id) REFERENCES station(station_id) ON DELETE CASCADE,
+    FOREIGN KEY (operator_id) REFERENCES operator(operator_id) ON DELETE CASCADE,
+    CONSTRAINT arrival_hourly_key
+        UNIQUE NULLS NOT DISTINCT (arrival_date, station_id, arrival_hour, operator_id)
 );
 
 CREATE TABLE IF NOT EXISTS incident (
@@ -79,7 +122,39 @@ CREATE TABLE IF NOT EXISTS subscription (
     FOREIGN KEY (customer_id) REFERENCES customer(customer_id) ON DELETE CASCADE
 );
 
+CREATE TABLE IF NOT EXISTS service_claim (
+    service_uid VARCHAR(6) NOT NULL,
+    run_date DATE NOT NULL,
+    shard_index INT NOT NULL,
+    claimed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (service_uid, run_date)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS arrival_natural_key
+ON arrival (arrival_date, arrival_station_id, service_id);
+
+CREATE INDEX IF NOT EXISTS arrival_date_brin ON arrival USING BRIN (arrival_date);
+
+CREATE INDEX IF NOT EXISTS arrival_service_id ON arrival (service_id);
+
+CREATE INDEX IF NOT EXISTS service_assignment_incident_id
+ON service_assignment (incident_id, service_id);
+
+CREATE INDEX IF NOT EXISTS service_assignment_service_id ON service_assignment (service_id);
+
+CREATE INDEX IF NOT EXISTS subscription_station_id ON subscription (station_id);
+
+CREATE INDEX IF NOT EXISTS incident_period ON incident (incident_start, incident_end);
+
 \copy station(station_name, latitude, longitude, station_crs) from './crs.csv' WITH DELIMITER ',' CSV HEADER;
         
 \copy operator (operator_name, url) from './operators.csv' WITH DELIMITER ',' CSV HEADER;
 
+CREATE TEMPORARY TABLE station_alias_staging (alias_name VARCHAR, station_crs VARCHAR);
+
+\copy station_alias_staging (alias_name, station_crs) from './station_aliases.csv' WITH DELIMITER ',' CSV HEADER;
+
+INSERT INTO station_alias (alias_name, station_id)
+SELECT SAS.alias_name, S.station_id
+FROM station_alias_staging AS SAS
+JOIN station AS S ON S.station_crs = SAS.station_crs;
@@ -0,0 +1,191 @@
+"""Backfills the metrics for a range of past days, running the days in parallel processes."""
+
+import json
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from logging import getLogger, basicConfig, INFO
+from os import environ as ENV, _Environ, path, replace
+from time import perf_counter
+
+from dotenv import load_dotenv
+
+from extract import extract, get_session, get_max_workers
+from transform import transform, get_db_connection
+from load import load
+from network import DEFAULT_STATIONS
+from partitions import create_partitions, get_months, get_archived_days
+
+
+logger = getLogger(__name__)
+
+
+def get_days(start: date, end: date) -> list[date]:
+    """Returns every day from start to end inclusive."""
+
+    if end < start:
+        raise ValueError("The end date must not be before the start date.")
+
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def get_progress(progress_path: str) -> dict:
+    """Returns the days already backfilled, keyed by ISO date."""
+
+    if not path.exists(progress_path):
+        return {}
+
+    with open(progress_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_progress(progress_path: str, progress: dict) -> None:
+    """Saves the backfilled days, replacing the file in one step."""
+
+    with open(f"{progress_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(progress, f, indent=2)
+    replace(f"{progress_path}.tmp", progress_path)
+
+
+def get_pending_days(days: list[date], stations: list[str], progress: dict) -> list[date]:
+    """Returns the days which haven't yet been backfilled for all of the stations."""
+
+    return [day for day in days
+            if not set(stations) <= set(progress.get(day.isoformat(), {}).get("stations", []))]
+
+
+def get_incomplete_reason(result: dict) -> str | None:
+    """Returns why a backfilled day may be missing data, or None if it's complete.
+       Extract skips the stations and services it couldn't fetch, so a day
+       with failed requests or a station without arrivals is done again."""
+
+    if result["failures"]:
+        return f"{result['failures']} RTT requests failed"
+
+    if result["empty_stations"]:
+        return f"no arrivals at {', '.join(result['empty_stations'])}"
+
+    return None
+
+
+def backfill_day(config: dict, run_date: date, stations: list[str]) -> dict:
+    """Extracts, transforms and loads a single day. Runs in a worker process."""
+
+    basicConfig(level=INFO)
+
+    start = perf_counter()
+
+    conn = get_db_connection(config)
+    session = get_session(config, get_max_workers(config))
+
+    try:
+        extracted_data = extract(config, stations, run_date=run_date, session=session)
+        transformed_data = transform(config, extracted_data, conn)
+        load(config, conn, transformed_data)
+    finally:
+        session.close()
+        conn.close()
+
+    arrival_stations = {arrival.crs for arrival in extracted_data["arrivals"]}
+
+    return {
+        "stations": stations,
+        "services": len(extracted_data["services"]),
+        "arrivals": len(extracted_data["arrivals"]),
+        "failures": session.stats["failures"] + session.stats["rejected"],
+        "empty_stations": [crs for crs in stations if crs not in arrival_stations],
+        "seconds": round(perf_counter() - start, 2)
+    }
+
+
+def backfill(config: _Environ, days: list[date], stations: list[str],
+             processes: int, progress_path: str) -> None:
+    """Backfills the days which haven't been done yet, recording each one
+       as it completes so an interrupted backfill can be resumed."""
+
+    progress = get_progress(progress_path)
+    pending_days = get_pending_days(days, stations, progress)
+
+    logger.info(f"{len(days) - len(pending_days)} of {len(days)} days already backfilled")
+
+    # past months may predate the arrival partitions, so they're created before the workers load
+    if pending_days:
+        conn = get_db_connection(config)
+        try:
+            archived_days = get_archived_days(config, conn, pending_days)
+            pending_days = [day for day in pending_days if day not in archived_days]
+
+            created = (create_partitions(conn, get_months(min(pending_days), max(pending_days)))
+                       if pending_days else [])
+            conn.commit()
+        finally:
+            conn.close()
+
+        if archived_days:
+            logger.warning(f"Skipped {len(archived_days)} days in archived months, from "
+                           f"{min(archived_days)} to {max(archived_days)}. Reattach their "
+                           f"partitions or raise PARTITION_RETENTION_MONTHS to backfill them")
+        if created:
+            logger.info(f"Created arrival partitions: {', '.join(created)}")
+
+    # the RTT rate limit is shared between the worker processes
+    worker_config = dict(config)
+    worker_config["RTT_RATE_LIMIT"] = str(
+        float(config.get("RTT_RATE_LIMIT", 10)) / processes)
+
+    start = perf_counter()
+    total_services = 0
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(backfill_day, worker_config, day, stations): day
+                   for day in pending_days}
+
+        for future in as_completed(futures):
+            day = futures[future]
+
+            try:
+                result = future.result()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Failed to backfill {day}: {e}")
+                continue
+
+            # a partial day stays pending, so the next backfill tries it again
+            reason = get_incomplete_reason(result)
+            if reason:
+                logger.warning(f"Not recording {day} as backfilled: {reason}")
+                continue
+
+            progress[day.isoformat()] = result
+            save_progress(progress_path, progress)
+
+            total_services += result["services"]
+            logger.info(
+                f"Backfilled {day}: {result['services']} services in {result['seconds']}s "
+                f"({result['services'] / max(result['seconds'], 0.01):.1f} services/s)")
+
+    elapsed = perf_counter() - start
+    logger.info(
+        f"Backfilled {total_services} services in {elapsed:.1f}s "
+        f"({total_services / max(elapsed, 0.01):.1f} services/s)")
+
+
+if __name__ == "__main__":
+
+    load_dotenv()
+    basicConfig(level=INFO)
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--start", type=date.fromisoformat, required=True,
+                        help="First day to backfill (YYYY-MM-DD).")
+    parser.add_argument("--end", type=date.fromisoformat, required=True,
+                        help="Last day to backfill (YYYY-MM-DD).")
+    parser.add_argument("--stations", nargs="+", default=DEFAULT_STATIONS,
+                        help="Station crs codes to backfill.")
+    parser.add_argument("--processes", type=int, default=4,
+                        help="Number of days backfilled at once.")
+    parser.add_argument("--progress-file", default="backfill_progress.json",
+                        help="Where completed days are recorded for resuming.")
+    args = parser.parse_args()
+
+    backfill(ENV, get_days(args.start, args.end), args.stations,
+             args.processes, args.progress_file)
@@ -0,0 +1,122 @@
+"""Benchmarks the memory and CPU cost of turning RTT service responses into the
+arrivals DataFrame, comparing per-stop dicts with strptime against compact
+records with column-at-a-time parsing."""
+
+from argparse import ArgumentParser
+from datetime import datetime
+from time import process_time
+import tracemalloc
+
+import pandas as pd
+
+from extract import get_service_arrival_details
+from mock_rtt_server import get_synthetic_service_response
+from transform import parse_arrival_times
+
+
+STOPS_PER_SERVICE = 20
+
+
+class ReplayCache:
+    """Stands in for the service cache, handing back a prepared response."""
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+
+    def get(self, service_uid: str, run_date: str) -> dict:
+        """Returns the prepared response for the service."""
+
+        return self.responses[service_uid]
+
+
+def get_arrival_dicts(service: dict, response: dict) -> list[dict]:
+    """The original per-stop parsing, building a dict and three datetimes per stop."""
+
+    service_arrival_details = []
+
+    arrival_date = response["runDate"]
+
+    for arrival in response["locations"]:
+
+        if "crs" not in arrival:
+            continue
+
+        arrival_dict = {}
+        booked_arrival_time = arrival.get("gbttBookedArrival")
+        actual_arrival_time = arrival.get("realtimeArrival")
+        arrival_dict["crs"] = arrival["crs"]
+        if booked_arrival_time:
+            arrival_dict["scheduled_arr_time"] = datetime.strptime(
+                (booked_arrival_time), "%H%M")
+        else:
+            arrival_dict["scheduled_arr_time"] = None
+        if actual_arrival_time:
+            arrival_dict["actual_arr_time"] = datetime.strptime(
+                (actual_arrival_time), "%H%M")
+        else:
+            arrival_dict["actual_arr_time"] = None
+        arrival_dict["arrival_date"] = datetime.strptime(
+            arrival_date, "%Y-%m-%d")
+        arrival_dict["platform_changed"] = arrival.get(
+            "platformChanged", False)
+        arrival_dict["location_cancelled"] = bool(arrival.get("cancelReasonCode"))
+        arrival_dict["service_uid"] = service["service_uid"]
+
+        service_arrival_details.append(arrival_dict)
+
+    return service_arrival_details
+
+
+def measure(build) -> tuple[float, float, float]:
+    """Returns the CPU seconds, the MB held by the extracted arrivals
+       and the peak MB while building the DataFrame. CPU is timed on a
+       separate run, as tracing allocations slows everything down."""
+
+    start = process_time()
+    arrivals, to_dataframe = build()
+    to_dataframe(arrivals)
+    elapsed = process_time() - start
+
+    del arrivals
+    tracemalloc.start()
+
+    arrivals, to_dataframe = build()
+    held = tracemalloc.get_traced_memory()[0]
+    to_dataframe(arrivals)
+    peak = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.stop()
+
+    return elapsed, held / 2 ** 20, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--stops", type=int, default=100_000)
+    args = parser.parse_args()
+
+    services = [{"service_uid": f"Z{i:05d}"}
+                for i in range(args.stops // STOPS_PER_SERVICE)]
+    responses = {service["service_uid"]: get_synthetic_service_response(
+        service["service_uid"], STOPS_PER_SERVICE) for service in services}
+    cache = ReplayCache(responses)
+
+    def build_dicts():
+        arrivals = []
+        for service in services:
+            arrivals.extend(get_arrival_dicts(service, responses[service["service_uid"]]))
+        return arrivals, pd.DataFrame
+
+    def build_records():
+        arrivals = []
+        for service in services:
+            arrivals.extend(get_service_arrival_details(None, service, cache))
+        return arrivals, lambda records: parse_arrival_times(pd.DataFrame(records))
+
+    print(f"{'':>16} {'CPU s':>8} {'held MB':>8} {'peak MB':>8}")
+    for name, build in [("dicts+strptime", build_dicts), ("records+vector", build_records)]:
+        cpu, held, peak = measure(build)
+        per_100k = 100_000 / args.stops
+        print(f"{name:>16} {cpu * per_100k:>8.2f} {held * per_100k:>8.1f} {peak * per_100k:>8.1f}")
+    print("(all figures per 100k stops)")
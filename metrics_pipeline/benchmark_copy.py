@@ -0,0 +1,135 @@
+"""Benchmarks uploading the arrival staging data, comparing the original CSV
+written to a temp file against binary COPY streamed from memory. Without
+--database only the client side (encoding and reading the payload back) is
+timed. With it, both are COPYed into temporary tables on the .env database."""
+
+from argparse import ArgumentParser
+from os import environ as ENV, remove
+from time import perf_counter, process_time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from binary_copy import CopyStream
+from load import ARRIVAL_STAGING_COLUMNS
+
+
+CSV_PATH = "./benchmark_copy.csv"
+
+CREATE_TABLE = """CREATE TEMPORARY TABLE IF NOT EXISTS benchmark_staging (
+                  arrival_date DATE,
+                  scheduled_time TIME,
+                  actual_time TIME,
+                  platform_changed BOOLEAN,
+                  location_cancelled BOOLEAN,
+                  arrival_station_id INT,
+                  service_uid VARCHAR(6));"""
+
+COPY_COLUMNS = """(arrival_date, scheduled_time, actual_time, platform_changed,
+                   location_cancelled, arrival_station_id, service_uid)"""
+
+
+def get_arrival_df(rows: int) -> pd.DataFrame:
+    """Returns a staging-ready arrivals DataFrame with the given number of rows."""
+
+    rng = np.random.default_rng(0)
+    minutes = rng.integers(0, 1440, rows).astype("timedelta64[m]")
+    delays = rng.integers(0, 10, rows).astype("timedelta64[m]")
+    times = np.datetime64("1900-01-01") + minutes
+
+    actual = pd.Series(times + delays)
+    actual[rng.random(rows) < 0.3] = pd.NaT
+
+    return pd.DataFrame({
+        "arrival_date": pd.Series(np.datetime64("2026-02-12"), index=range(rows)),
+        "scheduled_arr_time": times,
+        "actual_arr_time": actual,
+        "platform_changed": pd.array(rng.random(rows) < 0.05, dtype="boolean"),
+        "location_cancelled": pd.array(rng.random(rows) < 0.02, dtype="boolean"),
+        "arrival_station_id": pd.array(rng.integers(1, 2600, rows), dtype="Int32"),
+        "service_uid": pd.Categorical.from_codes(
+            np.arange(rows) // 20, [f"Z{i:05d}" for i in range(rows // 20 + 1)])
+    })
+
+
+def upload_csv(df: pd.DataFrame, cur=None) -> int:
+    """The original path: CSV to a temp file, then re-opened for COPY."""
+
+    df.to_csv(CSV_PATH, index=False)
+
+    with open(CSV_PATH, "r", encoding="utf-8") as f:
+        if cur:
+            cur.copy_expert(f"COPY benchmark_staging {COPY_COLUMNS} FROM STDIN WITH CSV HEADER", f)
+            size = f.tell()
+        else:
+            size = len(f.read())
+
+    remove(CSV_PATH)
+
+    return size
+
+
+def upload_binary(df: pd.DataFrame, cur=None) -> int:
+    """The new path: binary COPY streamed from memory a chunk at a time."""
+
+    stream = CopyStream(df, ARRIVAL_STAGING_COLUMNS)
+
+    if cur:
+        cur.copy_expert(f"COPY benchmark_staging {COPY_COLUMNS} FROM STDIN WITH (FORMAT BINARY)",
+                        stream)
+        return 0
+
+    return sum(len(chunk) for chunk in iter(lambda: stream.read(2 ** 16), b""))
+
+
+def measure(upload, df: pd.DataFrame, cur=None) -> tuple[float, float, int, float]:
+    """Returns the wall seconds, CPU seconds, payload bytes and peak MB of an upload."""
+
+    if cur:
+        cur.execute("TRUNCATE benchmark_staging;")
+
+    start, cpu_start = perf_counter(), process_time()
+    size = upload(df, cur)
+    elapsed, cpu = perf_counter() - start, process_time() - cpu_start
+
+    tracemalloc.start()
+    upload(df)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, cpu, size, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--database", action="store_true",
+                        help="COPY into a temporary table on the .env database.")
+    args = parser.parse_args()
+
+    conn = None
+    cursor = None
+
+    if args.database:
+        load_dotenv()
+        # imported here so the client-side benchmark runs without database credentials
+        from transform import get_db_connection  # pylint: disable=import-outside-toplevel
+        conn = get_db_connection(ENV)
+        cursor = conn.cursor()
+        cursor.execute(CREATE_TABLE)
+
+    print(f"{'rows':>9} {'':>7} {'wall s':>8} {'CPU s':>8} {'payload MB':>11} {'peak MB':>8}")
+    for row_count in args.rows:
+        arrival_df = get_arrival_df(row_count)
+
+        for name, upload_function in [("csv", upload_csv), ("binary", upload_binary)]:
+            wall, cpu_seconds, payload, peak_mb = measure(upload_function, arrival_df, cursor)
+            payload_mb = f"{payload / 2 ** 20:>11.1f}" if payload else f"{'':>11}"
+            print(f"{row_count:>9} {name:>7} {wall:>8.3f} {cpu_seconds:>8.3f} "
+                  f"{payload_mb} {peak_mb:>8.1f}")
+
+    if conn:
+        conn.close()
@@ -0,0 +1,90 @@
+"""Benchmarks the memory and CPU cost of building the arrivals DataFrame and mapping
+its station and service ids, comparing object columns with dict lookups against
+compact dtypes with per-category lookups, at multiples of a normal run's rows."""
+
+from argparse import ArgumentParser
+from time import process_time
+import tracemalloc
+
+import pandas as pd
+
+from extract import ArrivalRecord
+from mock_rtt_server import SYNTHETIC_STATIONS
+from transform import get_arrival_frame, map_ids, parse_arrival_times
+
+
+# six stations of 40 services, each calling at 20 stops
+SERVICES_PER_RUN = 240
+STOPS_PER_SERVICE = 20
+
+
+def get_arrivals(scale: int) -> list[ArrivalRecord]:
+    """Returns the arrivals of scale normal runs."""
+
+    arrivals = []
+    for i in range(SERVICES_PER_RUN * scale):
+        for stop in range(STOPS_PER_SERVICE):
+            time = f"{10 + stop // 60:02d}{stop % 60:02d}"
+            arrivals.append(ArrivalRecord(
+                SYNTHETIC_STATIONS[stop % len(SYNTHETIC_STATIONS)], time,
+                time if stop % 3 else None, "2026-02-12", False, stop % 7 == 0,
+                f"Z{i:05d}"))
+    return arrivals
+
+
+def build_object_frame(arrivals: list[ArrivalRecord], station_ids: dict,
+                       service_ids: dict) -> pd.DataFrame:
+    """The original path: object columns, with ids looked up for every row."""
+
+    df = parse_arrival_times(pd.DataFrame(arrivals))
+    df["arrival_station_id"] = df["crs"].map(station_ids).astype("Int64")
+    df["service_id"] = df["service_uid"].map(service_ids).astype("Int64")
+    return df
+
+
+def build_compact_frame(arrivals: list[ArrivalRecord], station_ids: dict,
+                        service_ids: dict) -> pd.DataFrame:
+    """The compact path: categoricals and nullable dtypes, with ids looked up per category."""
+
+    df = get_arrival_frame(arrivals)
+    df["arrival_station_id"] = map_ids(df["crs"], station_ids)
+    df["service_id"] = map_ids(df["service_uid"], service_ids)
+    return df
+
+
+def measure(build, arrivals: list[ArrivalRecord], station_ids: dict,
+            service_ids: dict) -> tuple[float, float, float]:
+    """Returns the CPU seconds, the MB held by the finished DataFrame and the peak MB
+       while building it. CPU is timed on a separate run, as tracing slows it down."""
+
+    start = process_time()
+    df = build(arrivals, station_ids, service_ids)
+    elapsed = process_time() - start
+
+    held = df.memory_usage(deep=True).sum()
+    del df
+
+    tracemalloc.start()
+    build(arrivals, station_ids, service_ids)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, held / 2 ** 20, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    station_ids = {crs: i for i, crs in enumerate(SYNTHETIC_STATIONS, start=1)}
+
+    print(f"{'scale':>6} {'rows':>9} {'':>8} {'CPU s':>8} {'frame MB':>9} {'peak MB':>8}")
+    for scale in args.scales:
+        arrivals = get_arrivals(scale)
+        service_ids = {f"Z{i:05d}": i for i in range(SERVICES_PER_RUN * scale)}
+
+        for name, build in [("object", build_object_frame), ("compact", build_compact_frame)]:
+            cpu, held, peak = measure(build, arrivals, station_ids, service_ids)
+            print(f"{scale:>5}x {len(arrivals):>9} {name:>8} {cpu:>8.3f} {held:>9.1f} {peak:>8.1f}")
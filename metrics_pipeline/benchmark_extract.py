@@ -0,0 +1,109 @@
+"""Benchmarks extract() against the local stand-in RTT API, reporting wall-clock time,
+requests per second, p50/p99 request latency and peak RSS for each worker count."""
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from resource import getrusage, RUSAGE_SELF
+from shutil import rmtree
+from statistics import quantiles
+from tempfile import mkdtemp
+from time import perf_counter
+
+import extract as extract_module
+from mock_rtt_server import RecordedResponses, start_mock_rtt_server, SYNTHETIC_STATIONS
+
+
+def run_extract(api_url: str, stations: list[str], workers: int) -> dict:
+    """Runs extract() once in a fresh process with an empty cache,
+       timing every request it makes."""
+
+    extract_module.RTT_API_URL = api_url
+    latencies = []
+    get_session = extract_module.get_session
+
+    def get_timed_session(config, max_workers):
+        session = get_session(config, max_workers)
+        session.hooks["response"].append(
+            lambda response, *args, **kwargs: latencies.append(response.elapsed.total_seconds()))
+        return session
+
+    extract_module.get_session = get_timed_session
+
+    # an empty cache per run, so no run reads services an earlier one cached
+    cache_dir = mkdtemp(prefix="benchmark_extract_")
+    config = {"RTT_USER": "benchmark", "RTT_PASSWORD": "benchmark",
+              "RTT_RATE_LIMIT": "100000", "RTT_BURST": "100000",
+              "CACHE_DIR": cache_dir}
+
+    try:
+        start = perf_counter()
+        data = extract_module.extract(config, stations, max_workers=workers)
+        elapsed = perf_counter() - start
+    finally:
+        rmtree(cache_dir, ignore_errors=True)
+
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+
+    return {
+        "services": len(data["services"]),
+        "arrivals": len(data["arrivals"]),
+        "seconds": elapsed,
+        "requests": len(latencies),
+        "p50": cuts[49],
+        "p99": cuts[98],
+        "peak_rss_mb": getrusage(RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def run_benchmark(worker_counts: list[int], responses: RecordedResponses, stations: list[str],
+                  latency: float, jitter: float, error_rate: float) -> None:
+    """Runs extract() for each worker count against the stand-in API and prints the results."""
+
+    server, url, _ = start_mock_rtt_server(responses, latency, jitter, error_rate)
+    api_url = f"{url}/api/v1/json"
+
+    baseline = None
+
+    print(f"{'workers':>8} {'services':>9} {'arrivals':>9} {'seconds':>8} {'speedup':>8} "
+          f"{'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8}")
+
+    for workers in worker_counts:
+        # a fresh process per run so the peak RSS belongs to that run alone
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(run_extract, api_url, stations, workers).result()
+
+        if baseline is None:
+            baseline = result["seconds"]
+
+        print(f"{workers:>8} {result['services']:>9} {result['arrivals']:>9} "
+              f"{result['seconds']:>8.2f} {baseline / result['seconds']:>7.1f}x "
+              f"{result['requests'] / result['seconds']:>8.1f} "
+              f"{result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+              f"{result['peak_rss_mb']:>8.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--recordings", default=None,
+                        help="Directory of recorded responses. Generated responses are used otherwise.")
+    parser.add_argument("--stations", nargs="+", default=SYNTHETIC_STATIONS)
+    parser.add_argument("--scale", type=int, default=1,
+                        help="How many copies of each searched service to serve.")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds the stand-in API waits before each response.")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--services", type=int, default=40,
+                        help="Generated services per station search.")
+    parser.add_argument("--stops", type=int, default=20,
+                        help="Generated stops per service.")
+    args = parser.parse_args()
+
+    run_benchmark(args.workers,
+                  RecordedResponses(args.recordings, args.scale, args.services, args.stops),
+                  args.stations, args.latency, args.jitter, args.error_rate)
@@ -0,0 +1,104 @@
+"""Benchmarks parsing search responses whole with .json() against streaming them
+through ijson and keeping only the projected fields, comparing parse time and peak memory."""
+
+import json
+from argparse import ArgumentParser
+from glob import glob
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import tracemalloc
+
+from extract import get_projected_services
+
+
+def get_synthetic_service(i: int) -> dict:
+    """Returns a searched service shaped like a real RTT one."""
+
+    return {
+        "locationDetail": {
+            "realtimeActivated": True, "tiploc": "KNGX", "crs": "KGX",
+            "description": "London Kings Cross",
+            "gbttBookedArrival": "1049", "gbttBookedDeparture": "1051",
+            "origin": [{"tiploc": "EDINBUR", "description": "Edinburgh",
+                        "workingTime": "092600", "publicTime": "0926"}],
+            "destination": [{"tiploc": "KNGX", "description": "London Kings Cross",
+                             "workingTime": "105500", "publicTime": "1055"}],
+            "isCall": True, "isPublicCall": True,
+            "realtimeArrival": "1052", "realtimeArrivalActual": False,
+            "realtimeDeparture": "1054", "realtimeDepartureActual": False,
+            "platform": "3", "platformConfirmed": False, "platformChanged": False,
+            "displayAs": "CALL"
+        },
+        "serviceUid": f"Z{i:05d}", "runDate": "2026-02-12",
+        "trainIdentity": "1E23", "runningIdentity": "1E23",
+        "atocCode": "GR", "atocName": "LNER", "serviceType": "train", "isPassenger": True
+    }
+
+
+def parse_whole(payload_path: str) -> list[dict]:
+    """Reads and parses the whole payload, as session.get().json() does, then projects it."""
+
+    with open(payload_path, "rb") as f:
+        response = json.loads(f.read())
+
+    return [{
+        "service_uid": service["serviceUid"],
+        "origin_station": service["locationDetail"]["origin"][0]["description"],
+        "destination_station": service["locationDetail"]["destination"][0]["description"],
+        "operator_name": service["atocName"]
+    } for service in response.get("services") or []]
+
+
+def parse_streamed(payload_path: str) -> list[dict]:
+    """Streams the payload through ijson, keeping only the projected fields."""
+
+    with open(payload_path, "rb") as f:
+        return list(get_projected_services(f))
+
+
+def measure(parse, payload_path: str) -> tuple[float, float]:
+    """Returns the seconds taken and the peak MB allocated while parsing."""
+
+    start = perf_counter()
+    parse(payload_path)
+    elapsed = perf_counter() - start
+
+    tracemalloc.start()
+    parse(payload_path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak / 2 ** 20
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--recordings", default=None,
+                        help="Directory of recorded responses, using its search/*.json payloads.")
+    parser.add_argument("--services", type=int, default=5000,
+                        help="Services in the generated payload if there are no recordings.")
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        if args.recordings:
+            payload_paths = sorted(glob(path.join(args.recordings, "search", "*.json")))
+        else:
+            payload_paths = [path.join(directory, "synthetic.json")]
+            with open(payload_paths[0], "w", encoding="utf-8") as f:
+                json.dump({"location": {"crs": "KGX"},
+                           "services": [get_synthetic_service(i) for i in range(args.services)]}, f)
+
+        print(f"{'payload':>16} {'KB':>8} {'whole ms':>9} {'stream ms':>10} "
+              f"{'whole MB':>9} {'stream MB':>10}")
+
+        for payload_path in payload_paths:
+            assert parse_whole(payload_path) == parse_streamed(payload_path)
+
+            whole_time, whole_peak = measure(parse_whole, payload_path)
+            stream_time, stream_peak = measure(parse_streamed, payload_path)
+
+            print(f"{path.basename(payload_path):>16} {path.getsize(payload_path) / 1024:>8.0f} "
+                  f"{whole_time * 1000:>9.1f} {stream_time * 1000:>10.1f} "
+                  f"{whole_peak:>9.2f} {stream_peak:>10.2f}")
@@ -0,0 +1,64 @@
+"""Benchmarks station name lookups through the registry against the original crs.json scan."""
+
+import json
+from argparse import ArgumentParser
+from time import perf_counter
+
+from station_registry import get_station_registry, CRS_FILE
+
+
+QUERIES = ["London Bridge", "Sheffield", "Kings Cross", "Walthamstow",
+           "Liverpool Street", "Kew", "Yetminster", "Nowhere"]
+
+
+def get_crs_linear(station_name: str) -> str:
+    """The original get_crs, which re-reads crs.json and scans every station per call."""
+
+    with open(CRS_FILE, "r", encoding="utf-8") as f:
+        crs_data = json.load(f)
+
+    crs_matches = []
+
+    for station in crs_data:
+        if station_name.title() in station["name"]:
+            crs_matches.append(station["crs"])
+
+    if len(crs_matches) == 1:
+        return crs_matches[0]
+    if len(crs_matches) > 1:
+        raise ValueError(
+            f"'{station_name.title()}' matches with more than 1 station: {crs_matches}")
+    raise ValueError(
+        f"'{station_name.title()}' does not match any existing station"
+    )
+
+
+def get_lookups_per_second(lookup, lookups: int) -> float:
+    """Returns how many lookups per second the function manages over the query set."""
+
+    start = perf_counter()
+
+    for i in range(lookups):
+        try:
+            lookup(QUERIES[i % len(QUERIES)])
+        except ValueError:
+            pass
+
+    return lookups / (perf_counter() - start)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    start = perf_counter()
+    registry = get_station_registry()
+    print(f"Registry built in {(perf_counter() - start) * 1000:.1f}ms")
+
+    linear = get_lookups_per_second(get_crs_linear, args.lookups)
+    indexed = get_lookups_per_second(registry.get_crs, args.lookups)
+
+    print(f"{'linear scan':>12}: {linear:>12,.0f} lookups/s")
+    print(f"{'registry':>12}: {indexed:>12,.0f} lookups/s ({indexed / linear:,.0f}x)")
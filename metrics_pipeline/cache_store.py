@@ -0,0 +1,110 @@
+"""Key/value stores used by the pipeline to keep data between runs,
+either in a local directory or in an S3 bucket."""
+
+from os import environ as ENV, _Environ, makedirs, path, replace, walk
+
+from boto3 import client
+from botocore.exceptions import ClientError
+
+
+class LocalCacheStore:
+    """Stores each key as a file under a local directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def get_path(self, key: str) -> str:
+        """Returns the file path for a key."""
+
+        return path.join(self.directory, *key.split("/"))
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the bytes stored under the key, or None if there aren't any."""
+
+        try:
+            with open(self.get_path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def list_keys(self, prefix: str) -> list[str]:
+        """Returns the keys stored under the prefix."""
+
+        keys = []
+
+        for directory, _, file_names in walk(self.get_path(prefix)):
+            keys.extend(
+                path.relpath(path.join(directory, file_name), self.directory).replace(path.sep, "/")
+                for file_name in file_names if not file_name.endswith(".tmp"))
+
+        return keys
+
+    def put(self, key: str, value: bytes) -> None:
+        """Stores the bytes under the key, replacing anything already there."""
+
+        file_path = self.get_path(key)
+        makedirs(path.dirname(file_path), exist_ok=True)
+
+        # write then rename so a reader never sees a half written file
+        with open(f"{file_path}.tmp", "wb") as f:
+            f.write(value)
+        replace(f"{file_path}.tmp", file_path)
+
+
+class S3CacheStore:
+    """Stores each key as an object under a prefix in an S3 bucket."""
+
+    def __init__(self, s3_client: client, bucket: str, prefix: str = "metrics-cache"):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the bytes stored under the key, or None if there aren't any."""
+
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket, Key=f"{self.prefix}/{key}")
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+
+        return response["Body"].read()
+
+    def list_keys(self, prefix: str) -> list[str]:
+        """Returns the keys stored under the prefix, a page of up to 1000 per request."""
+
+        keys = []
+        pages = self.s3_client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=f"{self.prefix}/{prefix}/")
+
+        for page in pages:
+            keys.extend(item["Key"][len(self.prefix) + 1:] for item in page.get("Contents", []))
+
+        return keys
+
+    def put(self, key: str, value: bytes) -> None:
+        """Stores the bytes under the key, replacing anything already there."""
+
+        self.s3_client.put_object(
+            Bucket=self.bucket, Key=f"{self.prefix}/{key}", Body=value)
+
+
+def get_cache_dir() -> str:
+    """Returns the local cache directory depending on where
+    this function is being ran (Lambda/local)."""
+
+    if ENV.get("AWS_LAMBDA_FUNCTION_NAME"):
+        return "/tmp/metrics_cache"
+    return "./metrics_cache"
+
+
+def get_cache_store(config: _Environ) -> LocalCacheStore | S3CacheStore:
+    """Returns an S3 store if CACHE_BUCKET is set, otherwise a local directory store."""
+
+    if config.get("CACHE_BUCKET"):
+        return S3CacheStore(client("s3"), config["CACHE_BUCKET"],
+                            config.get("CACHE_PREFIX", "metrics-cache"))
+
+    return LocalCacheStore(config.get("CACHE_DIR", get_cache_dir()))
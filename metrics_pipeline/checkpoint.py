@@ -0,0 +1,113 @@
+"""Checkpoints for runs which stop extracting before the Lambda times out,
+so the next invocation resumes where the last one stopped."""
+
+import json
+from datetime import date
+from logging import getLogger
+from os import _Environ
+from typing import Callable
+from zlib import crc32
+
+from cache_store import LocalCacheStore, S3CacheStore
+
+
+logger = getLogger(__name__)
+
+DEFAULT_DEADLINE_RESERVE_SECONDS = 60
+
+
+def get_stations_digest(station_crs_list: list[str]) -> int:
+    """Returns a digest of the station list, so a checkpoint is only
+       resumed by a run covering the same stations."""
+
+    return crc32(",".join(station_crs_list).encode("utf-8"))
+
+
+def get_deadline_check(config: _Environ, context) -> Callable[[], bool] | None:
+    """Returns a check which is true once the Lambda has less than
+       DEADLINE_RESERVE_SECONDS left, or None when not running on Lambda."""
+
+    if not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+
+    reserve_ms = float(config.get("DEADLINE_RESERVE_SECONDS",
+                                  DEFAULT_DEADLINE_RESERVE_SECONDS)) * 1000
+
+    if reserve_ms < 0:
+        raise ValueError("DEADLINE_RESERVE_SECONDS must not be negative.")
+
+    return lambda: context.get_remaining_time_in_millis() < reserve_ms
+
+
+class ExtractCheckpoint:
+    """Where an interrupted extract stopped: the index of the next station to
+       search, the services found but not yet extracted, and the services
+       already extracted. Changes are only stored once the run has loaded them."""
+
+    def __init__(self, store: LocalCacheStore | S3CacheStore,
+                 run_date: date = None, name: str = "shard-0"):
+        self.store = store
+        self.run_date = (run_date or date.today()).isoformat()
+        self.key = f"checkpoints/{name}.json"
+
+        content = store.get(self.key)
+        self.saved = json.loads(content) if content else {}
+        self.state = {}
+
+    def get_resume_point(self, station_crs_list: list[str]) -> tuple[int, list[dict], set[str]]:
+        """Returns the station cursor, pending services and seen service UIDs
+           to resume from, or a fresh start if there's no matching checkpoint."""
+
+        if not self.saved or self.saved["run_date"] != self.run_date or \
+                self.saved["stations_digest"] != get_stations_digest(station_crs_list):
+            return 0, [], set()
+
+        logger.info(f"Resuming from station {self.saved['station_cursor']} of "
+                    f"{len(station_crs_list)} with "
+                    f"{len(self.saved['pending_services'])} pending services")
+
+        return (self.saved["station_cursor"], self.saved["pending_services"],
+                set(self.saved["seen_service_uids"]))
+
+    def stop_at(self, station_crs_list: list[str], station_cursor: int,
+                pending_services: list[dict], seen_service_uids: set[str]) -> None:
+        """Records where extraction stopped, to be stored once the run has loaded."""
+
+        self.state = {
+            "run_date": self.run_date,
+            "stations_digest": get_stations_digest(station_crs_list),
+            "station_cursor": station_cursor,
+            "pending_services": pending_services,
+            "seen_service_uids": sorted(seen_service_uids)
+        }
+
+        logger.warning(f"Stopped extracting before station {station_cursor} of "
+                       f"{len(station_crs_list)} with {len(pending_services)} "
+                       f"services still pending")
+
+    @property
+    def stopped(self) -> bool:
+        """Whether this run stopped before extracting every station."""
+
+        return bool(self.state)
+
+    def get_completed_stations(self, station_crs_list: list[str]) -> list[str]:
+        """Returns the stations whose services were all extracted before this run
+           stopped, or every station if it didn't stop."""
+
+        if not self.state:
+            return list(station_crs_list)
+
+        # the station before the cursor is unfinished while it has services pending
+        completed = self.state["station_cursor"] - bool(self.state["pending_services"])
+
+        return station_crs_list[:completed]
+
+    def save(self) -> None:
+        """Stores where this run stopped, or clears the checkpoint if it finished."""
+
+        if not self.state and not self.saved:
+            return
+
+        self.store.put(self.key, json.dumps(self.state).encode("utf-8"))
+        self.saved = self.state
@@ -4,6 +4,19 @@
 
 import pytest
 
+from station_registry import get_station_registry
+from dimension_cache import get_dimension_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_station_registry():
+    get_station_registry.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_dimension_cache():
+    get_dimension_cache.cache_clear()
+
 
 @pytest.fixture
 def test_mock_crs_file():
@@ -0,0 +1,82 @@
+"""Per-station coverage stats for full-day search paging, comparing the services
+seen in a run against the most seen at that station on recent days."""
+
+import json
+from datetime import date
+from logging import getLogger
+from threading import Lock
+
+from cache_store import LocalCacheStore, S3CacheStore
+
+
+logger = getLogger(__name__)
+
+HISTORY_DAYS = 7
+
+
+def get_window_starts(window_minutes: int) -> list[str]:
+    """Returns the HHMM start time of every search window in a day."""
+
+    if not 0 < window_minutes <= 1440:
+        raise ValueError("SEARCH_WINDOW_MINUTES must be between 1 and 1440.")
+
+    return [f"{minutes // 60:02d}{minutes % 60:02d}"
+            for minutes in range(0, 1440, window_minutes)]
+
+
+class StationCoverage:
+    """Records how many services each station's search windows returned,
+       keeping a short history so the expected count can be estimated."""
+
+    def __init__(self, store: LocalCacheStore | S3CacheStore):
+        self.store = store
+        self.stats = {}
+        self.lock = Lock()
+
+    def get_history(self, station_crs: str) -> dict:
+        """Returns the unique services seen at the station on recent days, keyed by ISO date."""
+
+        content = self.store.get(f"coverage/{station_crs}.json")
+
+        return json.loads(content) if content else {}
+
+    def record(self, station_crs: str, run_date: date, windows: int,
+               services_seen: int, unique_services: int) -> dict:
+        """Records and returns the coverage of a station for the run."""
+
+        history = self.get_history(station_crs)
+        previous = [count for day, count in history.items()
+                    if day != run_date.isoformat()]
+        expected = max(previous) if previous else None
+
+        history[run_date.isoformat()] = max(
+            unique_services, history.get(run_date.isoformat(), 0))
+        history = dict(sorted(history.items())[-HISTORY_DAYS:])
+        self.store.put(f"coverage/{station_crs}.json",
+                       json.dumps(history).encode("utf-8"))
+
+        stats = {
+            "windows": windows,
+            "services_seen": services_seen,
+            "unique_services": unique_services,
+            "expected_services": expected,
+            "coverage": round(unique_services / expected, 3) if expected else None
+        }
+
+        with self.lock:
+            self.stats[station_crs] = stats
+
+        return stats
+
+    def log_stats(self) -> None:
+        """Logs the coverage of every station in the run."""
+
+        with self.lock:
+            stats = dict(self.stats)
+
+        for station_crs, station_stats in stats.items():
+            logger.info(
+                f"Coverage for {station_crs}: {station_stats['unique_services']} unique services "
+                f"from {station_stats['services_seen']} in {station_stats['windows']} windows, "
+                f"expected {station_stats['expected_services']} "
+                f"(coverage {station_stats['coverage']})")
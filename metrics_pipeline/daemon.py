@@ -0,0 +1,370 @@
+"""Long-running daemon mode for the metrics pipeline. It keeps a warm RTT session
+and database connection, sweeps every station periodically, re-polls the services
+still in progress every few minutes in between, and loads only the arrivals
+which changed since they were last loaded."""
+
+import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger, basicConfig, INFO
+from os import environ as ENV, _Environ
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from dotenv import load_dotenv
+
+from extract import (ArrivalRecord, extract_batches, fetch_service_arrivals,
+                     get_max_workers, get_session)
+from transform import transform, get_db_connection
+from load import load
+from cache_store import get_cache_store
+from service_cache import ServiceResponseCache
+from schedule_cache import ScheduleCache
+from network import get_station_crs_list
+from partitions import manage_partitions
+
+
+logger = getLogger(__name__)
+
+DEFAULT_POLL_SECONDS = 180
+DEFAULT_SWEEP_MINUTES = 30
+DEFAULT_HEALTH_PORT = 8080
+
+# arrivals expected this recently are still worth polling, in case they're late
+IN_PROGRESS_MARGIN_MINUTES = 10
+
+
+def get_minutes(hhmm: str) -> int:
+    """Returns the minutes since midnight of an RTT HHMM time."""
+
+    return int(hhmm[:2]) * 60 + int(hhmm[2:4])
+
+
+def is_service_in_progress(arrivals: list[ArrivalRecord], now: datetime,
+                           lookahead_minutes: float) -> bool:
+    """Returns whether a service has started, or starts within the lookahead, and
+       still has a stop it's expected at after the margin. Times are counted in
+       minutes from midnight on the run date, so stops after midnight, and now
+       when it's the day after the run date, count on past 1440."""
+
+    if not arrivals:
+        return False
+
+    run_day = (now.date() - date.fromisoformat(arrivals[0].arrival_date)).days
+    # only services run today, or yesterday and still running past midnight
+    if run_day not in (0, 1):
+        return False
+
+    scheduled = [get_minutes(arrival.scheduled_arr_time) for arrival in arrivals
+                 if arrival.scheduled_arr_time]
+    if not scheduled:
+        return False
+
+    first = scheduled[0]
+    now_minutes = run_day * 1440 + now.hour * 60 + now.minute
+
+    expected = []
+    for arrival in arrivals:
+        arrival_time = arrival.actual_arr_time or arrival.scheduled_arr_time
+        if arrival_time and not arrival.location_cancelled:
+            minutes = get_minutes(arrival_time)
+            expected.append(minutes + 1440 if minutes < first else minutes)
+
+    return first <= now_minutes + lookahead_minutes and \
+        any(minutes >= now_minutes - IN_PROGRESS_MARGIN_MINUTES for minutes in expected)
+
+
+class MetricsDaemon:
+    """Polls the RTT API and loads changed arrivals until stopped."""
+
+    def __init__(self, config: _Environ, station_crs_list: list[str]):
+        self.config = config
+        self.station_crs_list = station_crs_list
+        self.poll_seconds = float(config.get("DAEMON_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+        self.sweep_seconds = float(
+            config.get("DAEMON_SWEEP_MINUTES", DEFAULT_SWEEP_MINUTES)) * 60
+
+        if self.poll_seconds <= 0 or self.sweep_seconds <= 0:
+            raise ValueError("DAEMON_POLL_SECONDS and DAEMON_SWEEP_MINUTES must be positive.")
+
+        self.max_workers = get_max_workers(config)
+        self.session = get_session(config, self.max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.conn = get_db_connection(config)
+        manage_partitions(config, self.conn)
+        self.store = get_cache_store(config)
+        self.cache = ServiceResponseCache(self.store)
+
+        self.stop_event = Event()
+        self.started_at = monotonic()
+        self.next_sweep = self.started_at
+
+        self.run_date = date.today()
+        self.schedule_cache = ScheduleCache(self.store, self.run_date, "daemon")
+        # the arrivals last loaded, by service UID and run date and then by stop
+        self.service_arrivals = {}
+        self.loaded = {}
+
+        self.stats = {"sweeps": 0, "polls": 0, "errors": 0, "arrivals_loaded": 0,
+                      "arrivals_unchanged": 0, "services_in_progress": 0,
+                      "last_success": None}
+        self.stats_lock = Lock()
+
+    def count(self, stat: str, amount: int = 1) -> None:
+        """Adds to one of the daemon's counters."""
+
+        with self.stats_lock:
+            self.stats[stat] += amount
+
+    def roll_over(self, now: datetime = None) -> None:
+        """Starts afresh when the day changes, as services and arrivals are per run date.
+           Services from the day before which are still running past midnight
+           are kept, so they're polled until they finish."""
+
+        now = now or datetime.now()
+
+        if now.date() == self.run_date:
+            return
+
+        self.run_date = now.date()
+        manage_partitions(self.config, self.conn, self.run_date)
+        self.schedule_cache = ScheduleCache(self.store, self.run_date, "daemon")
+        self.service_arrivals = {
+            service_key: arrivals for service_key, arrivals in self.service_arrivals.items()
+            if is_service_in_progress(list(arrivals.values()), now, self.poll_seconds / 60)}
+        self.loaded = {key: arrival for key, arrival in self.loaded.items()
+                       if (key[0], key[2]) in self.service_arrivals}
+        self.next_sweep = monotonic()
+        logger.info(f"Rolled over to {self.run_date}, still polling "
+                    f"{len(self.service_arrivals)} services from the day before")
+
+    def load_changes(self, services: list[dict], arrivals: list[ArrivalRecord],
+                     schedules: dict = None) -> None:
+        """Transforms and loads the new services and the arrivals which changed,
+           then adds the new services' timetables to the schedule cache."""
+
+        changed = {}
+        for arrival in arrivals:
+            key = (arrival.service_uid, arrival.crs, arrival.arrival_date)
+            # the first call at a stop wins, as when the staging data is deduplicated
+            if key not in changed and self.loaded.get(key) != arrival:
+                changed[key] = arrival
+
+        self.count("arrivals_unchanged", len(arrivals) - len(changed))
+
+        # unchanged arrivals were loaded earlier along with their services
+        if changed:
+            transformed_data = transform(
+                self.config, {"services": services, "arrivals": list(changed.values())},
+                self.conn)
+            counts = load(self.config, self.conn, transformed_data)
+
+            # arrivals dropped for an unknown service are sent again once their service is loaded
+            unmatched = counts["unmatched_service_uids"]
+            loaded = {key: arrival for key, arrival in changed.items() if key[0] not in unmatched}
+
+            self.loaded.update(loaded)
+            self.count("arrivals_loaded", len(loaded))
+
+        if schedules:
+            self.schedule_cache.add(schedules)
+            self.schedule_cache.save()
+
+    def sweep(self) -> None:
+        """Extracts every station, as the batch pipeline does, loading only the changes."""
+
+        for batch in extract_batches(self.config, self.station_crs_list, self.max_workers,
+                                     schedule_cache=self.schedule_cache,
+                                     should_stop=self.stop_event.is_set,
+                                     session=self.session):
+            for arrival in batch["arrivals"]:
+                self.service_arrivals.setdefault((arrival.service_uid, arrival.arrival_date), {})[
+                    (arrival.crs, arrival.arrival_date)] = arrival
+
+            self.load_changes(batch["services"], batch["arrivals"], batch["schedules"])
+
+        self.count("sweeps")
+
+    def poll(self) -> None:
+        """Re-fetches the services in progress and loads the arrivals which changed."""
+
+        now = datetime.now()
+        in_progress = [
+            service_key for service_key, arrivals in self.service_arrivals.items()
+            if is_service_in_progress(list(arrivals.values()), now, self.poll_seconds / 60)]
+
+        with self.stats_lock:
+            self.stats["services_in_progress"] = len(in_progress)
+
+        # each service is fetched for its own run date, and only today's timetables are cached
+        service_arrivals = self.executor.map(
+            lambda service_key: fetch_service_arrivals(
+                self.session, {"service_uid": service_key[0]}, self.cache,
+                date.fromisoformat(service_key[1]),
+                self.schedule_cache.get(service_key[0])
+                if service_key[1] == self.run_date.isoformat() else None),
+            in_progress)
+
+        arrivals = []
+        for service_key, details in zip(in_progress, service_arrivals):
+            for arrival in details:
+                self.service_arrivals[service_key][(arrival.crs, arrival.arrival_date)] = arrival
+            arrivals.extend(details)
+
+        self.load_changes([], arrivals)
+        self.count("polls")
+        logger.info(f"Polled {len(in_progress)} services in progress")
+
+    def reconnect(self) -> None:
+        """Replaces the database connection if it was lost, or rolls back a failed transaction."""
+
+        if self.conn.closed:
+            self.conn = get_db_connection(self.config)
+            logger.info("Reconnected to the database")
+        else:
+            self.conn.rollback()
+
+    def run(self) -> None:
+        """Sweeps and polls until stopped, then closes the session and connection."""
+
+        logger.info(f"Daemon started for {len(self.station_crs_list)} stations, polling every "
+                    f"{self.poll_seconds:.0f}s and sweeping every {self.sweep_seconds:.0f}s")
+
+        while not self.stop_event.is_set():
+            try:
+                self.roll_over()
+                if monotonic() >= self.next_sweep:
+                    self.next_sweep = monotonic() + self.sweep_seconds
+                    self.sweep()
+                else:
+                    self.poll()
+                with self.stats_lock:
+                    self.stats["last_success"] = monotonic()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Daemon cycle failed: {e}")
+                self.count("errors")
+                self.reconnect()
+
+            self.stop_event.wait(self.poll_seconds)
+
+        self.close()
+
+    def stop(self, *args) -> None:
+        """Asks the daemon to stop once its current cycle finishes."""
+
+        logger.info("Stopping daemon")
+        self.stop_event.set()
+
+    def close(self) -> None:
+        """Closes the warm session, workers and connection."""
+
+        self.session.log_stats()
+        self.cache.log_stats()
+        self.executor.shutdown()
+        self.session.close()
+        self.conn.close()
+        logger.info("Daemon stopped")
+
+    def get_health(self) -> tuple[bool, dict]:
+        """Returns whether a cycle has succeeded recently, with the details."""
+
+        with self.stats_lock:
+            last_success = self.stats["last_success"]
+
+        since = monotonic() - (last_success or self.started_at)
+        stale_after = max(3 * self.poll_seconds, self.sweep_seconds)
+
+        return since <= stale_after, {
+            "status": "ok" if since <= stale_after else "stale",
+            "seconds_since_success": round(since, 1) if last_success else None,
+            "run_date": self.run_date.isoformat()
+        }
+
+    def get_metrics(self) -> str:
+        """Returns the daemon and RTT session counters in the Prometheus text format."""
+
+        with self.stats_lock:
+            stats = dict(self.stats)
+        with self.session.stats_lock:
+            session_stats = dict(self.session.stats)
+
+        lines = [f'metrics_daemon_cycles_total{{kind="sweep"}} {stats["sweeps"]}',
+                 f'metrics_daemon_cycles_total{{kind="poll"}} {stats["polls"]}',
+                 f'metrics_daemon_errors_total {stats["errors"]}',
+                 f'metrics_daemon_arrivals_loaded_total {stats["arrivals_loaded"]}',
+                 f'metrics_daemon_arrivals_unchanged_total {stats["arrivals_unchanged"]}',
+                 f'metrics_daemon_services_in_progress {stats["services_in_progress"]}']
+        lines.extend(f"metrics_daemon_rtt_{stat}_total {value}"
+                     for stat, value in session_stats.items())
+
+        return "\n".join(lines) + "\n"
+
+
+def get_health_handler(daemon: MetricsDaemon):
+    """Returns a request handler class serving the daemon's health and metrics."""
+
+    class HealthHandler(BaseHTTPRequestHandler):
+        """Answers /health with JSON and /metrics with Prometheus text."""
+
+        def send_body(self, status: int, content_type: str, body: str) -> None:
+            """Writes a response."""
+
+            content = body.encode("utf-8")
+
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            """Serves the health check or the metrics."""
+
+            if self.path == "/health":
+                healthy, details = daemon.get_health()
+                self.send_body(200 if healthy else 503, "application/json",
+                               json.dumps(details))
+            elif self.path == "/metrics":
+                self.send_body(200, "text/plain; version=0.0.4", daemon.get_metrics())
+            else:
+                self.send_body(404, "application/json", json.dumps({"error": "Not found"}))
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            """Silences the per-request access log."""
+
+    return HealthHandler
+
+
+def start_health_server(daemon: MetricsDaemon, port: int) -> ThreadingHTTPServer:
+    """Starts the health and metrics server in a background thread."""
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), get_health_handler(daemon))
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    logger.info(f"Serving /health and /metrics on port {server.server_address[1]}")
+
+    return server
+
+
+if __name__ == "__main__":
+
+    load_dotenv()
+    basicConfig(level=INFO)
+
+    station_conn = get_db_connection(ENV)
+    metrics_daemon = MetricsDaemon(ENV, get_station_crs_list(ENV, station_conn))
+    station_conn.close()
+
+    signal.signal(signal.SIGTERM, metrics_daemon.stop)
+    signal.signal(signal.SIGINT, metrics_daemon.stop)
+
+    health_server = start_health_server(
+        metrics_daemon, int(ENV.get("DAEMON_HEALTH_PORT", DEFAULT_HEALTH_PORT)))
+
+    try:
+        metrics_daemon.run()
+    finally:
+        health_server.shutdown()
@@ -0,0 +1,91 @@
+"""Cache of a content hash for every arrival loaded on a run date, so later runs
+only upload the arrivals which are new or have changed since."""
+
+from datetime import date
+from logging import getLogger
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from cache_store import LocalCacheStore, S3CacheStore
+
+
+logger = getLogger(__name__)
+
+ARRIVAL_KEY_COLUMNS = ["arrival_date", "arrival_station_id", "service_uid"]
+ARRIVAL_VALUE_COLUMNS = ["scheduled_arr_time", "actual_arr_time",
+                         "platform_changed", "location_cancelled"]
+
+
+def get_row_hashes(df: pd.DataFrame, columns: list[str]) -> np.ndarray:
+    """Returns a 64-bit hash of each row's values in the columns.
+       Categorical values hash the same as the values themselves, so hashes
+       match between runs whatever the categories."""
+
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy(dtype=np.uint64)
+
+
+class ArrivalDigestCache:
+    """The key and content hashes of the arrivals loaded on a run date, held as two
+       arrays sorted by key hash and saved as 16 bytes per arrival.
+       New hashes are only saved once the run has loaded their arrivals."""
+
+    def __init__(self, store: LocalCacheStore | S3CacheStore,
+                 run_date: date = None, name: str = "shard-0"):
+        self.store = store
+        self.key = f"digests/{(run_date or date.today()).isoformat()}/{name}.bin"
+        self.lock = Lock()
+
+        content = store.get(self.key)
+        saved = (np.frombuffer(content, dtype=np.uint64).reshape(2, -1)
+                 if content else np.empty((2, 0), dtype=np.uint64))
+        self.keys, self.digests = saved[0], saved[1]
+        self.pending = []
+
+    def get_changed(self, arrivals: pd.DataFrame) -> tuple[pd.DataFrame, tuple]:
+        """Returns the arrivals which are new or differ from when they were last loaded,
+           along with their hashes to add once they have been loaded."""
+
+        keys = get_row_hashes(arrivals, ARRIVAL_KEY_COLUMNS)
+        digests = get_row_hashes(arrivals, ARRIVAL_VALUE_COLUMNS)
+
+        with self.lock:
+            known_keys, known_digests = self.keys, self.digests
+
+        unchanged = np.zeros(len(keys), dtype=bool)
+
+        if len(known_keys):
+            positions = np.minimum(np.searchsorted(known_keys, keys), len(known_keys) - 1)
+            unchanged = ((known_keys[positions] == keys)
+                         & (known_digests[positions] == digests))
+
+        return arrivals[~unchanged], (keys[~unchanged], digests[~unchanged])
+
+    def add(self, hashes: tuple) -> None:
+        """Holds the hashes of loaded arrivals until the run is saved."""
+
+        if len(hashes[0]):
+            with self.lock:
+                self.pending.append(hashes)
+
+    def save(self) -> None:
+        """Saves the new hashes, once their arrivals have been loaded.
+           A newer hash of an arrival replaces the older one."""
+
+        with self.lock:
+            if not self.pending:
+                return
+
+            keys = np.concatenate([self.keys] + [keys for keys, _ in self.pending])
+            digests = np.concatenate([self.digests] + [digests for _, digests in self.pending])
+            self.pending = []
+
+            # the last occurrence of each key is the most recently loaded
+            reversed_keys = keys[::-1]
+            unique_keys, first = np.unique(reversed_keys, return_index=True)
+            self.keys, self.digests = unique_keys, digests[::-1][first]
+
+            content = np.stack([self.keys, self.digests]).tobytes()
+
+        self.store.put(self.key, content)
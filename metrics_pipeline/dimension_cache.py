@@ -0,0 +1,177 @@
+"""Cache of the station, station alias and operator dimension tables, which almost never change.
+The rows are kept in-process and on local disk, and are only re-read from RDS
+when a cheap version check shows the tables have changed."""
+
+import json
+from functools import lru_cache
+from logging import getLogger
+from typing import Callable, Any
+
+from psycopg2.extensions import connection
+
+from cache_store import LocalCacheStore
+
+
+logger = getLogger(__name__)
+
+DIMENSIONS_KEY = "dimensions.json"
+
+
+def get_station_id_list(conn: connection) -> list[dict]:
+    """Returns a list of dictionaries with \
+        station_crs codes along with the station ids and names."""
+
+    sql = """SELECT station_id, station_crs, station_name
+             FROM station;
+             """
+
+    with conn.cursor() as cur:
+        cur.execute(sql)
+
+        result = cur.fetchall()
+
+    return result
+
+
+def get_operator_id_list(conn: connection) -> list[dict]:
+    """Returns a list of dictionaries with the operator name and it's ID in the database."""
+
+    sql = """SELECT operator_id, operator_name
+             FROM operator;
+             """
+
+    with conn.cursor() as cur:
+        cur.execute(sql)
+
+        result = cur.fetchall()
+
+    return result
+
+
+def get_station_alias_list(conn: connection) -> list[dict]:
+    """Returns a list of dictionaries with each alternative station name and its station id."""
+
+    sql = """SELECT alias_name, station_id
+             FROM station_alias;
+             """
+
+    with conn.cursor() as cur:
+        cur.execute(sql)
+
+        result = cur.fetchall()
+
+    return result
+
+
+def get_dimension_version(conn: connection) -> list:
+    """Returns the row count and highest id of the station, station alias and
+       operator tables, which change whenever a row is added or removed."""
+
+    sql = """SELECT (SELECT COUNT(*) FROM station) AS station_count,
+                    (SELECT MAX(station_id) FROM station) AS station_max_id,
+                    (SELECT COUNT(*) FROM station_alias) AS alias_count,
+                    (SELECT MAX(alias_id) FROM station_alias) AS alias_max_id,
+                    (SELECT COUNT(*) FROM operator) AS operator_count,
+                    (SELECT MAX(operator_id) FROM operator) AS operator_max_id;
+             """
+
+    with conn.cursor() as cur:
+        cur.execute(sql)
+
+        result = cur.fetchone()
+
+    return list(result.values())
+
+
+def insert_operators(conn: connection, operator_names: list[str]) -> None:
+    """Adds operators which aren't in the operator table yet."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+                    INSERT INTO operator (operator_name)
+                    SELECT UNNEST(%s::VARCHAR[])
+                    ON CONFLICT (operator_name) DO NOTHING;
+                    """, (operator_names,))
+        conn.commit()
+
+
+class DimensionCache:
+    """The station, station alias and operator rows as of the last version check,
+       along with any indexes built from them."""
+
+    def __init__(self, store: LocalCacheStore):
+        self.store = store
+
+        content = store.get(DIMENSIONS_KEY)
+        saved = json.loads(content) if content else {}
+
+        self.version = saved.get("version")
+        self.stations = saved.get("stations", [])
+        self.aliases = saved.get("aliases", [])
+        self.operators = saved.get("operators", [])
+        self.indexes = {}
+        self.stats = {"hits": 0, "refreshes": 0, "operators_added": 0}
+
+    def refresh(self, conn: connection) -> None:
+        """Re-reads the tables from RDS if their version has changed since they were cached."""
+
+        version = get_dimension_version(conn)
+
+        if version == self.version:
+            self.stats["hits"] += 1
+            return
+
+        self.stations = [dict(row) for row in get_station_id_list(conn)]
+        self.aliases = [dict(row) for row in get_station_alias_list(conn)]
+        self.operators = [dict(row) for row in get_operator_id_list(conn)]
+        self.version = version
+        self.indexes = {}
+        self.stats["refreshes"] += 1
+
+        self.store.put(DIMENSIONS_KEY, json.dumps({
+            "version": self.version,
+            "stations": self.stations,
+            "aliases": self.aliases,
+            "operators": self.operators
+        }).encode("utf-8"))
+
+        logger.info(f"Refreshed dimension cache with {len(self.stations)} stations, "
+                    f"{len(self.aliases)} station aliases and {len(self.operators)} operators")
+
+    def get_index(self, name: str, build: Callable[["DimensionCache"], Any]) -> Any:
+        """Returns the named index of the cached rows, building it
+           the first time it's asked for after each refresh."""
+
+        if name not in self.indexes:
+            self.indexes[name] = build(self)
+
+        return self.indexes[name]
+
+    def add_operators(self, conn: connection, operator_names: set[str]) -> None:
+        """Writes new operators through to RDS, then refreshes the cached rows."""
+
+        known = {operator["operator_name"] for operator in self.operators}
+        new_operators = sorted(name for name in operator_names if name not in known)
+
+        if not new_operators:
+            return
+
+        insert_operators(conn, new_operators)
+        self.stats["operators_added"] += len(new_operators)
+        logger.info(f"Added new operators: {', '.join(new_operators)}")
+
+        self.refresh(conn)
+
+    def log_stats(self) -> None:
+        """Logs how often the cached rows were used."""
+
+        logger.info(f"Dimension cache hits: {self.stats['hits']}, "
+                    f"refreshes: {self.stats['refreshes']}, "
+                    f"operators added: {self.stats['operators_added']}")
+
+
+@lru_cache
+def get_dimension_cache(cache_dir: str) -> DimensionCache:
+    """Returns the dimension cache kept in the directory, loaded once per process."""
+
+    return DimensionCache(LocalCacheStore(cache_dir))
@@ -3,17 +3,46 @@
 # pylint: disable=unused-argument, redefined-outer-name
 
 from os import environ as ENV, _Environ
-import json
 from logging import getLogger, basicConfig, INFO
-from datetime import datetime
+from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Callable, NamedTuple, BinaryIO
 
+import ijson
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from dotenv import load_dotenv
 
+from rtt_client import get_rtt_session
+from cache_store import get_cache_store
+from service_cache import ServiceResponseCache
+from schedule_cache import ScheduleCache, get_service_schedule, get_booked_times
+from checkpoint import ExtractCheckpoint
+from station_registry import get_station_registry
+from coverage import StationCoverage, get_window_starts
+
 
 logger = getLogger(__name__)
 
+RTT_API_URL = "https://api.rtt.io/api/v1/json"
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WINDOW_MINUTES = 60
+
+
+class ArrivalRecord(NamedTuple):
+    """The arrival details of one stop on a service. Times are kept as the
+       raw RTT strings and parsed a whole column at a time in transform."""
+
+    crs: str
+    scheduled_arr_time: str | None
+    actual_arr_time: str | None
+    arrival_date: str
+    platform_changed: bool
+    location_cancelled: bool
+    service_uid: str
+
 
 def get_basic_auth(config: _Environ):
     """Returns a basic auth from credentials."""
@@ -24,27 +53,36 @@ def get_basic_auth(config: _Environ):
     return basic
 
 
-def get_crs(station_name: str) -> str:
-    """Returns the crs of the station from the name."""
+def get_max_workers(config: _Environ) -> int:
+    """Returns the number of concurrent RTT requests allowed for a run."""
+
+    max_workers = int(config.get("RTT_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+
+    if max_workers < 1:
+        raise ValueError("RTT_MAX_WORKERS must be at least 1.")
 
-    with open("crs.json", "r", encoding="utf-8") as f:
-        crs_data = json.load(f)
+    return max_workers
 
-    crs_matches = []
 
-    for station in crs_data:
-        if station_name.title() in station["name"]:
-            crs_matches.append(station["crs"])
+def get_session(config: _Environ, max_workers: int) -> requests.Session:
+    """Returns an authenticated, rate limited RTT session whose connection
+       pool is large enough for every worker to hold a connection."""
 
-    if len(crs_matches) == 1:
-        return crs_matches[0]
-    if len(crs_matches) > 1:
-        raise ValueError(
-            f"'{station_name.title()}' matches with more than 1 station: {crs_matches}")
-    if len(crs_matches) == 0:
-        raise ValueError(
-            f"'{station_name.title()}' does not match any existing station"
-        )
+    session = get_rtt_session(config)
+    session.auth = get_basic_auth(config)
+    session.stream_parse = config.get("RTT_STREAM_PARSE") == "true"
+
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+def get_crs(station_name: str) -> str:
+    """Returns the crs of the station from the name."""
+
+    return get_station_registry().get_crs(station_name)
 
 
 def get_station_data(session: requests.Session,
@@ -54,7 +92,7 @@ def get_station_data(session: requests.Session,
 
     # if the user provided a crs they know
     if user_crs:
-        rtt_url = f"https://api.rtt.io/api/v1/json/search/{user_crs}"
+        rtt_url = f"{RTT_API_URL}/search/{user_crs}"
 
         response = session.get(url=rtt_url).json()
 
@@ -67,24 +105,39 @@ def get_station_data(session: requests.Session,
 
     crs = get_crs(station_name)
 
-    rtt_url = f"https://api.rtt.io/api/v1/json/search/{crs}"
+    rtt_url = f"{RTT_API_URL}/search/{crs}"
 
     response = session.get(url=rtt_url).json()
 
     return response
 
 
-def get_service_details(session: requests.Session,
-                        station_crs: str) -> list[str]:
+def get_service_details(session: requests.Session, station_crs: str,
+                        run_date: date = None, window_start: str = None) -> list[str]:
     """Returns a list of service uids with their origins/destinations
-       from services passing through a given station."""
+       from services passing through a given station, on run_date if given.
+       If a window_start (HHMM) is given only the search window from then is returned."""
+
+    rtt_url = f"{RTT_API_URL}/search/{station_crs}"
+
+    if run_date or window_start:
+        run_date = run_date or date.today()
+        rtt_url += f"/{run_date.year}/{run_date.month:02d}/{run_date.day:02d}"
 
-    rtt_url = f"https://api.rtt.io/api/v1/json/search/{station_crs}"
+    if window_start:
+        rtt_url += f"/{window_start}"
+
+    if getattr(session, "stream_parse", False):
+        with session.get(url=rtt_url, stream=True) as response:
+            response.raw.decode_content = True
+            return [service for service in get_projected_services(response.raw)
+                    if service["operator_name"] != "Eurostar"]
 
     response = session.get(url=rtt_url).json()
 
     service_list = []
-    for service in response["services"]:
+    # quiet windows come back with null services
+    for service in response.get("services") or []:
 
         if service["atocName"] == "Eurostar":
             continue
@@ -101,101 +154,303 @@ def get_service_details(session: requests.Session,
     return service_list
 
 
-def get_service_arrival_details(session: requests.Session, service: dict) -> list[dict]:
-    """Returns a list of dictionaries containing
-          the arrival details from all stops on that service."""
+def get_projected_services(stream: BinaryIO) -> Iterator[dict]:
+    """Yields the service details from a search response as it is read, so only
+       one service is parsed at a time and only the projected fields are kept."""
 
-    today = datetime.now()
+    for service in ijson.items(stream, "services.item"):
+        yield {
+            "service_uid": service["serviceUid"],
+            "origin_station": service["locationDetail"]["origin"][0]["description"],
+            "destination_station": service["locationDetail"]["destination"][0]["description"],
+            "operator_name": service["atocName"]
+        }
 
-    rtt_url = f"https://api.rtt.io/api/v1/json/service/{service['service_uid']}/{today.year}/{today.month:02d}/{today.day:02d}"
 
-    response = session.get(url=rtt_url).json()
+def get_service_arrival_details(session: requests.Session, service: dict,
+                                cache: ServiceResponseCache = None,
+                                run_date: date = None,
+                                schedule: dict = None) -> list[ArrivalRecord]:
+    """Returns a list of records containing
+          the arrival details from all stops on that service, today or on run_date.
+          Services which have finished running are read from the cache if given.
+          If the service's saved schedule is given its booked times are used,
+          so only the realtime fields are read from the response."""
+
+    today = run_date or datetime.now()
+    run_date = today.strftime("%Y-%m-%d")
+
+    response = cache.get(service["service_uid"], run_date) if cache else None
+
+    if response is None:
+        rtt_url = f"{RTT_API_URL}/service/{service['service_uid']}/{today.year}/{today.month:02d}/{today.day:02d}"
+
+        response = session.get(url=rtt_url).json()
+
+        if cache and not response.get("error"):
+            cache.put(service["service_uid"], run_date, response)
 
     if response.get("error"):
         return []
 
-    service_arrival_details = []
-
     arrival_date = response["runDate"]
 
-    for arrival in response["locations"]:
+    if schedule:
+        locations = [arrival for arrival in response["locations"] if "crs" in arrival]
+        booked_times = get_booked_times(schedule, [arrival["crs"] for arrival in locations])
+        return [ArrivalRecord(
+            crs=arrival["crs"],
+            scheduled_arr_time=booked_time,
+            actual_arr_time=arrival.get("realtimeArrival") or None,
+            arrival_date=arrival_date,
+            platform_changed=arrival.get("platformChanged", False),
+            location_cancelled=bool(arrival.get("cancelReasonCode")),
+            service_uid=service["service_uid"])
+            for arrival, booked_time in zip(locations, booked_times)]
+
+    return [ArrivalRecord(
+        crs=arrival["crs"],
+        scheduled_arr_time=arrival.get("gbttBookedArrival") or None,
+        actual_arr_time=arrival.get("realtimeArrival") or None,
+        arrival_date=arrival_date,
+        platform_changed=arrival.get("platformChanged", False),
+        location_cancelled=bool(arrival.get("cancelReasonCode")),
+        service_uid=service["service_uid"])
+        for arrival in response["locations"] if "crs" in arrival]
+
+
+def fetch_station_services(session: requests.Session, station_crs: str,
+                           run_date: date = None, window_start: str = None) -> list[dict]:
+    """Returns the services for a station, or an empty list if the API couldn't be reached."""
+
+    try:
+        return get_service_details(session=session, station_crs=station_crs,
+                                   run_date=run_date, window_start=window_start)
+    except requests.RequestException as e:
+        logger.warning(f"Could not retrieve service details for {station_crs}: {e}")
+        return []
 
-        if "crs" not in arrival:
-            continue
 
-        arrival_dict = {}
-        booked_arrival_time = arrival.get("gbttBookedArrival")
-        actual_arrival_time = arrival.get("realtimeArrival")
-        arrival_dict["crs"] = arrival["crs"]
-        if booked_arrival_time:
-            arrival_dict["scheduled_arr_time"] = datetime.strptime(
-                (booked_arrival_time), "%H%M")
-        else:
-            arrival_dict["scheduled_arr_time"] = None
-        if actual_arrival_time:
-            arrival_dict["actual_arr_time"] = datetime.strptime(
-                (actual_arrival_time), "%H%M")
-        else:
-            arrival_dict["actual_arr_time"] = None
-        arrival_dict["arrival_date"] = datetime.strptime(
-            arrival_date, "%Y-%m-%d")
-        arrival_dict["platform_changed"] = arrival.get(
-            "platformChanged", False)
-        if not arrival.get("cancelReasonCode"):
-            arrival_dict["location_cancelled"] = False
-        else:
-            arrival_dict["location_cancelled"] = True
-        arrival_dict["service_uid"] = service["service_uid"]
-
-        service_arrival_details.append(arrival_dict)
-
-    return service_arrival_details
-
-
-def extract(config: _Environ, station_crs_list: list[str]) -> dict:
-    """Extracts the data from the services."""
+def fetch_service_arrivals(session: requests.Session, service: dict,
+                           cache: ServiceResponseCache = None,
+                           run_date: date = None,
+                           schedule: dict = None) -> list[ArrivalRecord]:
+    """Returns the arrivals for a service, or an empty list if the API couldn't be reached."""
 
-    basicConfig(level=INFO)
+    try:
+        return get_service_arrival_details(session, service, cache, run_date, schedule)
+    except requests.RequestException as e:
+        logger.warning(
+            f"Could not retrieve arrival details for {service['service_uid']}: {e}")
+        return []
 
-    # get basic authentication for API
-    basic_auth = get_basic_auth(config)
 
-    session = requests.Session()
-    session.auth = basic_auth
-    logger.info("Initialised session")
+def fetch_full_day_station_services(executor: ThreadPoolExecutor, session: requests.Session,
+                                    station_crs_list: list[str], run_date: date,
+                                    window_minutes: int,
+                                    coverage: StationCoverage) -> Iterator[list[dict]]:
+    """Yields the services for each station across the whole day, paging through
+       every search window concurrently and merging the windows without duplicates."""
 
-    service_details_list = []
+    run_date = run_date or date.today()
+    window_starts = get_window_starts(window_minutes)
 
-    # get the service details for each station we are looking at
-    # this contains the list of every service that passes through each of our stations
-    for crs in station_crs_list:
-        service_details_list.extend(get_service_details(
-            station_crs=crs, session=session))
-        logger.info(f"Retrieved service details for {crs}")
+    station_windows = [
+        [executor.submit(fetch_station_services, session, crs, run_date, window_start)
+         for window_start in window_starts]
+        for crs in station_crs_list]
 
-    service_details_list = list({frozenset(d.items())
-                                for d in service_details_list})
-    service_details_list = [dict(f) for f in service_details_list]
+    for crs, windows in zip(station_crs_list, station_windows):
+        services_seen = 0
+        services = {}
 
-    logger.info("Removed duplicate services")
+        for window in windows:
+            window_services = window.result()
+            services_seen += len(window_services)
+            for service in window_services:
+                services.setdefault(service["service_uid"], service)
+
+        coverage.record(crs, run_date, len(windows), services_seen, len(services))
+
+        yield list(services.values())
 
-    arrival_details_list = []
 
-    # get the arrival details for each location each service visits
-    for service in service_details_list.copy():
-        details = get_service_arrival_details(session, service)
-        if len(details) != 0:
-            arrival_details_list.extend(details)
-        else:
-            service_details_list.remove(service)
-    logger.info("Retrieved arrival details for the services")
+def get_batch_size(config: _Environ) -> int:
+    """Returns the number of services extracted per batch in streaming mode."""
+
+    batch_size = int(config.get("STREAM_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
+    if batch_size < 1:
+        raise ValueError("STREAM_BATCH_SIZE must be at least 1.")
+
+    return batch_size
+
+
+def extract_batches(config: _Environ, station_crs_list: list[str],
+                    max_workers: int = None, batch_size: int = None,
+                    service_filter: Callable[[list[dict]], list[dict]] = None,
+                    run_date: date = None,
+                    schedule_cache: ScheduleCache = None,
+                    checkpoint: ExtractCheckpoint = None,
+                    should_stop: Callable[[], bool] = None,
+                    session: requests.Session = None) -> Iterator[dict]:
+    """Yields the data from the services a batch at a time, station by station,
+       with at most batch_size services in each batch. Services passing through
+       more than one station are only extracted with the first of them.
+       If given, service_filter chooses which of each station's new services to extract.
+       Services run today unless a past run_date is given.
+       Services already in the schedule cache only have their arrivals yielded,
+       as their service row has been loaded already. The timetables of the other
+       services are yielded with their batch, to add to the cache once it's loaded.
+       Once should_stop is true no more batches are yielded, and where extraction
+       stopped is recorded in the checkpoint, which the next run resumes from.
+       A warm session can be given, which is left open afterwards."""
+
+    basicConfig(level=INFO)
+
+    if max_workers is None:
+        max_workers = get_max_workers(config)
+    if batch_size is None:
+        batch_size = get_batch_size(config)
+
+    owns_session = session is None
+    if owns_session:
+        session = get_session(config, max_workers)
+        logger.info(f"Initialised session with {max_workers} workers")
+
+    cache = ServiceResponseCache(get_cache_store(config))
+
+    # full day coverage pages through the day's search windows
+    # instead of only searching the window around now
+    full_day = config.get("SEARCH_COVERAGE") == "full_day"
+    coverage = StationCoverage(get_cache_store(config))
+
+    # a checkpointed run resumes from the station and services it stopped at
+    start_cursor, pending_services, seen_service_uids = (
+        checkpoint.get_resume_point(station_crs_list) if checkpoint else (0, [], set()))
+    remaining_stations = station_crs_list[start_cursor:]
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+            # get the service details for each station we are looking at
+            # this contains the list of every service that passes through each of our stations
+            if full_day:
+                station_services = fetch_full_day_station_services(
+                    executor, session, remaining_stations, run_date,
+                    int(config.get("SEARCH_WINDOW_MINUTES", DEFAULT_WINDOW_MINUTES)),
+                    coverage)
+            else:
+                station_services = executor.map(
+                    lambda crs: fetch_station_services(session, crs, run_date),
+                    remaining_stations)
+
+            def get_new_services() -> Iterator[tuple[int, str, list[dict]]]:
+                """Yields the index of the next station to search, the station
+                   and its services not already extracted with an earlier station."""
+
+                if pending_services:
+                    yield start_cursor, "checkpoint", pending_services
+
+                for cursor, (crs, services) in enumerate(
+                        zip(remaining_stations, station_services), start=start_cursor + 1):
+                    logger.info(f"Retrieved service details for {crs}")
+
+                    new_services = []
+                    for service in services:
+                        if service["service_uid"] not in seen_service_uids:
+                            seen_service_uids.add(service["service_uid"])
+                            new_services.append(service)
+
+                    if service_filter:
+                        new_services = service_filter(new_services)
+
+                    yield cursor, crs, new_services
+
+            for next_cursor, crs, new_services in get_new_services():
+                for i in range(0, len(new_services), batch_size):
+                    # stop before the deadline, leaving time to load what's been extracted
+                    if should_stop and should_stop():
+                        if checkpoint:
+                            checkpoint.stop_at(station_crs_list, next_cursor,
+                                               new_services[i:], seen_service_uids)
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        return
+
+                    batch_services = new_services[i:i + batch_size]
+
+                    schedules = [schedule_cache.get(service["service_uid"])
+                                 if schedule_cache else None
+                                 for service in batch_services]
+
+                    arrival_details_list = []
+                    services_with_arrivals = []
+                    new_schedules = {}
+
+                    # get the arrival details for each location each service visits
+                    service_arrivals = executor.map(
+                        lambda service, schedule: fetch_service_arrivals(
+                            session, service, cache, run_date, schedule),
+                        batch_services, schedules)
+
+                    for service, schedule, details in zip(batch_services, schedules,
+                                                          service_arrivals):
+                        if len(details) == 0:
+                            continue
+                        arrival_details_list.extend(details)
+                        if schedule is None:
+                            services_with_arrivals.append(service)
+                            if schedule_cache:
+                                new_schedules[service["service_uid"]] = get_service_schedule(
+                                    service, details)
+
+                    logger.info(
+                        f"Retrieved {len(arrival_details_list)} arrival details at {crs}")
+
+                    # the consumer adds the timetables once it has loaded their services
+                    yield {
+                        "services": services_with_arrivals,
+                        "arrivals": arrival_details_list,
+                        "schedules": new_schedules
+                    }
+    finally:
+        session.log_stats()
+        cache.log_stats()
+        coverage.log_stats()
+        if schedule_cache:
+            schedule_cache.log_stats()
+        if owns_session:
+            session.close()
+            logger.info("Closed session")
+
+
+def extract(config: _Environ, station_crs_list: list[str], max_workers: int = None,
+            service_filter: Callable[[list[dict]], list[dict]] = None,
+            run_date: date = None, schedule_cache: ScheduleCache = None,
+            checkpoint: ExtractCheckpoint = None,
+            should_stop: Callable[[], bool] = None,
+            session: requests.Session = None) -> dict:
+    """Extracts the data from the services, fetching from the API
+       with up to max_workers requests in flight at once.
+       Returns what was extracted so far once should_stop is true.
+       A session can be given, to read its stats afterwards."""
+
+    service_details_list = []
+    arrival_details_list = []
+    schedules = {}
 
-    session.close()
-    logger.info("Closed session")
+    for batch in extract_batches(config, station_crs_list, max_workers,
+                                 service_filter=service_filter, run_date=run_date,
+                                 schedule_cache=schedule_cache, checkpoint=checkpoint,
+                                 should_stop=should_stop, session=session):
+        service_details_list.extend(batch["services"])
+        arrival_details_list.extend(batch["arrivals"])
+        schedules.update(batch["schedules"])
 
     return {
         "services": service_details_list,
-        "arrivals": arrival_details_list
+        "arrivals": arrival_details_list,
+        "schedules": schedules
     }
 
 
@@ -2,64 +2,72 @@
 
 # pylint: disable=unused-argument, redefined-outer-name
 from logging import getLogger, basicConfig, INFO
-from os import environ as ENV, _Environ, remove, path
+from os import environ as ENV, _Environ
 
 from dotenv import load_dotenv
 import pandas as pd
 from psycopg2.extensions import connection
 from extract import extract
 from transform import transform, get_db_connection
+from binary_copy import CopyStream
+from digest_cache import ArrivalDigestCache, ARRIVAL_KEY_COLUMNS
+from rollup import stage_touched_hours, refresh_touched_hours
 
 
 logger = getLogger(__name__)
 basicConfig(level=INFO)
 
-
-def get_tmp_path() -> str:
-    """Returns the path to the file depending on where 
-    this function is being ran (Lambda/local)."""
-
-    if ENV.get("AWS_LAMBDA_FUNCTION_NAME"):
-        return "/tmp/temp.csv"
-    return "./temp.csv"
+# the staging columns in COPY order, with their binary COPY types
+SERVICE_STAGING_COLUMNS = {
+    "service_uid": "text",
+    "origin_station_id": "int4",
+    "destination_station_id": "int4",
+    "operator_id": "int4"
+}
+
+ARRIVAL_STAGING_COLUMNS = {
+    "arrival_date": "date",
+    "scheduled_arr_time": "time",
+    "actual_arr_time": "time",
+    "platform_changed": "bool",
+    "location_cancelled": "bool",
+    "arrival_station_id": "int4",
+    "service_uid": "text"
+}
 
 
 def create_service_staging_table(conn: connection) -> None:
-    """Creates a temporary staging table for the new service data."""
+    """Creates a temporary staging table for the new service data.
+       It is private to this connection and dropped when the load commits."""
 
     with conn.cursor() as cur:
         cur.execute("""
-                    DROP TABLE IF EXISTS service_staging;
-                    """)
-
-        cur.execute("""
-                    CREATE TABLE IF NOT EXISTS service_staging (
+                    CREATE TEMPORARY TABLE service_staging (
                     service_uid VARCHAR(6),
                     origin_station_id INT,
                     destination_station_id INT,
-                    operator_id INT);
+                    operator_id INT)
+                    ON COMMIT DROP;
                     """)
     logger.info("Created service staging table")
 
 
 def create_arrival_staging_table(conn: connection) -> None:
-    """Creates a temporary staging table for the new arrival data."""
+    """Creates a temporary staging table for the new arrival data.
+       It is private to this connection and dropped when the load commits."""
 
     with conn.cursor() as cur:
         cur.execute("""
-                    DROP TABLE IF EXISTS arrival_staging;
-                    """)
-
-        cur.execute("""
-                    CREATE TABLE IF NOT EXISTS arrival_staging (
+                    CREATE TEMPORARY TABLE arrival_staging (
                     arrival_date DATE,
                     scheduled_time TIME,
                     actual_time TIME,
                     platform_changed BOOLEAN,
                     location_cancelled BOOLEAN,
                     arrival_station_id INT,
-                    service_id INT,
-                    CONSTRAINT unique_key UNIQUE (arrival_date, arrival_station_id, service_id));
+                    service_uid VARCHAR(6),
+                    CONSTRAINT unique_key UNIQUE (arrival_date, arrival_station_id, service_uid))
+                    ON COMMIT DROP;
                     """)
 
     logger.info("Created arrival staging table")
@@ -68,24 +76,15 @@ def create_arrival_staging_table(conn: connection) -> None:
 def upload_service_staging_data(df: pd.DataFrame, conn: connection) -> None:
     """Uploads the data to the staging service table in RDS."""
 
-    csv_path = get_tmp_path()
-
-    df.to_csv(csv_path, index=False)
-
     with conn.cursor() as cur:
-        with open(csv_path, "r", encoding="utf-8") as f:
-            cur.copy_expert("""COPY service_staging
-                                    (service_uid,
-                                     origin_station_id,
-                                     destination_station_id,
-                                     operator_id)
-                            FROM STDIN
-                            WITH CSV HEADER""", f)
-
-        conn.commit()
-
-    if path.exists(csv_path):
-        remove(csv_path)
+        cur.copy_expert("""COPY service_staging
+                                (service_uid,
+                                 origin_station_id,
+                                 destination_station_id,
+                                 operator_id)
+                        FROM STDIN
+                        WITH (FORMAT BINARY)""",
+                        CopyStream(df, SERVICE_STAGING_COLUMNS))
 
     logger.info("Uploaded service staging data")
 
@@ -94,29 +93,20 @@ def upload_arrival_staging_data(df: pd.DataFrame, conn: connection) -> None:
     """Uploads the arrival data to the staging arrival table in RDS."""
 
     df = df.drop_duplicates(
-        ["arrival_date", "arrival_station_id", "service_id"], keep="first")
-
-    csv_path = get_tmp_path()
-
-    df.to_csv(csv_path, index=False)
+        ["arrival_date", "arrival_station_id", "service_uid"], keep="first")
 
     with conn.cursor() as cur:
-        with open(csv_path, "r", encoding="utf-8") as f:
-            cur.copy_expert("""COPY arrival_staging
-                                    (arrival_date,
-                                     scheduled_time,
-                                     actual_time,
-                                     platform_changed,
-                                     location_cancelled,
-                                     arrival_station_id,
-                                     service_id)
-                            FROM STDIN
-                            WITH CSV HEADER""", f)
-
-        conn.commit()
-
-    if path.exists(csv_path):
-        remove(csv_path)
+        cur.copy_expert("""COPY arrival_staging
+                                (arrival_date,
+                                 scheduled_time,
+                                 actual_time,
+                                 platform_changed,
+                                 location_cancelled,
+                                 arrival_station_id,
+                                 service_uid)
+                        FROM STDIN
+                        WITH (FORMAT BINARY)""",
+                        CopyStream(df, ARRIVAL_STAGING_COLUMNS))
 
     logger.info("Uploaded arrival staging data.")
 
@@ -150,18 +140,59 @@ def merge_service_tables(conn: connection) -> None:
                                 SS.destination_station_id,
                                 SS.operator_id);
                     """)
-        conn.commit()
 
     logger.info("Merged service data")
 
 
-def merge_arrival_tables(conn: connection) -> None:
-    """Merges the arrival staging table with the arrival table."""
+def get_staged_arrival_counts(conn: connection) -> dict:
+    """Returns how many staged arrivals belong to a known service,
+       and how many of those aren't in the arrival table yet."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+                    SELECT COUNT(*) AS staged,
+                           COUNT(*) FILTER (WHERE A.arrival_id IS NULL) AS new
+                    FROM arrival_staging AS ST
+                    JOIN service AS SV ON SV.service_uid = ST.service_uid
+                    LEFT JOIN arrival AS A
+                        ON A.arrival_date = ST.arrival_date
+                        AND A.arrival_station_id = ST.arrival_station_id
+                        AND A.service_id = SV.service_id;
+                    """)
+
+        result = cur.fetchone()
+
+    return result
+
+
+def get_unmatched_service_uids(conn: connection) -> set[str]:
+    """Returns the UIDs of staged arrivals' services missing from the service table."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+                    SELECT DISTINCT ST.service_uid
+                    FROM arrival_staging AS ST
+                    LEFT JOIN service AS SV ON SV.service_uid = ST.service_uid
+                    WHERE SV.service_id IS NULL;
+                    """)
+
+        result = cur.fetchall()
+
+    return {row["service_uid"] for row in result}
+
 
+def merge_arrival_tables(conn: connection) -> int:
+    """Merges the arrival staging table with the arrival table, resolving each
+       service UID to its service id in the database. Returns how many
+       arrivals were inserted or updated."""
+
+    # arrivals of a service missing from the service table are dropped by the join
     with conn.cursor() as cur:
         cur.execute("""
                     MERGE INTO arrival AS A
-                    USING arrival_staging AS S
+                    USING (SELECT ST.*, SV.service_id
+                           FROM arrival_staging AS ST
+                           JOIN service AS SV ON SV.service_uid = ST.service_uid) AS S
                     ON A.arrival_date = S.arrival_date
                     AND A.arrival_station_id = S.arrival_station_id
                     AND A.service_id = S.service_id
@@ -195,68 +226,40 @@ def merge_arrival_tables(conn: connection) -> None:
                                 S.arrival_station_id,
                                 S.service_id);
                     """)
-        conn.commit()
-
-    logger.info("Merged arrival data")
-
-
-def remove_staging_table(conn: connection, table_name: str) -> None:
-    """Removes a staging table in the database to declutter."""
-
-    if table_name not in ["service", "arrival"]:
-        raise ValueError(f"{table_name} table does not exist.")
-
-    with conn.cursor() as cur:
-        cur.execute(f"""
-                    DROP TABLE IF EXISTS {table_name}_staging;
-                    """)
-        conn.commit()
-    logger.info(f"Removed {table_name}_staging table")
-
-
-def get_service_id_list(conn: connection) -> list[dict]:
-    """Retrieves the list of service ids for assignment to arrivals."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT service_id, service_uid FROM service;")
 
-        result = cur.fetchall()
-
-    return result
-
-
-def get_service_id_dict(service_id_list: list) -> pd.DataFrame:
-    """Assigns a service id to each arrival so we can upload properly."""
+        merged = cur.rowcount
 
-    service_id_dict = {}
+    logger.info("Merged arrival data")
 
-    for entry in service_id_list:
-        service_id = entry["service_id"]
-        service_uid = entry["service_uid"]
-        service_id_dict[service_uid] = service_id
+    return merged
 
-    return service_id_dict
 
+def get_empty_counts() -> dict:
+    """Returns the arrival counts of a load which merged no arrivals."""
 
-def load(config: _Environ, conn: connection, transformed_data: dict) -> None:
-    """Loads the API data into the database."""
+    return {"inserted": 0, "updated": 0, "unchanged": 0, "unmatched": 0,
+            "unmatched_service_uids": set()}
 
-    if transformed_data["services"].empty or transformed_data["arrivals"].empty:
-        logger.info("No data for the date provided. Skipping")
-        return
 
-    service_data = transformed_data["services"]
-    arrivals_data = transformed_data["arrivals"]
+def load_staging_data(conn: connection, service_data: pd.DataFrame,
+                      arrivals_data: pd.DataFrame) -> dict:
+    """Stages and merges the services, then the arrivals, without committing,
+       refreshing the hourly rollup of the hours the arrivals touched.
+       Returns how many arrivals were inserted, updated or already up to date,
+       and how many were dropped for not having a known service, along with
+       those services' UIDs."""
 
-    create_service_staging_table(conn)
-    upload_service_staging_data(service_data, conn)
-    merge_service_tables(conn)
-    remove_staging_table(conn, "service")
+    # services already loaded today come from the schedule cache without a service row
+    if service_data.empty:
+        logger.info("No new services to load. Skipping service staging")
+    else:
+        create_service_staging_table(conn)
+        upload_service_staging_data(service_data, conn)
+        merge_service_tables(conn)
 
-    service_id_list = get_service_id_list(conn)
-    service_id_dict = get_service_id_dict(service_id_list)
+    if arrivals_data.empty:
+        return get_empty_counts()
 
-    arrivals_data["service_id"] = arrivals_data["service_uid"].map(
-        service_id_dict).astype("Int64")
     arrivals_data = arrivals_data[[
         "arrival_date",
         "scheduled_arr_time",
@@ -264,15 +267,80 @@ def load(config: _Environ, conn: connection, transformed_data: dict) -> None:
         "platform_changed",
         "location_cancelled",
         "arrival_station_id",
-        "service_id"]]
+        "service_uid"]]
 
     create_arrival_staging_table(conn)
     upload_arrival_staging_data(arrivals_data, conn)
-    merge_arrival_tables(conn)
-    remove_staging_table(conn, "arrival")
+    staged = get_staged_arrival_counts(conn)
+    stage_touched_hours(conn)
+    merged = merge_arrival_tables(conn)
+    refresh_touched_hours(conn)
+
+    unmatched = len(arrivals_data) - staged["staged"]
 
+    return {"inserted": staged["new"],
+            "updated": merged - staged["new"],
+            "unchanged": staged["staged"] - merged,
+            "unmatched": unmatched,
+            "unmatched_service_uids": get_unmatched_service_uids(conn) if unmatched else set()}
+
+
+def load(config: _Environ, conn: connection, transformed_data: dict,
+         digests: ArrivalDigestCache = None) -> dict:
+    """Loads the API data into the database. With a digest cache, only the
+       arrivals which are new or changed since they were last loaded are uploaded,
+       and their hashes are added to the cache once the load has committed.
+       Returns the counts from load_staging_data, including the UIDs of the
+       services whose arrivals were dropped for not being in the service table."""
+
+    if transformed_data["arrivals"].empty:
+        logger.info("No data for the date provided. Skipping")
+        return get_empty_counts()
+
+    service_data = transformed_data["services"]
+    # the first call at a stop wins, as when the staging data is deduplicated
+    arrivals_data = transformed_data["arrivals"].drop_duplicates(
+        ARRIVAL_KEY_COLUMNS, keep="first")
+
+    skipped = 0
+    hashes = None
+
+    if digests:
+        changed_data, hashes = digests.get_changed(arrivals_data)
+        skipped = len(arrivals_data) - len(changed_data)
+        arrivals_data = changed_data
+
+    if arrivals_data.empty and service_data.empty:
+        logger.info(f"Arrivals inserted: 0, updated: 0, skipped: {skipped}. Nothing to load")
+        return get_empty_counts()
+
+    # staging and both merges share one transaction, so a failed load leaves
+    # nothing behind and concurrent loads never see each other's staging tables
+    try:
+        counts = load_staging_data(conn, service_data, arrivals_data)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # dropped arrivals stay out of the cache, so they're uploaded again once their service is
+    if digests:
+        if counts["unmatched"]:
+            matched = ~arrivals_data["service_uid"].isin(
+                counts["unmatched_service_uids"]).to_numpy()
+            hashes = (hashes[0][matched], hashes[1][matched])
+        digests.add(hashes)
+
+    if counts["unmatched"]:
+        logger.warning(f"Dropped {counts['unmatched']} arrivals without a known service")
+
+    logger.info(f"Arrivals inserted: {counts['inserted']}, updated: {counts['updated']}, "
+                f"skipped: {skipped + counts['unchanged']} "
+                f"({skipped} by digest, {counts['unchanged']} by MERGE)")
     logger.info("Completed pipeline")
 
+    return counts
+
 
 if __name__ == "__main__":
 
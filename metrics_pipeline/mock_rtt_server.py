@@ -0,0 +1,268 @@
+"""A local stand-in for the RTT API, which replays recorded search and service
+responses with configurable latency, errors and scale, plus a recorder which
+saves live responses to replay later."""
+
+# pylint: disable=invalid-name
+
+import json
+from argparse import ArgumentParser
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger, basicConfig, INFO
+from os import environ as ENV, _Environ, makedirs, path
+from random import random, uniform
+from threading import Thread, Lock
+from time import sleep
+
+from dotenv import load_dotenv
+
+
+logger = getLogger(__name__)
+
+API_PREFIX = "/api/v1/json"
+SYNTHETIC_STATIONS = ["LBG", "STP", "KGX", "SHF", "LST", "WFJ"]
+
+
+def get_synthetic_search_response(crs: str, services_per_station: int) -> dict:
+    """Returns a search response listing services_per_station generated services."""
+
+    services = []
+    for i in range(services_per_station):
+        services.append({
+            "locationDetail": {
+                "origin": [{"description": "London Cannon Street"}],
+                "destination": [{"description": "Dartford"}]
+            },
+            "serviceUid": f"{crs[:2]}{i:04d}",
+            "runDate": date.today().isoformat(),
+            "atocName": "Southeastern"
+        })
+
+    return {"location": {"crs": crs}, "services": services}
+
+
+def get_synthetic_service_response(service_uid: str, stops: int) -> dict:
+    """Returns a generated service response calling at the given number of stops."""
+
+    locations = []
+    for i in range(stops):
+        locations.append({
+            "crs": SYNTHETIC_STATIONS[i % len(SYNTHETIC_STATIONS)],
+            "gbttBookedArrival": f"{10 + i // 60:02d}{i % 60:02d}",
+            "realtimeArrival": f"{10 + i // 60:02d}{i % 60:02d}",
+            "platformChanged": False
+        })
+
+    return {"serviceUid": service_uid, "runDate": date.today().isoformat(),
+            "locations": locations}
+
+
+class RecordedResponses:
+    """Serves responses from a recordings directory, laid out as
+       search/{crs}.json and service/{service_uid}.json. Anything not
+       recorded is generated, and every search is repeated scale times."""
+
+    def __init__(self, directory: str = None, scale: int = 1,
+                 services_per_station: int = 40, stops: int = 20):
+        self.directory = directory
+        self.scale = scale
+        self.services_per_station = services_per_station
+        self.stops = stops
+        self.scaled_uids = {}
+        self.copies = {}
+        self.lock = Lock()
+
+    def get_recording(self, kind: str, key: str) -> dict | None:
+        """Returns the recorded response, or None if there isn't one."""
+
+        if not self.directory:
+            return None
+
+        recording_path = path.join(self.directory, kind, f"{key}.json")
+
+        if not path.exists(recording_path):
+            return None
+
+        with open(recording_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get_scaled_uid(self, service_uid: str, copy: int) -> str:
+        """Returns a made-up six character UID for a copy of a service."""
+
+        with self.lock:
+            if (service_uid, copy) not in self.copies:
+                scaled_uid = f"Z{len(self.scaled_uids):05d}"
+                self.scaled_uids[scaled_uid] = service_uid
+                self.copies[(service_uid, copy)] = scaled_uid
+
+            return self.copies[(service_uid, copy)]
+
+    def get_search(self, crs: str) -> dict:
+        """Returns the search response for the station, scaled up."""
+
+        response = self.get_recording("search", crs) or get_synthetic_search_response(
+            crs, self.services_per_station)
+
+        services = response.get("services") or []
+        scaled_services = list(services)
+
+        for copy in range(1, self.scale):
+            for service in services:
+                scaled_service = dict(service)
+                scaled_service["serviceUid"] = self.get_scaled_uid(
+                    service["serviceUid"], copy)
+                scaled_services.append(scaled_service)
+
+        return {**response, "services": scaled_services}
+
+    def get_service(self, service_uid: str) -> dict:
+        """Returns the service response, mapping scaled copies back to their original."""
+
+        original_uid = self.scaled_uids.get(service_uid, service_uid)
+
+        response = self.get_recording("service", original_uid) or \
+            get_synthetic_service_response(original_uid, self.stops)
+
+        return {**response, "serviceUid": service_uid}
+
+
+def get_mock_handler(responses: RecordedResponses, latency: float, jitter: float,
+                     error_rate: float, throttle_rate: float, stats: dict):
+    """Returns a request handler class that answers like the RTT API."""
+
+    class MockRTTHandler(BaseHTTPRequestHandler):
+        """Answers search and service requests after the configured latency,
+           failing the configured fraction of them."""
+
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def send_json(self, status: int, body: dict, headers: dict = None) -> None:
+            """Writes a JSON response."""
+
+            content = json.dumps(body).encode("utf-8")
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            """Replays the recorded response for the path."""
+
+            with stats["lock"]:
+                stats["requests"] += 1
+
+            sleep(max(0.0, latency + uniform(-jitter, jitter)))
+
+            chance = random()
+            if chance < throttle_rate:
+                self.send_json(429, {"error": "Too many requests"}, {"Retry-After": "1"})
+                return
+            if chance < throttle_rate + error_rate:
+                self.send_json(503, {"error": "Service unavailable"})
+                return
+
+            parts = self.path.removeprefix(API_PREFIX).strip("/").split("/")
+
+            if parts[0] == "search" and len(parts) > 1:
+                self.send_json(200, responses.get_search(parts[1]))
+            elif parts[0] == "service" and len(parts) > 1:
+                self.send_json(200, responses.get_service(parts[1]))
+            else:
+                self.send_json(404, {"error": "Not found"})
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            """Silences the per-request access log."""
+
+    return MockRTTHandler
+
+
+def start_mock_rtt_server(responses: RecordedResponses, latency: float = 0.05,
+                          jitter: float = 0.0, error_rate: float = 0.0,
+                          throttle_rate: float = 0.0, port: int = 0) -> tuple:
+    """Starts the server in a background thread.
+       Returns the server, its base URL and its request counter."""
+
+    stats = {"requests": 0, "lock": Lock()}
+
+    ThreadingHTTPServer.request_queue_size = 128
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port),
+        get_mock_handler(responses, latency, jitter, error_rate, throttle_rate, stats))
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_address[1]}", stats
+
+
+def record_responses(config: _Environ, station_crs_list: list[str], directory: str) -> None:
+    """Saves live RTT search and service responses for the stations to the directory."""
+
+    # imported here so the server can run without live credentials set up
+    from extract import get_session, RTT_API_URL  # pylint: disable=import-outside-toplevel
+
+    session = get_session(config, 1)
+    today = date.today()
+
+    makedirs(path.join(directory, "search"), exist_ok=True)
+    makedirs(path.join(directory, "service"), exist_ok=True)
+
+    for crs in station_crs_list:
+        search = session.get(f"{RTT_API_URL}/search/{crs}").json()
+
+        with open(path.join(directory, "search", f"{crs}.json"), "w", encoding="utf-8") as f:
+            json.dump(search, f)
+
+        for service in search.get("services") or []:
+            service_uid = service["serviceUid"]
+            response = session.get(
+                f"{RTT_API_URL}/service/{service_uid}/{today.year}/{today.month:02d}/{today.day:02d}").json()
+
+            with open(path.join(directory, "service", f"{service_uid}.json"), "w",
+                      encoding="utf-8") as f:
+                json.dump(response, f)
+
+        logger.info(f"Recorded {crs} and its services")
+
+    session.close()
+
+
+if __name__ == "__main__":
+
+    load_dotenv()
+    basicConfig(level=INFO)
+
+    parser = ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the stand-in API.")
+    serve_parser.add_argument("--recordings", default=None)
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--latency", type=float, default=0.05)
+    serve_parser.add_argument("--jitter", type=float, default=0.0)
+    serve_parser.add_argument("--error-rate", type=float, default=0.0)
+    serve_parser.add_argument("--throttle-rate", type=float, default=0.0)
+    serve_parser.add_argument("--scale", type=int, default=1)
+
+    record_parser = subparsers.add_parser("record", help="Record live RTT responses.")
+    record_parser.add_argument("--recordings", default="recordings")
+    record_parser.add_argument("--stations", nargs="+", default=SYNTHETIC_STATIONS)
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_responses(ENV, args.stations, args.recordings)
+    else:
+        mock_server, url, _ = start_mock_rtt_server(
+            RecordedResponses(args.recordings, args.scale),
+            args.latency, args.jitter, args.error_rate, args.throttle_rate, args.port)
+        logger.info(f"Serving the stand-in RTT API at {url}{API_PREFIX}")
+        try:
+            while True:
+                sleep(1)
+        except KeyboardInterrupt:
+            mock_server.shutdown()
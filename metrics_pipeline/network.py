@@ -0,0 +1,122 @@
+"""Chooses which stations a pipeline run covers, splits them into shards,
+and claims services so that shards don't extract the same service twice."""
+
+import csv
+from os import _Environ
+from logging import getLogger
+from datetime import date
+from zlib import crc32
+
+from psycopg2.extensions import connection
+from psycopg2.extras import execute_values
+
+from scheduler import DEFAULT_MIN_INTERVAL
+
+
+logger = getLogger(__name__)
+
+DEFAULT_STATIONS = ["LBG", "STP", "KGX", "SHF", "LST", "WFJ"]
+DEFAULT_RUN_INTERVAL_MINUTES = 60
+# a claim outlasts one run of its shard, so it only lapses once that shard stops seeing the service
+CLAIM_EXPIRY_MARGIN_MINUTES = 15
+DEFAULT_CLAIM_EXPIRY_MINUTES = DEFAULT_RUN_INTERVAL_MINUTES + CLAIM_EXPIRY_MARGIN_MINUTES
+
+
+def get_station_crs_list(config: _Environ, conn: connection = None) -> list[str]:
+    """Returns the station crs codes to extract, from STATION_SOURCE:
+       'default' for the original six stations, 'db' for every station
+       in the station table, or 'file' for the crs column of STATION_FILE."""
+
+    source = config.get("STATION_SOURCE", "default")
+
+    if source == "default":
+        return list(DEFAULT_STATIONS)
+
+    if source == "db":
+        with conn.cursor() as cur:
+            cur.execute("SELECT station_crs FROM station ORDER BY station_crs;")
+            return [row["station_crs"] for row in cur.fetchall()]
+
+    if source == "file":
+        with open(config["STATION_FILE"], "r", encoding="utf-8") as f:
+            return sorted({row["crs"] for row in csv.DictReader(f) if row["crs"]})
+
+    raise ValueError(f"'{source}' is not a valid STATION_SOURCE.")
+
+
+def get_shard(config: _Environ, event: dict = None) -> tuple[int, int]:
+    """Returns the (shard_index, shard_count) of this run, from the
+       invocation event if it has them, otherwise from the environment."""
+
+    event = event or {}
+
+    shard_index = int(event.get("shard_index", config.get("SHARD_INDEX", 0)))
+    shard_count = int(event.get("shard_count", config.get("SHARD_COUNT", 1)))
+
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f"Invalid shard {shard_index} of {shard_count}.")
+
+    return shard_index, shard_count
+
+
+def get_shard_stations(station_crs_list: list[str], shard_index: int,
+                       shard_count: int) -> list[str]:
+    """Returns the stations belonging to the shard. Each crs is hashed,
+       so a station stays in the same shard when others are added or removed."""
+
+    return [crs for crs in station_crs_list
+            if crc32(crs.encode("utf-8")) % shard_count == shard_index]
+
+
+def get_claim_expiry_minutes(config: _Environ) -> int:
+    """Returns how long a claim lasts without being renewed: CLAIM_EXPIRY_MINUTES if set,
+       otherwise slightly longer than the interval between runs. That interval is
+       POLL_MIN_INTERVAL with the adaptive schedule, and an hour otherwise."""
+
+    if config.get("CLAIM_EXPIRY_MINUTES"):
+        return int(config["CLAIM_EXPIRY_MINUTES"])
+
+    run_interval = DEFAULT_RUN_INTERVAL_MINUTES
+
+    if config.get("POLL_SCHEDULE") == "adaptive":
+        run_interval = int(config.get("POLL_MIN_INTERVAL", DEFAULT_MIN_INTERVAL))
+
+    return run_interval + CLAIM_EXPIRY_MARGIN_MINUTES
+
+
+def claim_services(conn: connection, services: list[dict], shard_index: int,
+                   run_date: date = None,
+                   expiry_minutes: int = DEFAULT_CLAIM_EXPIRY_MINUTES) -> list[dict]:
+    """Claims the services for this shard and returns the ones it now owns.
+       A service stays with the shard that first claimed it that day, unless
+       that claim hasn't been renewed within expiry_minutes."""
+
+    if not services:
+        return []
+
+    run_date = run_date or date.today()
+
+    with conn.cursor() as cur:
+        claimed = execute_values(cur, f"""
+                    INSERT INTO service_claim (service_uid, run_date, shard_index)
+                    VALUES %s
+                    ON CONFLICT (service_uid, run_date) DO UPDATE SET
+                        shard_index = EXCLUDED.shard_index,
+                        claimed_at = CURRENT_TIMESTAMP
+                    WHERE service_claim.shard_index = EXCLUDED.shard_index
+                    OR service_claim.claimed_at
+                        < CURRENT_TIMESTAMP - INTERVAL '{int(expiry_minutes)} minutes'
+                    RETURNING service_uid;
+                    """,
+                    [(service_uid, run_date, shard_index)
+                     for service_uid in {service["service_uid"] for service in services}],
+                    fetch=True)
+    conn.commit()
+
+    claimed_uids = {row["service_uid"] for row in claimed}
+
+    logger.info(
+        f"Shard {shard_index} claimed {len(claimed_uids)} of {len(services)} services")
+
+    return [service for service in services if service["service_uid"] in claimed_uids]
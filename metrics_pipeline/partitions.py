@@ -0,0 +1,201 @@
+"""Manages the monthly partitions of the arrival table. Partitions are created a few
+months ahead of the arrivals loaded into them, and those older than the retention
+period are detached into an archive schema, so MERGEs, queries and VACUUM only
+touch the recent months."""
+
+from datetime import date, datetime
+from logging import getLogger
+from os import _Environ
+
+from psycopg2.extensions import connection
+
+
+logger = getLogger(__name__)
+
+DEFAULT_MONTHS_AHEAD = 2
+# 0 keeps every partition attached
+DEFAULT_RETENTION_MONTHS = 0
+ARCHIVE_SCHEMA = "arrival_archive"
+PARTITION_LOCK_ID = 7240002
+
+
+def get_month_start(day: date, months: int = 0) -> date:
+    """Returns the first day of the month the given number of months after the day's month."""
+
+    month_index = day.year * 12 + day.month - 1 + months
+
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_months(start: date, end: date) -> list[date]:
+    """Returns the first day of every month from start's month to end's month inclusive."""
+
+    months = []
+    month = get_month_start(start)
+
+    while month <= end:
+        months.append(month)
+        month = get_month_start(month, 1)
+
+    return months
+
+
+def get_partition_name(month: date) -> str:
+    """Returns the name of the arrival partition for the month."""
+
+    return f"arrival_{month:%Y_%m}"
+
+
+def get_partition_month(partition_name: str) -> date | None:
+    """Returns the month of an arrival partition, or None if it isn't a monthly partition."""
+
+    try:
+        return datetime.strptime(partition_name, "arrival_%Y_%m").date()
+    except ValueError:
+        return None
+
+
+def get_partitions(conn: connection) -> list[str]:
+    """Returns the names of the partitions attached to the arrival table."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+                    SELECT C.relname AS partition_name
+                    FROM pg_inherits AS I
+                    JOIN pg_class AS C ON C.oid = I.inhrelid
+                    WHERE I.inhparent = 'arrival'::REGCLASS;
+                    """)
+
+        result = cur.fetchall()
+
+    return [row["partition_name"] for row in result]
+
+
+def get_archived_partitions(conn: connection) -> list[str]:
+    """Returns the names of the partitions which have been moved into the archive schema."""
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT tablename AS partition_name FROM pg_tables WHERE schemaname = %s;",
+                    (ARCHIVE_SCHEMA,))
+
+        result = cur.fetchall()
+
+    return [row["partition_name"] for row in result]
+
+
+def get_archive_before(config: _Environ, today: date = None) -> date | None:
+    """Returns the first month kept attached under PARTITION_RETENTION_MONTHS,
+       counting this one, or None if every partition is kept."""
+
+    retention_months = int(config.get("PARTITION_RETENTION_MONTHS", DEFAULT_RETENTION_MONTHS))
+
+    if retention_months < 0:
+        raise ValueError("PARTITION_RETENTION_MONTHS must not be negative.")
+
+    if not retention_months:
+        return None
+
+    return get_month_start(today or date.today(), 1 - retention_months)
+
+
+def get_archived_days(config: _Environ, conn: connection, days: list[date]) -> list[date]:
+    """Returns the days whose month has been archived, or is old enough to be.
+       Loading them would recreate a partition alongside its archived copy,
+       which the next run would fail to archive."""
+
+    archive_before = get_archive_before(config)
+    archived = set(get_archived_partitions(conn))
+
+    return [day for day in days
+            if (archive_before and day < archive_before)
+            or get_partition_name(get_month_start(day)) in archived]
+
+
+def get_expired_partitions(partitions: list[str], before: date) -> list[str]:
+    """Returns the monthly partitions of months before the given one, oldest first."""
+
+    return sorted(name for name in partitions
+                  if get_partition_month(name) and get_partition_month(name) < before)
+
+
+def create_partitions(conn: connection, months: list[date]) -> list[str]:
+    """Creates the partitions of the months which don't have one yet, without committing."""
+
+    existing = set(get_partitions(conn))
+    created = []
+
+    with conn.cursor() as cur:
+        for month in months:
+            name = get_partition_name(month)
+            if name in existing:
+                continue
+
+            cur.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {name}
+                        PARTITION OF arrival
+                        FOR VALUES FROM ('{month.isoformat()}')
+                        TO ('{get_month_start(month, 1).isoformat()}');
+                        """)
+            created.append(name)
+
+    return created
+
+
+def archive_partitions(conn: connection, before: date) -> list[str]:
+    """Detaches the partitions of months before the given one and moves them into the
+       archive schema, where they can still be queried, dumped or dropped. Doesn't commit."""
+
+    archived = get_expired_partitions(get_partitions(conn), before)
+
+    if not archived:
+        return []
+
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA};")
+
+        for name in archived:
+            cur.execute(f"ALTER TABLE arrival DETACH PARTITION {name};")
+            cur.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA};")
+
+    return archived
+
+
+def manage_partitions(config: _Environ, conn: connection, today: date = None) -> None:
+    """Creates the partitions for this month and PARTITION_MONTHS_AHEAD months ahead, and
+       archives those older than PARTITION_RETENTION_MONTHS months, counting this one.
+       Runs which find nothing to do return without locking. Otherwise shards take
+       turns under an advisory lock."""
+
+    today = today or date.today()
+    months_ahead = int(config.get("PARTITION_MONTHS_AHEAD", DEFAULT_MONTHS_AHEAD))
+
+    if months_ahead < 0:
+        raise ValueError("PARTITION_MONTHS_AHEAD must not be negative.")
+
+    months = get_months(today, get_month_start(today, months_ahead))
+    archive_before = get_archive_before(config, today)
+
+    partitions = set(get_partitions(conn))
+    missing = [month for month in months if get_partition_name(month) not in partitions]
+    expired = get_expired_partitions(partitions, archive_before) if archive_before else []
+
+    # ends the transaction the lookup opened, so the connection isn't left idle in it
+    if not missing and not expired:
+        conn.rollback()
+        return
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (PARTITION_LOCK_ID,))
+
+        created = create_partitions(conn, months)
+        archived = archive_partitions(conn, archive_before) if archive_before else []
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if created:
+        logger.info(f"Created arrival partitions: {', '.join(created)}")
+    if archived:
+        logger.info(f"Archived arrival partitions to {ARCHIVE_SCHEMA}: {', '.join(archived)}")
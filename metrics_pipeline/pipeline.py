@@ -10,6 +10,15 @@ from dotenv import load_dotenv
 from extract import extract
 from transform import transform, get_db_connection
 from load import load
+from streaming import run_streaming_pipeline
+from network import (get_station_crs_list, get_shard, get_shard_stations, claim_services,
+                     get_claim_expiry_minutes)
+from cache_store import get_cache_store
+from schedule_cache import ScheduleCache
+from digest_cache import ArrivalDigestCache
+from checkpoint import ExtractCheckpoint, get_deadline_check
+from scheduler import PollSchedule, get_poll_intervals, DEFAULT_MIN_INTERVAL
+from partitions import manage_partitions
 
 
 logger = getLogger()
@@ -23,11 +32,67 @@ def handler(event=None, context=None):
 
     conn = get_db_connection(ENV)
 
-    chosen_stations = ["LBG", "STP", "KGX", "SHF", "LST", "WFJ"]
-    extracted_data = extract(ENV, chosen_stations)
-    transformed_data = transform(ENV, extracted_data, conn)
-
-    load(ENV, conn, transformed_data)
+    manage_partitions(ENV, conn)
+
+    shard_index, shard_count = get_shard(ENV, event)
+    chosen_stations = get_shard_stations(
+        get_station_crs_list(ENV, conn), shard_index, shard_count)
+    logger.info(
+        f"Shard {shard_index} of {shard_count} covers {len(chosen_stations)} stations")
+
+    # shards claim services on their own connection, as streaming
+    # mode claims from the extract thread while loading on this one
+    claim_conn = None
+    service_filter = None
+
+    if shard_count > 1:
+        claim_conn = get_db_connection(ENV)
+        claim_expiry = get_claim_expiry_minutes(ENV)
+        service_filter = lambda services: claim_services(  # pylint: disable=unnecessary-lambda-assignment
+            claim_conn, services, shard_index, expiry_minutes=claim_expiry)
+
+    cache_store = get_cache_store(ENV)
+
+    # the adaptive schedule only polls the stations whose interval has passed
+    poll_schedule = None
+
+    if ENV.get("POLL_SCHEDULE") == "adaptive":
+        poll_schedule = PollSchedule(
+            cache_store, name=f"shard-{shard_index}",
+            tick_minutes=int(ENV.get("POLL_MIN_INTERVAL", DEFAULT_MIN_INTERVAL)))
+        chosen_stations = poll_schedule.get_due_stations(
+            get_poll_intervals(ENV, conn, chosen_stations, shard_count))
+
+    schedule_cache = ScheduleCache(cache_store, name=f"shard-{shard_index}")
+    digests = ArrivalDigestCache(cache_store, name=f"shard-{shard_index}")
+
+    # stop extracting while there's still time to load, resuming next invocation
+    checkpoint = ExtractCheckpoint(cache_store, name=f"shard-{shard_index}")
+    should_stop = get_deadline_check(ENV, context)
+
+    try:
+        if ENV.get("PIPELINE_MODE") == "stream":
+            run_streaming_pipeline(ENV, conn, chosen_stations, service_filter,
+                                   schedule_cache, checkpoint, should_stop, digests)
+        else:
+            extracted_data = extract(ENV, chosen_stations, service_filter=service_filter,
+                                     schedule_cache=schedule_cache, checkpoint=checkpoint,
+                                     should_stop=should_stop)
+            transformed_data = transform(ENV, extracted_data, conn)
+
+            load(ENV, conn, transformed_data, digests)
+            schedule_cache.add(extracted_data["schedules"])
+            schedule_cache.save()
+            digests.save()
+            checkpoint.save()
+
+        # only the station cut short by the deadline and those after it stay due,
+        # so each invocation gets further through the due list
+        if poll_schedule:
+            poll_schedule.record(checkpoint.get_completed_stations(chosen_stations))
+    finally:
+        if claim_conn:
+            claim_conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+"""Maintains arrival_hourly, a rollup of arrivals by date, hour, station and operator
+holding counts, cancellations, delay sums and delay-band counts. Each load only
+recomputes the hours it touched, and running this script rebuilds the rollup."""
+
+from argparse import ArgumentParser
+from datetime import date
+from logging import getLogger, basicConfig, INFO
+from os import environ as ENV
+
+from dotenv import load_dotenv
+from psycopg2.extensions import connection
+
+from transform import get_db_connection
+
+
+logger = getLogger(__name__)
+
+# loads refreshing the same station take turns, so neither misses the other's arrivals
+ROLLUP_LOCK_ID = 7240003
+
+ROLLUP_COLUMNS = """(arrival_date, arrival_hour, station_id, operator_id, arrivals,
+                     cancelled, reported, delay_minutes, on_time, delayed_1_to_4,
+                     delayed_5_to_14, delayed_15_to_29, delayed_30_plus)"""
+
+
+def get_rollup_query(arrival_filter: str) -> str:
+    """Returns the query aggregating the arrivals picked out by the filter, which
+       can join or restrict arrival AS A. An arrival's hour is that of its scheduled
+       time, or of its actual time if it wasn't booked. Delays are in minutes,
+       wrapped across midnight, early arrivals count as on time and cancelled
+       arrivals have no delay. Arrivals at an unknown station are left out."""
+
+    return f"""
+            SELECT arrival_date,
+                   arrival_hour,
+                   station_id,
+                   operator_id,
+                   COUNT(*) AS arrivals,
+                   COUNT(*) FILTER (WHERE cancelled) AS cancelled,
+                   COUNT(delay) AS reported,
+                   COALESCE(SUM(GREATEST(delay, 0)), 0) AS delay_minutes,
+                   COUNT(*) FILTER (WHERE delay < 1) AS on_time,
+                   COUNT(*) FILTER (WHERE delay >= 1 AND delay < 5) AS delayed_1_to_4,
+                   COUNT(*) FILTER (WHERE delay >= 5 AND delay < 15) AS delayed_5_to_14,
+                   COUNT(*) FILTER (WHERE delay >= 15 AND delay < 30) AS delayed_15_to_29,
+                   COUNT(*) FILTER (WHERE delay >= 30) AS delayed_30_plus
+            FROM (SELECT A.arrival_date,
+                         EXTRACT(HOUR FROM COALESCE(A.scheduled_time, A.actual_time))::SMALLINT
+                             AS arrival_hour,
+                         A.arrival_station_id AS station_id,
+                         SV.operator_id,
+                         COALESCE(A.location_cancelled, FALSE) AS cancelled,
+                         -- a train booked at 23:58 arriving at 00:05 is 7 minutes late
+                         CASE WHEN NOT COALESCE(A.location_cancelled, FALSE)
+                              THEN MOD(EXTRACT(EPOCH FROM A.actual_time - A.scheduled_time)::NUMERIC
+                                       / 60 + 2160, 1440) - 720
+                         END AS delay
+                  FROM arrival AS A
+                  JOIN service AS SV USING (service_id)
+                  {arrival_filter}) AS arrival_delay
+            WHERE arrival_hour IS NOT NULL
+            AND station_id IS NOT NULL
+            GROUP BY arrival_date, arrival_hour, station_id, operator_id
+            """
+
+
+def stage_touched_hours(conn: connection) -> None:
+    """Records the station hours the staged arrivals will change, before they're merged.
+       Both the staged and current hours are kept, in case a booked time has moved."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+                    CREATE TEMPORARY TABLE rollup_touched ON COMMIT DROP AS
+                    SELECT ST.arrival_date,
+                           ST.arrival_station_id AS station_id,
+                           EXTRACT(HOUR FROM COALESCE(ST.scheduled_time, ST.actual_time))::SMALLINT
+                               AS arrival_hour
+                    FROM arrival_staging AS ST
+                    WHERE ST.arrival_station_id IS NOT NULL
+                    UNION
+                    SELECT A.arrival_date,
+                           A.arrival_station_id,
+                           EXTRACT(HOUR FROM COALESCE(A.scheduled_time, A.actual_time))::SMALLINT
+                    FROM arrival_staging AS ST
+                    JOIN service AS SV ON SV.service_uid = ST.service_uid
+                    JOIN arrival AS A
+                        ON A.arrival_date = ST.arrival_date
+                        AND A.arrival_station_id = ST.arrival_station_id
+                        AND A.service_id = SV.service_id;
+                    """)
+
+
+def refresh_touched_hours(conn: connection) -> int:
+    """Recomputes the rollup of the station hours recorded before the merge,
+       without committing. Returns how many station hours were refreshed."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+                    SELECT pg_advisory_xact_lock(%s, station_id)
+                    FROM (SELECT DISTINCT station_id
+                          FROM rollup_touched
+                          ORDER BY station_id) AS touched_station;
+                    """, (ROLLUP_LOCK_ID,))
+
+        cur.execute("""
+                    DELETE FROM arrival_hourly AS H
+                    USING rollup_touched AS T
+                    WHERE H.arrival_date = T.arrival_date
+                    AND H.station_id = T.station_id
+                    AND H.arrival_hour = T.arrival_hour;
+                    """)
+
+        cur.execute(f"""
+                    INSERT INTO arrival_hourly {ROLLUP_COLUMNS}
+                    {get_rollup_query('''
+                    JOIN rollup_touched AS T
+                        ON T.arrival_date = A.arrival_date
+                        AND T.station_id = A.arrival_station_id
+                        AND T.arrival_hour
+                            = EXTRACT(HOUR FROM COALESCE(A.scheduled_time, A.actual_time))''')};
+                    """)
+
+        cur.execute("SELECT COUNT(*) AS touched FROM rollup_touched;")
+
+        touched = cur.fetchone()["touched"]
+
+    logger.info(f"Refreshed the hourly rollup of {touched} station hours")
+
+    return touched
+
+
+def rebuild_rollup(conn: connection, start: date = None, end: date = None) -> int:
+    """Regenerates the rollup from the arrival table, for every day or those from
+       start to end inclusive. Loads wait until the rebuild has committed.
+       Returns how many rollup rows were written."""
+
+    dates = {"start": start, "end": end}
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE arrival_hourly IN SHARE ROW EXCLUSIVE MODE;")
+
+            cur.execute("""
+                        DELETE FROM arrival_hourly
+                        WHERE (%(start)s IS NULL OR arrival_date >= %(start)s)
+                        AND (%(end)s IS NULL OR arrival_date <= %(end)s);
+                        """, dates)
+
+            cur.execute(f"""
+                        INSERT INTO arrival_hourly {ROLLUP_COLUMNS}
+                        {get_rollup_query('''
+                        WHERE (%(start)s IS NULL OR A.arrival_date >= %(start)s)
+                        AND (%(end)s IS NULL OR A.arrival_date <= %(end)s)''')};
+                        """, dates)
+
+            written = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    logger.info(f"Rebuilt the hourly rollup with {written} rows")
+
+    return written
+
+
+if __name__ == "__main__":
+
+    load_dotenv()
+    basicConfig(level=INFO)
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--start", type=date.fromisoformat,
+                        help="First day to rebuild (YYYY-MM-DD). Defaults to the earliest.")
+    parser.add_argument("--end", type=date.fromisoformat,
+                        help="Last day to rebuild (YYYY-MM-DD). Defaults to the latest.")
+    args = parser.parse_args()
+
+    conn = get_db_connection(ENV)
+
+    try:
+        rebuild_rollup(conn, args.start, args.end)
+    finally:
+        conn.close()
@@ -0,0 +1,233 @@
+"""The shared RTT client layer, which rate limits, retries and times out every API request."""
+
+from os import _Environ
+from logging import getLogger
+from threading import Lock
+from time import monotonic, sleep
+from random import uniform
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import requests
+
+
+logger = getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of making a request while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """A thread-safe token bucket which adapts its refill rate to throttling."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.lock = Lock()
+
+    def refill(self) -> None:
+        """Adds the tokens accrued since the last refill, up to capacity."""
+
+        now = monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """Takes a token, sleeping until one is available.
+        Returns the number of seconds spent waiting."""
+
+        waited = 0.0
+
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+
+            sleep(wait)
+            waited += wait
+
+    def slow_down(self) -> None:
+        """Halves the refill rate after the API throttles us."""
+
+        with self.lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def speed_up(self) -> None:
+        """Creeps the refill rate back towards its configured maximum."""
+
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """Stops requests for a cool-off period after too many consecutive failures."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.lock = Lock()
+
+    def check(self) -> None:
+        """Raises CircuitOpenError if the breaker is open.
+        Once the cool-off has passed a trial request is let through."""
+
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if monotonic() - self.opened_at >= self.reset_seconds:
+                self.opened_at = None
+                self.failures = self.failure_threshold - 1
+                return
+
+        raise CircuitOpenError("RTT circuit breaker is open.")
+
+    def record_success(self) -> None:
+        """Closes the breaker after a successful request."""
+
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        """Counts a failed request, opening the breaker at the threshold."""
+
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = monotonic()
+                logger.warning("RTT circuit breaker opened")
+
+
+def get_retry_after(response: requests.Response) -> float:
+    """Returns the seconds asked for by a Retry-After header, or 0 if there isn't one."""
+
+    retry_after = response.headers.get("Retry-After")
+
+    if not retry_after:
+        return 0.0
+
+    if retry_after.isdigit():
+        return float(retry_after)
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return 0.0
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RTTSession(requests.Session):
+    """A requests session which every RTT call goes through.
+    Requests are rate limited by a shared token bucket, given a timeout,
+    retried with jittered exponential backoff and guarded by a circuit breaker."""
+
+    def __init__(self, rate: float = 10.0, burst: float = 10.0, timeout: float = 10.0,
+                 max_retries: int = 4, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 failure_threshold: int = 10, reset_seconds: float = 30.0):
+        super().__init__()
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {"requests": 0, "retries": 0, "throttles": 0,
+                      "failures": 0, "rejected": 0, "wait_seconds": 0.0}
+        self.stats_lock = Lock()
+
+    def count(self, stat: str, amount: float = 1) -> None:
+        """Adds to one of the per-run counters."""
+
+        with self.stats_lock:
+            self.stats[stat] += amount
+
+    def get_backoff(self, attempt: int) -> float:
+        """Returns a full-jitter exponential backoff for the given attempt."""
+
+        return uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        """Sends a request, retrying timeouts, connection errors, 429s and 5xxs."""
+
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+
+        while True:
+            try:
+                self.breaker.check()
+            except CircuitOpenError:
+                self.count("rejected")
+                raise
+            self.count("wait_seconds", self.bucket.acquire())
+            self.count("requests")
+
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    self.count("failures")
+                    raise
+                delay = self.get_backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    self.breaker.record_success()
+                    self.bucket.speed_up()
+                    return response
+
+                if response.status_code == 429:
+                    self.count("throttles")
+                    self.bucket.slow_down()
+                else:
+                    self.breaker.record_failure()
+
+                if attempt >= self.max_retries:
+                    self.count("failures")
+                    response.raise_for_status()
+
+                delay = max(get_retry_after(response), self.get_backoff(attempt))
+                response.close()
+
+            attempt += 1
+            self.count("retries")
+            self.count("wait_seconds", delay)
+            sleep(delay)
+
+    def log_stats(self) -> None:
+        """Logs the per-run request counters."""
+
+        with self.stats_lock:
+            stats = dict(self.stats)
+
+        logger.info(
+            f"RTT requests: {stats['requests']}, retries: {stats['retries']}, "
+            f"throttles: {stats['throttles']}, failures: {stats['failures']}, "
+            f"rejected by the circuit breaker: {stats['rejected']}, "
+            f"waiting: {stats['wait_seconds']:.2f}s")
+
+
+def get_rtt_session(config: _Environ) -> RTTSession:
+    """Returns an RTT session configured from the environment."""
+
+    return RTTSession(
+        rate=float(config.get("RTT_RATE_LIMIT", 10)),
+        burst=float(config.get("RTT_BURST", 10)),
+        timeout=float(config.get("RTT_TIMEOUT", 10)),
+        max_retries=int(config.get("RTT_MAX_RETRIES", 4)),
+        failure_threshold=int(config.get("RTT_BREAKER_THRESHOLD", 10)),
+        reset_seconds=float(config.get("RTT_BREAKER_RESET", 30))
+    )
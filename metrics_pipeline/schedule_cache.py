@@ -0,0 +1,101 @@
+"""Cache of each service's static timetable for a run date, so later runs
+only need to process the realtime fields of services already loaded."""
+
+import json
+from datetime import date
+from logging import getLogger
+from threading import Lock
+
+from cache_store import LocalCacheStore, S3CacheStore
+
+
+logger = getLogger(__name__)
+
+
+def get_service_schedule(service: dict, arrivals: list) -> dict:
+    """Returns the parts of a service which don't change during the day:
+       its origin, destination, operator and booked arrival at each stop.
+       The booked arrivals are listed by station in calling order, as a
+       service can call at the same station more than once."""
+
+    booked = {}
+    for arrival in arrivals:
+        booked.setdefault(arrival.crs, []).append(arrival.scheduled_arr_time)
+
+    return {
+        "origin_station": service["origin_station"],
+        "destination_station": service["destination_station"],
+        "operator_name": service["operator_name"],
+        "booked": booked
+    }
+
+
+def get_booked_times(schedule: dict, crs_list: list[str]) -> list[str | None]:
+    """Returns the booked arrival of each stop in the calling order given, matching
+       each call at a station to that station's booked arrivals in turn."""
+
+    calls = {}
+    booked_times = []
+
+    for crs in crs_list:
+        times = schedule["booked"].get(crs, [])
+        call = calls.get(crs, 0)
+        calls[crs] = call + 1
+        booked_times.append(times[call] if call < len(times) else None)
+
+    return booked_times
+
+
+class ScheduleCache:
+    """The timetables of the services already loaded on a run date.
+       New timetables are only saved once the run has loaded them."""
+
+    def __init__(self, store: LocalCacheStore | S3CacheStore,
+                 run_date: date = None, name: str = "shard-0"):
+        self.store = store
+        # v2 lists each station's booked arrivals, where v1 kept only the last
+        self.key = f"schedules/v2/{(run_date or date.today()).isoformat()}/{name}.json"
+        self.lock = Lock()
+
+        content = store.get(self.key)
+        self.known = json.loads(content) if content else {}
+        self.pending = {}
+        self.stats = {"known": 0, "new": 0}
+
+    def get(self, service_uid: str) -> dict | None:
+        """Returns the saved timetable of the service, or None if it hasn't been loaded yet."""
+
+        schedule = self.known.get(service_uid)
+
+        with self.lock:
+            self.stats["known" if schedule else "new"] += 1
+
+        return schedule
+
+    def add(self, schedules: dict[str, dict]) -> None:
+        """Holds new timetables, by service UID, until the run is saved.
+           Only add them once their services have been loaded."""
+
+        with self.lock:
+            self.pending.update(schedules)
+
+    def save(self) -> None:
+        """Saves the new timetables, once their services have been loaded."""
+
+        with self.lock:
+            if not self.pending:
+                return
+            self.known.update(self.pending)
+            self.pending = {}
+            content = json.dumps(self.known).encode("utf-8")
+
+        self.store.put(self.key, content)
+
+    def log_stats(self) -> None:
+        """Logs how many services were already known this run."""
+
+        with self.lock:
+            stats = dict(self.stats)
+
+        logger.info(
+            f"Schedule cache known services: {stats['known']}, new services: {stats['new']}")
@@ -0,0 +1,201 @@
+"""Adaptive polling scheduler, which gives each station a poll interval
+based on how volatile its arrivals have been recently, while keeping the
+whole network within a daily RTT request budget."""
+
+import json
+from datetime import datetime
+from logging import getLogger
+from math import sqrt
+from os import _Environ
+
+from psycopg2.extensions import connection
+
+from cache_store import LocalCacheStore, S3CacheStore
+
+
+logger = getLogger(__name__)
+
+DEFAULT_DAILY_BUDGET = 50000
+DEFAULT_MIN_INTERVAL = 15
+DEFAULT_MAX_INTERVAL = 240
+DEFAULT_LOOKBACK_DAYS = 7
+
+# quiet stations still get a share of polls even with nothing running
+MIN_ACTIVITY = 0.1
+MINUTES_PER_DAY = 1440
+
+
+def get_station_volatility(conn: connection, station_crs_list: list[str],
+                           lookback_days: int = DEFAULT_LOOKBACK_DAYS) -> list[dict]:
+    """Returns each station's delay variance (in minutes squared) and services per day
+       over the lookback, and the share of today's services still in progress."""
+
+    sql = """
+          WITH today_service AS (
+              SELECT service_id,
+                     BOOL_OR(actual_time IS NOT NULL) AS started,
+                     BOOL_OR(actual_time IS NULL
+                             AND NOT COALESCE(location_cancelled, FALSE)) AS unfinished
+              FROM arrival
+              WHERE arrival_date = CURRENT_DATE
+              GROUP BY service_id
+          )
+          SELECT S.station_crs,
+                 VAR_SAMP(MOD(EXTRACT(EPOCH FROM A.actual_time - A.scheduled_time)::NUMERIC / 60
+                              + 2160, 1440) - 720) AS delay_variance,
+                 COUNT(DISTINCT A.service_id)::FLOAT / %(lookback_days)s AS services_per_day,
+                 COUNT(DISTINCT A.service_id) FILTER (WHERE T.started AND T.unfinished)::FLOAT
+                     / NULLIF(COUNT(DISTINCT T.service_id), 0) AS in_progress_share
+          FROM arrival AS A
+          JOIN station AS S ON S.station_id = A.arrival_station_id
+          LEFT JOIN today_service AS T ON T.service_id = A.service_id
+              AND A.arrival_date = CURRENT_DATE
+          WHERE A.arrival_date > CURRENT_DATE - %(lookback_days)s
+          AND S.station_crs = ANY(%(stations)s)
+          GROUP BY S.station_crs;
+          """
+
+    with conn.cursor() as cur:
+        cur.execute(sql, {"lookback_days": lookback_days, "stations": station_crs_list})
+
+        result = cur.fetchall()
+
+    return result
+
+
+def get_station_weight(volatility: dict) -> float:
+    """Returns how much a station's data is changing: its delay
+       spread scaled by the share of its services still running."""
+
+    delay_spread = sqrt(float(volatility.get("delay_variance") or 0))
+    in_progress_share = float(volatility.get("in_progress_share") or 0)
+
+    return (1 + delay_spread) * (MIN_ACTIVITY + in_progress_share)
+
+
+def get_poll_cost(volatility: dict) -> float:
+    """Returns the estimated RTT requests per poll of a station: one search,
+       plus one request for each service in the hour the search covers."""
+
+    return 1 + float(volatility.get("services_per_day") or 0) / 24
+
+
+def allocate_poll_intervals(volatility_list: list[dict], station_crs_list: list[str],
+                            daily_budget: int, min_interval: int = DEFAULT_MIN_INTERVAL,
+                            max_interval: int = DEFAULT_MAX_INTERVAL) -> dict[str, int]:
+    """Returns the poll interval in minutes for each station. Polls are shared out
+       in proportion to each station's weight, then clamped between the intervals,
+       with the requests freed or taken by the clamping shared among the rest."""
+
+    if not 0 < min_interval <= max_interval:
+        raise ValueError("Poll intervals must be positive, with the minimum at most the maximum.")
+
+    known = {entry["station_crs"]: entry for entry in volatility_list}
+
+    # stations without recent arrivals are treated as average until they have some
+    default_cost = sum(get_poll_cost(entry) for entry in volatility_list) / len(
+        volatility_list) if volatility_list else 1.0
+
+    weights = {crs: get_station_weight(known[crs]) if crs in known else 1.0
+               for crs in station_crs_list}
+    costs = {crs: get_poll_cost(known[crs]) if crs in known else default_cost
+             for crs in station_crs_list}
+
+    fewest_polls = MINUTES_PER_DAY / max_interval
+    most_polls = MINUTES_PER_DAY / min_interval
+
+    polls = {}
+    free = set(station_crs_list)
+
+    while free:
+        remaining_budget = daily_budget - sum(polls[crs] * costs[crs] for crs in polls)
+        free_demand = sum(weights[crs] * costs[crs] for crs in free)
+        scale = max(remaining_budget, 0) / free_demand
+
+        # capping the busiest stations frees requests which can lift others off
+        # the floor, so the cap is settled before any station is held at the floor
+        clamped = {crs: most_polls for crs in free if scale * weights[crs] > most_polls}
+        if not clamped:
+            clamped = {crs: fewest_polls for crs in free if scale * weights[crs] < fewest_polls}
+
+        if not clamped:
+            polls.update({crs: scale * weights[crs] for crs in free})
+            break
+
+        polls.update(clamped)
+        free -= set(clamped)
+
+    requests = sum(polls[crs] * costs[crs] for crs in station_crs_list)
+    if requests > daily_budget * 1.01:
+        logger.warning(f"Polling every station at least every {max_interval} minutes "
+                       f"needs {requests:.0f} requests, over the budget of {daily_budget}")
+
+    return {crs: max(min_interval, min(max_interval, round(MINUTES_PER_DAY / polls[crs])))
+            for crs in station_crs_list}
+
+
+def get_poll_intervals(config: _Environ, conn: connection, station_crs_list: list[str],
+                       shard_count: int = 1) -> dict[str, int]:
+    """Returns the poll interval of each station, sharing RTT_DAILY_BUDGET between the shards."""
+
+    daily_budget = int(config.get("RTT_DAILY_BUDGET", DEFAULT_DAILY_BUDGET)) / shard_count
+    min_interval = int(config.get("POLL_MIN_INTERVAL", DEFAULT_MIN_INTERVAL))
+    max_interval = int(config.get("POLL_MAX_INTERVAL", DEFAULT_MAX_INTERVAL))
+
+    volatility_list = get_station_volatility(
+        conn, station_crs_list,
+        int(config.get("POLL_LOOKBACK_DAYS", DEFAULT_LOOKBACK_DAYS)))
+
+    intervals = allocate_poll_intervals(volatility_list, station_crs_list,
+                                        daily_budget, min_interval, max_interval)
+
+    for entry in volatility_list:
+        logger.info(f"Station {entry['station_crs']} polled every "
+                    f"{intervals[entry['station_crs']]} minutes "
+                    f"(delay variance {float(entry['delay_variance'] or 0):.1f}, "
+                    f"in progress {float(entry['in_progress_share'] or 0):.2f}, "
+                    f"{float(entry['services_per_day'] or 0):.0f} services per day)")
+
+    logger.info(f"Allocated a daily budget of {daily_budget:.0f} requests "
+                f"across {len(station_crs_list)} stations")
+
+    return intervals
+
+
+class PollSchedule:
+    """When each station was last polled, so each invocation
+       only extracts the stations whose interval has passed."""
+
+    def __init__(self, store: LocalCacheStore | S3CacheStore, name: str = "shard-0",
+                 tick_minutes: int = DEFAULT_MIN_INTERVAL):
+        self.store = store
+        self.key = f"scheduler/{name}.json"
+        self.tick_minutes = tick_minutes
+
+        content = store.get(self.key)
+        self.last_polled = json.loads(content) if content else {}
+
+    def get_due_stations(self, intervals: dict[str, int], now: datetime = None) -> list[str]:
+        """Returns the stations whose interval has passed since they were last polled.
+           Half a tick is allowed for, as invocations don't start exactly on time."""
+
+        now = now or datetime.now()
+        due = []
+
+        for crs, interval in intervals.items():
+            last_polled = self.last_polled.get(crs)
+            if last_polled is None or (now - datetime.fromisoformat(last_polled)
+                                       ).total_seconds() / 60 >= interval - self.tick_minutes / 2:
+                due.append(crs)
+
+        logger.info(f"{len(due)} of {len(intervals)} stations are due to be polled")
+
+        return due
+
+    def record(self, station_crs_list: list[str], now: datetime = None) -> None:
+        """Stores that the stations have been polled and loaded."""
+
+        polled_at = (now or datetime.now()).isoformat(timespec="seconds")
+        self.last_polled.update({crs: polled_at for crs in station_crs_list})
+
+        self.store.put(self.key, json.dumps(self.last_polled).encode("utf-8"))
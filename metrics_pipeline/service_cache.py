@@ -0,0 +1,104 @@
+"""Cache of RTT service responses for services which have finished running,
+so later runs on the same day don't download them again."""
+
+import json
+from logging import getLogger
+from threading import Lock
+
+from cache_store import LocalCacheStore, S3CacheStore
+
+
+logger = getLogger(__name__)
+
+
+def is_service_terminal(response: dict) -> bool:
+    """Returns True if every stop with a booked arrival has either
+       an actual arrival or a cancellation, so the response can no longer change."""
+
+    locations = response.get("locations")
+
+    if not locations:
+        return False
+
+    for location in locations:
+        if not location.get("gbttBookedArrival"):
+            continue
+        if location.get("cancelReasonCode"):
+            continue
+        if location.get("realtimeArrival") and location.get("realtimeArrivalActual"):
+            continue
+        return False
+
+    return True
+
+
+class ServiceResponseCache:
+    """Stores terminal service responses keyed by service_uid and run date,
+       counting hits, misses and the bytes not downloaded each run.
+       The cached services of a run date are listed once, so a service
+       that isn't cached costs no request to the store."""
+
+    def __init__(self, store: LocalCacheStore | S3CacheStore):
+        self.store = store
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "bytes_saved": 0}
+        self.lock = Lock()
+        self.cached = {}
+
+    def count(self, stat: str, amount: int = 1) -> None:
+        """Adds to one of the per-run counters."""
+
+        with self.lock:
+            self.stats[stat] += amount
+
+    def get(self, service_uid: str, run_date: str) -> dict | None:
+        """Returns the cached response for the service, or None if it has to be fetched."""
+
+        content = None
+
+        if service_uid in self.get_cached_uids(run_date):
+            content = self.store.get(f"services/{run_date}/{service_uid}.json")
+
+        if content is None:
+            self.count("misses")
+            return None
+
+        self.count("hits")
+        self.count("bytes_saved", len(content))
+
+        return json.loads(content)
+
+    def get_cached_uids(self, run_date: str) -> set[str]:
+        """Returns the UIDs of the services cached for the run date,
+           listing them from the store the first time they're needed."""
+
+        with self.lock:
+            if run_date not in self.cached:
+                self.cached[run_date] = {
+                    key.rsplit("/", 1)[-1].removesuffix(".json")
+                    for key in self.store.list_keys(f"services/{run_date}")}
+
+            return self.cached[run_date]
+
+    def put(self, service_uid: str, run_date: str, response: dict) -> None:
+        """Caches the response if the service has finished running."""
+
+        if not is_service_terminal(response):
+            return
+
+        self.store.put(f"services/{run_date}/{service_uid}.json",
+                       json.dumps(response).encode("utf-8"))
+        cached = self.get_cached_uids(run_date)
+
+        with self.lock:
+            cached.add(service_uid)
+        self.count("stored")
+
+    def log_stats(self) -> None:
+        """Logs the per-run cache counters."""
+
+        with self.lock:
+            stats = dict(self.stats)
+
+        logger.info(
+            f"Service cache hits: {stats['hits']}, misses: {stats['misses']}, "
+            f"newly terminal: {stats['stored']}, bytes saved: {stats['bytes_saved']}")
@@ -0,0 +1,108 @@
+"""The station registry, which loads crs.json once and indexes it for station name lookups."""
+
+import json
+from re import sub
+from bisect import bisect_left
+from functools import lru_cache
+from collections import defaultdict
+
+
+CRS_FILE = "crs.json"
+
+
+def normalise_station_name(name: str) -> str:
+    """Returns the station name in lower case, without the
+       ' Rail Station' suffix, punctuation or repeated spaces."""
+
+    name = name.lower().replace(" rail station", "").replace("&", " and ")
+    name = sub(r"[^a-z0-9 ]", "", name)
+
+    return " ".join(name.split())
+
+
+def get_trigrams(text: str) -> set[str]:
+    """Returns every run of three characters in the text."""
+
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class StationRegistry:
+    """Exact, prefix and substring indexes over normalised station names."""
+
+    def __init__(self, stations: list[dict]):
+        self.names = [normalise_station_name(station["name"])
+                      for station in stations]
+        self.crs_codes = [station["crs"] for station in stations]
+
+        self.exact_index = defaultdict(list)
+        self.trigram_index = defaultdict(set)
+
+        for position, name in enumerate(self.names):
+            self.exact_index[name].append(position)
+            for trigram in get_trigrams(name):
+                self.trigram_index[trigram].add(position)
+
+        self.sorted_names = sorted(
+            (name, position) for position, name in enumerate(self.names))
+
+    def find_exact(self, station_name: str) -> list[str]:
+        """Returns the crs of every station whose name is the given name."""
+
+        positions = self.exact_index.get(normalise_station_name(station_name), [])
+
+        return [self.crs_codes[position] for position in positions]
+
+    def find_prefix(self, station_name: str) -> list[str]:
+        """Returns the crs of every station whose name starts with the given name."""
+
+        prefix = normalise_station_name(station_name)
+        matches = []
+
+        start = bisect_left(self.sorted_names, (prefix, -1))
+        for name, position in self.sorted_names[start:]:
+            if not name.startswith(prefix):
+                break
+            matches.append(position)
+
+        return [self.crs_codes[position] for position in sorted(matches)]
+
+    def find_substring(self, station_name: str) -> list[str]:
+        """Returns the crs of every station whose name contains the given name."""
+
+        query = normalise_station_name(station_name)
+        trigrams = get_trigrams(query)
+
+        if trigrams:
+            candidates = set.intersection(
+                *(self.trigram_index.get(trigram, set()) for trigram in trigrams))
+        else:
+            candidates = range(len(self.names))
+
+        return [self.crs_codes[position] for position in sorted(candidates)
+                if query in self.names[position]]
+
+    def get_crs(self, station_name: str) -> str:
+        """Returns the crs of the station from the name, preferring
+           an exact match, then a prefix match, then a substring match."""
+
+        for find in (self.find_exact, self.find_prefix, self.find_substring):
+            crs_matches = find(station_name)
+            if crs_matches:
+                break
+
+        if len(crs_matches) == 1:
+            return crs_matches[0]
+        if len(crs_matches) > 1:
+            raise ValueError(
+                f"'{station_name.title()}' matches with more than 1 station: {crs_matches}")
+        raise ValueError(
+            f"'{station_name.title()}' does not match any existing station"
+        )
+
+
+@lru_cache(maxsize=None)
+def get_station_registry(crs_path: str = CRS_FILE) -> StationRegistry:
+    """Returns the station registry, loading the crs file the first time it is needed."""
+
+    with open(crs_path, "r", encoding="utf-8") as f:
+        return StationRegistry(json.load(f))
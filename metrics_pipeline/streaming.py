@@ -0,0 +1,102 @@
+"""Streaming mode for the metrics pipeline, which transforms and loads
+each extracted batch while the next one is still being fetched."""
+
+from logging import getLogger
+from os import _Environ
+from queue import Queue, Full
+from threading import Thread, Event
+from typing import Iterator, Callable
+
+from psycopg2.extensions import connection
+
+from extract import extract_batches
+from schedule_cache import ScheduleCache
+from digest_cache import ArrivalDigestCache
+from checkpoint import ExtractCheckpoint
+from transform import transform
+from load import load
+
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 2
+
+
+def prefetch_batches(batches: Iterator[dict], max_pending: int) -> Iterator[dict]:
+    """Yields the batches while a background thread fetches up to max_pending ahead.
+    Errors raised while fetching are re-raised to the consumer."""
+
+    pending = Queue(maxsize=max_pending)
+    stop = Event()
+
+    def put(item: tuple) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce() -> None:
+        error = None
+        try:
+            for batch in batches:
+                if not put((True, batch)):
+                    break
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            error = e
+        finally:
+            if hasattr(batches, "close"):
+                batches.close()
+        put((False, error))
+
+    producer = Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            is_batch, value = pending.get()
+            if not is_batch:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+        producer.join()
+
+
+def run_streaming_pipeline(config: _Environ, conn: connection, station_crs_list: list[str],
+                           service_filter: Callable[[list[dict]], list[dict]] = None,
+                           schedule_cache: ScheduleCache = None,
+                           checkpoint: ExtractCheckpoint = None,
+                           should_stop: Callable[[], bool] = None,
+                           digests: ArrivalDigestCache = None) -> None:
+    """Extracts, transforms and loads the stations a batch at a time.
+       New timetables and arrival hashes are saved to their caches after each batch is loaded.
+       Once should_stop is true the batches already fetched are loaded
+       and where extraction stopped is saved to the checkpoint."""
+
+    max_pending = int(config.get("STREAM_MAX_PENDING", DEFAULT_MAX_PENDING))
+
+    batches = prefetch_batches(
+        extract_batches(config, station_crs_list, service_filter=service_filter,
+                        schedule_cache=schedule_cache, checkpoint=checkpoint,
+                        should_stop=should_stop),
+        max_pending)
+
+    for batch_number, batch in enumerate(batches, start=1):
+        transformed_data = transform(config, batch, conn)
+        load(config, conn, transformed_data, digests)
+        # batches fetched ahead are still unloaded, so only this batch's timetables are added
+        if schedule_cache:
+            schedule_cache.add(batch["schedules"])
+            schedule_cache.save()
+        if digests:
+            digests.save()
+        logger.info(f"Loaded batch {batch_number} "
+                    f"({len(batch['services'])} services, {len(batch['arrivals'])} arrivals)")
+
+    if checkpoint:
+        checkpoint.save()
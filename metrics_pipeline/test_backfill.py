@@ -0,0 +1,54 @@
+"""Script for testing backfill.py"""
+
+# pylint:skip-file
+
+from datetime import date
+
+import pytest
+
+from backfill import (get_days, get_pending_days, get_progress, save_progress,
+                      get_incomplete_reason)
+
+
+def test_get_days():
+    assert get_days(date(2026, 2, 27), date(2026, 3, 2)) == [
+        date(2026, 2, 27), date(2026, 2, 28), date(2026, 3, 1), date(2026, 3, 2)]
+
+
+def test_get_days_invalid():
+    with pytest.raises(ValueError):
+        get_days(date(2026, 3, 2), date(2026, 3, 1))
+
+
+def test_get_pending_days_skips_completed():
+    progress = {"2026-03-01": {"stations": ["LBG", "KGX"]}}
+
+    assert get_pending_days([date(2026, 3, 1), date(2026, 3, 2)],
+                            ["LBG"], progress) == [date(2026, 3, 2)]
+
+
+def test_get_pending_days_redoes_new_stations():
+    progress = {"2026-03-01": {"stations": ["LBG"]}}
+
+    assert get_pending_days([date(2026, 3, 1)], ["LBG", "KGX"],
+                            progress) == [date(2026, 3, 1)]
+
+
+def test_progress_round_trip(tmp_path):
+    progress_path = str(tmp_path / "progress.json")
+
+    assert get_progress(progress_path) == {}
+
+    save_progress(progress_path, {"2026-03-01": {"stations": ["LBG"]}})
+
+    assert get_progress(progress_path) == {"2026-03-01": {"stations": ["LBG"]}}
+
+
+@pytest.mark.parametrize("failures, empty_stations, reason", [
+    (0, [], None),
+    (3, [], "3 RTT requests failed"),
+    (0, ["LBG", "KGX"], "no arrivals at LBG, KGX")])
+def test_get_incomplete_reason(failures, empty_stations, reason):
+    result = {"failures": failures, "empty_stations": empty_stations}
+
+    assert get_incomplete_reason(result) == reason
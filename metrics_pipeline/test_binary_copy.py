@@ -0,0 +1,103 @@
+"""Script for testing binary_copy.py"""
+
+# pylint:skip-file
+
+from datetime import date, time, timedelta
+from struct import unpack_from
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from binary_copy import CopyStream, COPY_SIGNATURE
+from load import upload_arrival_staging_data, ARRIVAL_STAGING_COLUMNS
+
+
+def decode(content: bytes, types: list[str]) -> list[tuple]:
+    """Reads binary COPY data back into Python values, as Postgres would."""
+
+    assert content.startswith(COPY_SIGNATURE)
+    position = len(COPY_SIGNATURE) + 8
+    rows = []
+
+    while True:
+        (fields,) = unpack_from(">h", content, position)
+        position += 2
+        if fields == -1:
+            assert position == len(content)
+            return rows
+
+        row = []
+        for column_type in types:
+            (length,) = unpack_from(">i", content, position)
+            position += 4
+            if length == -1:
+                row.append(None)
+                continue
+            value = content[position:position + length]
+            position += length
+            if column_type == "int4":
+                row.append(unpack_from(">i", value)[0])
+            elif column_type == "bool":
+                row.append(value == b"\x01")
+            elif column_type == "date":
+                row.append(date(2000, 1, 1) + timedelta(days=unpack_from(">i", value)[0]))
+            elif column_type == "time":
+                micros = unpack_from(">q", value)[0]
+                row.append(time(micros // 3_600_000_000, micros // 60_000_000 % 60))
+            else:
+                row.append(value.decode("utf-8"))
+        rows.append(tuple(row))
+
+
+def test_copy_stream_round_trip():
+    df = pd.DataFrame({
+        "uid": ["P72907", "AB", None],
+        "id": pd.array([1, None, -3], dtype="Int32"),
+        "time": pd.to_datetime(["1049", None, "2359"], format="%H%M"),
+        "flag": pd.array([True, False, None], dtype="boolean"),
+        "date": pd.to_datetime(["2026-02-12", "1999-12-31", None])
+    })
+    columns = {"uid": "text", "id": "int4", "time": "time", "flag": "bool", "date": "date"}
+
+    content = CopyStream(df, columns, chunk_rows=2).read()
+
+    assert decode(content, list(columns.values())) == [
+        ("P72907", 1, time(10, 49), True, date(2026, 2, 12)),
+        ("AB", None, None, False, date(1999, 12, 31)),
+        (None, -3, time(23, 59), None, None)
+    ]
+
+
+def test_copy_stream_empty():
+    df = pd.DataFrame({"id": pd.array([], dtype="Int32")})
+
+    assert decode(CopyStream(df, {"id": "int4"}).read(), ["int4"]) == []
+
+
+def test_copy_stream_small_reads():
+    df = pd.DataFrame({"uid": ["P72907"] * 5})
+    stream = CopyStream(df, {"uid": "text"}, chunk_rows=2)
+
+    content = b"".join(iter(lambda: stream.read(3), b""))
+
+    assert decode(content, ["text"]) == [("P72907",)] * 5
+
+
+def test_upload_arrival_staging_data_uses_binary_copy():
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.copy_expert.side_effect = lambda sql, stream: setattr(cur, "sent", stream.read())
+    df = pd.DataFrame({
+        "arrival_date": pd.to_datetime(["2026-02-12", "2026-02-12"]),
+        "scheduled_arr_time": pd.to_datetime(["1049", "1049"], format="%H%M"),
+        "actual_arr_time": pd.to_datetime(["1052", "1052"], format="%H%M"),
+        "platform_changed": pd.array([False, False], dtype="boolean"),
+        "location_cancelled": pd.array([False, False], dtype="boolean"),
+        "arrival_station_id": pd.array([4, 4], dtype="Int32"),
+        "service_uid": pd.Categorical(["P72907", "P72907"])})
+
+    upload_arrival_staging_data(df, conn)
+
+    assert "FORMAT BINARY" in cur.copy_expert.call_args[0][0]
+    assert decode(cur.sent, list(ARRIVAL_STAGING_COLUMNS.values())) == [
+        (date(2026, 2, 12), time(10, 49), time(10, 52), False, False, 4, "P72907")]
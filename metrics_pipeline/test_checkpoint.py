@@ -0,0 +1,114 @@
+"""Script for testing checkpoint.py"""
+
+# pylint:skip-file
+
+from datetime import date
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from cache_store import LocalCacheStore
+from checkpoint import ExtractCheckpoint, get_deadline_check
+from extract import extract_batches
+
+
+CONFIG = {"RTT_USER": "u", "RTT_PASSWORD": "p"}
+
+
+def test_get_deadline_check_without_lambda():
+    assert get_deadline_check({}, None) is None
+
+
+def test_get_deadline_check_reserve():
+    context = MagicMock()
+    should_stop = get_deadline_check({"DEADLINE_RESERVE_SECONDS": "30"}, context)
+
+    context.get_remaining_time_in_millis.return_value = 31000
+    assert should_stop() == False
+
+    context.get_remaining_time_in_millis.return_value = 29000
+    assert should_stop() == True
+
+
+def test_get_deadline_check_invalid():
+    with pytest.raises(ValueError):
+        get_deadline_check({"DEADLINE_RESERVE_SECONDS": "-1"}, MagicMock())
+
+
+def test_checkpoint_only_resumes_same_day_and_stations(tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    checkpoint = ExtractCheckpoint(store, date(2026, 2, 12))
+    checkpoint.stop_at(["LBG", "KGX"], 1, [{"service_uid": "A1"}], {"A1", "A2"})
+    checkpoint.save()
+
+    assert ExtractCheckpoint(store, date(2026, 2, 12)).get_resume_point(["LBG", "KGX"]) == (
+        1, [{"service_uid": "A1"}], {"A1", "A2"})
+    assert ExtractCheckpoint(store, date(2026, 2, 13)).get_resume_point(
+        ["LBG", "KGX"]) == (0, [], set())
+    assert ExtractCheckpoint(store, date(2026, 2, 12)).get_resume_point(
+        ["LBG"]) == (0, [], set())
+
+
+def test_checkpoint_cleared_after_finished_run(tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    checkpoint = ExtractCheckpoint(store)
+    checkpoint.stop_at(["LBG"], 1, [], set())
+    checkpoint.save()
+
+    finished = ExtractCheckpoint(store)
+    finished.save()
+
+    assert ExtractCheckpoint(store).get_resume_point(["LBG"]) == (0, [], set())
+
+
+def test_get_completed_stations_leaves_the_cut_station_due(tmp_path):
+    stations = ["LBG", "KGX", "STP", "WFJ"]
+    checkpoint = ExtractCheckpoint(LocalCacheStore(str(tmp_path)))
+
+    assert checkpoint.get_completed_stations(stations) == stations
+
+    checkpoint.stop_at(stations, 3, [{"service_uid": "A1"}], {"A1"})
+    assert checkpoint.get_completed_stations(stations) == ["LBG", "KGX"]
+
+    checkpoint.stop_at(stations, 3, [], {"A1"})
+    assert checkpoint.get_completed_stations(stations) == ["LBG", "KGX", "STP"]
+
+
+@patch("extract.get_cache_store")
+@patch("extract.get_service_arrival_details")
+@patch("extract.get_service_details")
+def test_extract_batches_resumes_after_deadline(mock_services, mock_arrivals, mock_store, tmp_path):
+    mock_store.return_value = LocalCacheStore(str(tmp_path / "responses"))
+    mock_services.side_effect = lambda session, station_crs, run_date=None, window_start=None: [
+        {"service_uid": uid, "origin_station": "X",
+         "destination_station": "Y", "operator_name": "Southern"}
+        for uid in ["A1", "A2", f"{station_crs}1", f"{station_crs}2"]
+    ]
+    mock_arrivals.side_effect = lambda session, service, cache=None, run_date=None, schedule=None: [
+        {"crs": "LBG", "service_uid": service["service_uid"]}]
+
+    store = LocalCacheStore(str(tmp_path / "checkpoints"))
+    stations = ["LBG", "KGX", "STP"]
+    batches_before_deadline = iter([False, False, True])
+
+    checkpoint = ExtractCheckpoint(store)
+    first_run = [s["service_uid"]
+                 for batch in extract_batches(CONFIG, stations, max_workers=2, batch_size=2,
+                                              checkpoint=checkpoint,
+                                              should_stop=lambda: next(batches_before_deadline))
+                 for s in batch["services"]]
+    checkpoint.save()
+
+    assert checkpoint.stopped
+    assert first_run == ["A1", "A2", "LBG1", "LBG2"]
+
+    resumed = ExtractCheckpoint(store)
+    second_run = [s["service_uid"]
+                  for batch in extract_batches(CONFIG, stations, max_workers=2, batch_size=2,
+                                               checkpoint=resumed, should_stop=lambda: False)
+                  for s in batch["services"]]
+    resumed.save()
+
+    assert not resumed.stopped
+    assert second_run == ["KGX1", "KGX2", "STP1", "STP2"]
+    assert ExtractCheckpoint(store).get_resume_point(stations) == (0, [], set())
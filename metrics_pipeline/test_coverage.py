@@ -0,0 +1,63 @@
+"""Script for testing coverage.py"""
+
+# pylint:skip-file
+
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from cache_store import LocalCacheStore
+from coverage import get_window_starts, StationCoverage
+from extract import extract_batches
+
+
+def test_get_window_starts():
+    assert get_window_starts(360) == ["0000", "0600", "1200", "1800"]
+
+
+def test_get_window_starts_invalid():
+    with pytest.raises(ValueError):
+        get_window_starts(0)
+
+
+def test_record_without_history(tmp_path):
+    coverage = StationCoverage(LocalCacheStore(str(tmp_path)))
+
+    stats = coverage.record("KGX", date(2026, 3, 1), 24, 500, 400)
+
+    assert stats["expected_services"] is None
+    assert stats["coverage"] is None
+
+
+def test_record_compares_with_previous_days(tmp_path):
+    coverage = StationCoverage(LocalCacheStore(str(tmp_path)))
+
+    coverage.record("KGX", date(2026, 3, 1), 24, 500, 400)
+    stats = coverage.record("KGX", date(2026, 3, 2), 24, 450, 300)
+
+    assert stats["expected_services"] == 400
+    assert stats["coverage"] == 0.75
+
+
+@patch("extract.get_cache_store")
+@patch("extract.get_service_arrival_details")
+@patch("extract.get_service_details")
+def test_extract_batches_full_day_merges_windows(mock_services, mock_arrivals, mock_store, tmp_path):
+    mock_store.return_value = LocalCacheStore(str(tmp_path))
+    mock_services.side_effect = lambda session, station_crs, run_date=None, window_start=None: [
+        {"service_uid": f"W{window_start}", "origin_station": "X",
+         "destination_station": "Y", "operator_name": "Southern"},
+        {"service_uid": "ALLDAY", "origin_station": "X",
+         "destination_station": "Y", "operator_name": "Southern"}
+    ]
+    mock_arrivals.side_effect = lambda session, service, cache=None, run_date=None, schedule=None: [
+        {"crs": "KGX", "service_uid": service["service_uid"]}]
+
+    config = {"RTT_USER": "u", "RTT_PASSWORD": "p",
+              "SEARCH_COVERAGE": "full_day", "SEARCH_WINDOW_MINUTES": "720"}
+    batches = list(extract_batches(config, ["KGX"], max_workers=2,
+                                   run_date=date(2026, 3, 1)))
+
+    assert [s["service_uid"] for s in batches[0]["services"]] == [
+        "W0000", "ALLDAY", "W1200"]
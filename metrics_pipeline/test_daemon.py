@@ -0,0 +1,176 @@
+"""Script for testing daemon.py"""
+
+# pylint:skip-file
+
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from cache_store import LocalCacheStore
+from extract import ArrivalRecord
+from daemon import is_service_in_progress, MetricsDaemon
+
+
+TODAY = datetime.now().date().isoformat()
+
+
+def get_arrivals(*times: tuple) -> list[ArrivalRecord]:
+    return [ArrivalRecord(crs, scheduled, actual, TODAY, False, False, "P72907")
+            for crs, scheduled, actual in times]
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    with patch("daemon.get_session") as mock_session, \
+            patch("daemon.get_db_connection"), \
+            patch("daemon.get_cache_store") as mock_store:
+        mock_session.return_value.stats = {"requests": 3}
+        mock_store.return_value = LocalCacheStore(str(tmp_path))
+        yield MetricsDaemon({"DAEMON_POLL_SECONDS": "60"}, ["LBG"])
+
+
+def test_is_service_in_progress_running():
+    arrivals = get_arrivals(("LBG", "1000", "1002"), ("DFD", "1030", None))
+
+    assert is_service_in_progress(arrivals, datetime.now().replace(hour=10, minute=15), 3)
+
+
+def test_is_service_in_progress_finished():
+    arrivals = get_arrivals(("LBG", "1000", "1002"), ("DFD", "1030", "1031"))
+
+    assert not is_service_in_progress(arrivals, datetime.now().replace(hour=11, minute=0), 3)
+
+
+def test_is_service_in_progress_not_started():
+    arrivals = get_arrivals(("LBG", "1000", None), ("DFD", "1030", None))
+
+    assert not is_service_in_progress(arrivals, datetime.now().replace(hour=9, minute=0), 3)
+    assert is_service_in_progress(arrivals, datetime.now().replace(hour=9, minute=58), 3)
+
+
+def test_is_service_in_progress_past_midnight():
+    arrivals = get_arrivals(("LBG", "2350", "2352"), ("DFD", "0020", None))
+    tomorrow = datetime.now() + timedelta(days=1)
+
+    assert is_service_in_progress(arrivals, tomorrow.replace(hour=0, minute=5), 3)
+    assert not is_service_in_progress(arrivals, tomorrow.replace(hour=0, minute=45), 3)
+
+
+def test_is_service_in_progress_not_started_before_midnight_on_the_run_date():
+    arrivals = get_arrivals(("LBG", "2300", None), ("DFD", "0045", None))
+
+    assert not is_service_in_progress(arrivals, datetime.now().replace(hour=0, minute=30), 3)
+    assert is_service_in_progress(arrivals, datetime.now().replace(hour=22, minute=58), 3)
+
+
+def test_daemon_invalid_intervals():
+    with pytest.raises(ValueError):
+        MetricsDaemon({"DAEMON_POLL_SECONDS": "0"}, ["LBG"])
+
+
+@patch("daemon.load")
+@patch("daemon.transform")
+def test_load_changes_skips_unchanged(mock_transform, mock_load, daemon):
+    mock_load.return_value = {"unmatched_service_uids": set()}
+    arrivals = get_arrivals(("LBG", "1000", "1002"), ("DFD", "1030", None))
+
+    daemon.load_changes([], arrivals)
+    daemon.load_changes([], arrivals)
+    daemon.load_changes([], [arrivals[0], arrivals[1]._replace(actual_arr_time="1033")])
+
+    loaded = [call[0][1]["arrivals"] for call in mock_transform.call_args_list]
+
+    assert [len(arrivals) for arrivals in loaded] == [2, 1]
+    assert loaded[1][0].actual_arr_time == "1033"
+    assert daemon.stats["arrivals_loaded"] == 3
+    assert daemon.stats["arrivals_unchanged"] == 3
+
+
+@patch("daemon.load")
+@patch("daemon.transform")
+def test_load_changes_resends_arrivals_of_unmatched_services(mock_transform, mock_load, daemon):
+    mock_load.return_value = {"unmatched_service_uids": {"P72908"}}
+    arrivals = get_arrivals(("LBG", "1000", "1002"))
+    unmatched = [arrival._replace(service_uid="P72908") for arrival in arrivals]
+
+    daemon.load_changes([], arrivals + unmatched)
+    mock_load.return_value = {"unmatched_service_uids": set()}
+    daemon.load_changes([], arrivals + unmatched)
+
+    loaded = [call[0][1]["arrivals"] for call in mock_transform.call_args_list]
+    assert [[a.service_uid for a in batch] for batch in loaded] == [
+        ["P72907", "P72908"], ["P72908"]]
+    assert daemon.stats["arrivals_loaded"] == 2
+
+
+@patch("daemon.fetch_service_arrivals")
+def test_poll_only_fetches_services_in_progress(mock_fetch, daemon):
+    now = datetime.now()
+    running = get_arrivals(("LBG", f"{now.hour:02d}00", "0000"),
+                           ("DFD", f"{now.hour:02d}59", None))
+    yesterday = [arrival._replace(service_uid="P72908", arrival_date="2026-02-11")
+                 for arrival in running]
+    daemon.service_arrivals = {
+        ("P72907", TODAY): {(a.crs, a.arrival_date): a for a in running},
+        ("P72908", "2026-02-11"): {(a.crs, a.arrival_date): a for a in yesterday}}
+    daemon.load_changes = MagicMock()
+    mock_fetch.return_value = running
+
+    daemon.poll()
+
+    assert [call[0][1]["service_uid"] for call in mock_fetch.call_args_list] == ["P72907"]
+    assert daemon.stats["services_in_progress"] == 1
+
+
+@patch("daemon.manage_partitions")
+@patch("daemon.fetch_service_arrivals")
+def test_roll_over_keeps_polling_services_running_past_midnight(mock_fetch, mock_partitions,
+                                                                daemon):
+    running = get_arrivals(("LBG", "2350", "2352"), ("DFD", "0020", None))
+    finished = [arrival._replace(service_uid="P72908") for arrival in
+                get_arrivals(("LBG", "2300", "2301"), ("DFD", "2330", "2331"))]
+    for arrival in running + finished:
+        daemon.service_arrivals.setdefault((arrival.service_uid, arrival.arrival_date), {})[
+            (arrival.crs, arrival.arrival_date)] = arrival
+        daemon.loaded[(arrival.service_uid, arrival.crs, arrival.arrival_date)] = arrival
+    after_midnight = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=5)
+    daemon.load_changes = MagicMock()
+    mock_fetch.return_value = running
+
+    with patch("daemon.datetime") as mock_datetime:
+        mock_datetime.now.return_value = after_midnight
+        daemon.roll_over()
+        daemon.poll()
+
+    assert daemon.run_date == after_midnight.date()
+    assert list(daemon.service_arrivals) == [("P72907", TODAY)]
+    assert {key[0] for key in daemon.loaded} == {"P72907"}
+    assert mock_fetch.call_count == 1
+    service, _, run_date, schedule = mock_fetch.call_args[0][1:]
+    assert service == {"service_uid": "P72907"}
+    assert run_date.isoformat() == TODAY
+    assert schedule is None
+
+
+def test_health_and_metrics(daemon):
+    healthy, details = daemon.get_health()
+    assert healthy and details["seconds_since_success"] is None
+
+    daemon.started_at -= 10 ** 4
+    healthy, details = daemon.get_health()
+    assert not healthy and details["status"] == "stale"
+
+    assert 'metrics_daemon_cycles_total{kind="sweep"} 0' in daemon.get_metrics()
+    assert "metrics_daemon_rtt_requests_total 3" in daemon.get_metrics()
+
+
+def test_run_stops_cleanly(daemon):
+    daemon.sweep = MagicMock(side_effect=lambda: daemon.stop())
+
+    daemon.run()
+
+    daemon.sweep.assert_called_once()
+    daemon.session.close.assert_called_once()
+    daemon.conn.close.assert_called_once()
+    assert daemon.stats["last_success"] is not None
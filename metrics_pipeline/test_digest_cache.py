@@ -0,0 +1,118 @@
+"""Script for testing digest_cache.py"""
+
+# pylint:skip-file
+
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from cache_store import LocalCacheStore
+from digest_cache import ArrivalDigestCache, get_row_hashes, ARRIVAL_KEY_COLUMNS
+from load import load
+
+
+def get_arrivals(actual_times: list[str], service_uids: list[str] = None) -> pd.DataFrame:
+    service_uids = service_uids or [f"P7290{i}" for i in range(len(actual_times))]
+    return pd.DataFrame({
+        "arrival_date": pd.to_datetime(["2026-02-12"] * len(actual_times)),
+        "scheduled_arr_time": pd.to_datetime(["1049"] * len(actual_times), format="%H%M"),
+        "actual_arr_time": pd.to_datetime(actual_times, format="%H%M"),
+        "platform_changed": pd.array([False] * len(actual_times), dtype="boolean"),
+        "location_cancelled": pd.array([False] * len(actual_times), dtype="boolean"),
+        "arrival_station_id": pd.array([4] * len(actual_times), dtype="Int32"),
+        "service_uid": pd.Categorical(service_uids)
+    })
+
+
+def test_row_hashes_ignore_categories():
+    df = get_arrivals(["1052"])
+    other = df.assign(service_uid=pd.Categorical(["P72900"], categories=["A", "P72900"]))
+
+    assert (get_row_hashes(df, ARRIVAL_KEY_COLUMNS)
+            == get_row_hashes(other, ARRIVAL_KEY_COLUMNS)).all()
+
+
+def test_get_changed_returns_new_and_changed_arrivals(tmp_path):
+    cache = ArrivalDigestCache(LocalCacheStore(str(tmp_path)), date(2026, 2, 12))
+    _, hashes = cache.get_changed(get_arrivals(["1052", "1053"]))
+    cache.add(hashes)
+    cache.save()
+
+    changed, _ = cache.get_changed(get_arrivals(["1052", "1055", "1058"]))
+
+    assert changed["service_uid"].tolist() == ["P72901", "P72902"]
+
+
+def test_save_keeps_newest_hash_and_reloads(tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    cache = ArrivalDigestCache(store, date(2026, 2, 12))
+
+    cache.add(cache.get_changed(get_arrivals(["1052"]))[1])
+    assert len(ArrivalDigestCache(store, date(2026, 2, 12)).keys) == 0
+
+    cache.save()
+    cache.add(cache.get_changed(get_arrivals(["1054"]))[1])
+    cache.save()
+
+    reloaded = ArrivalDigestCache(store, date(2026, 2, 12))
+    assert len(reloaded.keys) == 1
+    assert reloaded.get_changed(get_arrivals(["1054"]))[0].empty
+    assert len(reloaded.get_changed(get_arrivals(["1052"]))[0]) == 1
+
+
+@patch("load.load_staging_data")
+def test_load_skips_unchanged_arrivals(mock_load_staging, tmp_path):
+    mock_load_staging.return_value = {"inserted": 2, "updated": 0, "unchanged": 0, "unmatched": 0}
+    cache = ArrivalDigestCache(LocalCacheStore(str(tmp_path)), date(2026, 2, 12))
+    conn = MagicMock()
+
+    load({}, conn, {"services": pd.DataFrame(), "arrivals": get_arrivals(["1052", "1053"])}, cache)
+    cache.save()
+    load({}, conn, {"services": pd.DataFrame(), "arrivals": get_arrivals(["1052", "1059"])}, cache)
+
+    assert len(mock_load_staging.call_args_list[0][0][2]) == 2
+    assert mock_load_staging.call_args_list[1][0][2]["service_uid"].tolist() == ["P72901"]
+
+
+@patch("load.load_staging_data")
+def test_load_keeps_hashes_of_failed_loads_out_of_the_cache(mock_load_staging, tmp_path):
+    mock_load_staging.side_effect = RuntimeError("connection lost")
+    cache = ArrivalDigestCache(LocalCacheStore(str(tmp_path)), date(2026, 2, 12))
+
+    with pytest.raises(RuntimeError):
+        load({}, MagicMock(), {"services": pd.DataFrame(), "arrivals": get_arrivals(["1052"])},
+             cache)
+
+    assert cache.pending == []
+
+
+@patch("load.load_staging_data")
+def test_load_keeps_hashes_of_unmatched_arrivals_out_of_the_cache(mock_load_staging, tmp_path):
+    mock_load_staging.return_value = {"inserted": 1, "updated": 0, "unchanged": 0, "unmatched": 1,
+                                      "unmatched_service_uids": {"P72901"}}
+    cache = ArrivalDigestCache(LocalCacheStore(str(tmp_path)), date(2026, 2, 12))
+
+    load({}, MagicMock(), {"services": pd.DataFrame(), "arrivals": get_arrivals(["1052", "1053"])},
+         cache)
+    cache.save()
+
+    changed, _ = cache.get_changed(get_arrivals(["1052", "1053"]))
+    assert changed["service_uid"].tolist() == ["P72901"]
+
+
+@patch("load.upload_arrival_staging_data")
+@patch("load.create_arrival_staging_table")
+def test_load_counts_inserted_updated_and_unchanged(mock_create, mock_upload, caplog):
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchone.side_effect = [{"staged": 3, "new": 1}, {"touched": 2}]
+    cur.rowcount = 2
+
+    with caplog.at_level("INFO"):
+        load({}, conn, {"services": pd.DataFrame(),
+                        "arrivals": get_arrivals(["1052", "1053", "1054", "1055"])})
+
+    assert "Arrivals inserted: 1, updated: 1, skipped: 1" in caplog.text
+    assert "Dropped 1 arrivals without a known service" in caplog.text
@@ -0,0 +1,101 @@
+"""Script for testing dimension_cache.py"""
+
+# pylint:skip-file
+
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+
+from cache_store import LocalCacheStore
+from dimension_cache import DimensionCache
+from extract import ArrivalRecord
+from transform import transform
+
+
+STATIONS = [{"station_id": 1, "station_crs": "LBG", "station_name": "London Bridge"},
+            {"station_id": 2, "station_crs": "DFD", "station_name": "Dartford"}]
+
+OPERATORS = [{"operator_id": 1, "operator_name": "Southeastern"}]
+
+
+@patch("dimension_cache.get_operator_id_list")
+@patch("dimension_cache.get_station_id_list")
+@patch("dimension_cache.get_dimension_version")
+def test_refresh_only_when_version_changes(mock_version, mock_stations, mock_operators, tmp_path):
+    mock_version.return_value = [2, 2, 1, 1]
+    mock_stations.return_value = STATIONS
+    mock_operators.return_value = OPERATORS
+    cache = DimensionCache(LocalCacheStore(str(tmp_path)))
+
+    cache.refresh(MagicMock())
+    cache.refresh(MagicMock())
+
+    assert mock_stations.call_count == 1
+    assert cache.stats["hits"] == 1
+
+    mock_version.return_value = [2, 2, 2, 2]
+    cache.refresh(MagicMock())
+
+    assert mock_stations.call_count == 2
+
+
+@patch("dimension_cache.get_operator_id_list")
+@patch("dimension_cache.get_station_id_list")
+@patch("dimension_cache.get_dimension_version")
+def test_cache_persists_to_disk(mock_version, mock_stations, mock_operators, tmp_path):
+    mock_version.return_value = [2, 2, 1, 1]
+    mock_stations.return_value = STATIONS
+    mock_operators.return_value = OPERATORS
+    DimensionCache(LocalCacheStore(str(tmp_path))).refresh(MagicMock())
+
+    cache = DimensionCache(LocalCacheStore(str(tmp_path)))
+    cache.refresh(MagicMock())
+
+    assert cache.stations == STATIONS
+    assert mock_stations.call_count == 1
+
+
+@patch("dimension_cache.insert_operators")
+@patch("dimension_cache.get_operator_id_list")
+@patch("dimension_cache.get_station_id_list")
+@patch("dimension_cache.get_dimension_version")
+def test_add_operators_writes_through(mock_version, mock_stations, mock_operators,
+                                      mock_insert, tmp_path):
+    mock_version.return_value = [2, 2, 1, 1]
+    mock_stations.return_value = STATIONS
+    mock_operators.return_value = OPERATORS
+    cache = DimensionCache(LocalCacheStore(str(tmp_path)))
+    cache.refresh(MagicMock())
+
+    cache.add_operators(MagicMock(), {"Southeastern"})
+    mock_insert.assert_not_called()
+
+    mock_version.return_value = [2, 2, 2, 2]
+    mock_operators.return_value = OPERATORS + [{"operator_id": 2, "operator_name": "Grand Central"}]
+    cache.add_operators(MagicMock(), {"Southeastern", "Grand Central"})
+
+    assert mock_insert.call_args[0][1] == ["Grand Central"]
+    assert {o["operator_name"] for o in cache.operators} == {"Southeastern", "Grand Central"}
+
+
+@patch("dimension_cache.insert_operators")
+@patch("dimension_cache.get_operator_id_list")
+@patch("dimension_cache.get_station_id_list")
+@patch("dimension_cache.get_dimension_version")
+def test_transform_uses_cached_dimensions(mock_version, mock_stations, mock_operators,
+                                          mock_insert, tmp_path):
+    mock_version.return_value = [2, 2, 1, 1]
+    mock_stations.return_value = STATIONS
+    mock_operators.return_value = OPERATORS
+    data = {"services": [{"service_uid": "P72907", "origin_station": "London Bridge",
+                          "destination_station": "Dartford", "operator_name": "Southeastern"}],
+            "arrivals": [ArrivalRecord("DFD", "1120", "1121", "2026-02-12",
+                                       False, False, "P72907")]}
+
+    for _ in range(3):
+        result = transform({"CACHE_DIR": str(tmp_path)}, data, MagicMock())
+
+    assert mock_stations.call_count == 1
+    assert result["services"]["origin_station_id"].tolist() == [1]
+    assert result["services"]["operator_id"].tolist() == [1]
+    assert result["arrivals"]["arrival_station_id"].tolist() == [2]
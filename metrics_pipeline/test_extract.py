@@ -3,11 +3,14 @@
 # pylint:skip-file
 
 import pytest
+from io import BytesIO
 from unittest.mock import patch, mock_open
 
 from requests import Session, Response
 
-from extract import get_crs, get_station_data, get_service_details
+from cache_store import LocalCacheStore
+from extract import (get_crs, get_station_data, get_service_details,
+                     get_max_workers, extract, get_projected_services)
 
 
 def test_get_crs_correct(test_mock_crs_file):
@@ -201,3 +204,76 @@ def test_get_service_details(mock_get, test_mock_rtt_api_crs_call, test_mock_crs
                 "operator_name": "Southeastern"
             }
         ]
+
+
+def test_get_max_workers_default():
+    assert get_max_workers({}) == 8
+
+
+def test_get_max_workers_from_config():
+    assert get_max_workers({"RTT_MAX_WORKERS": "32"}) == 32
+
+
+def test_get_max_workers_invalid():
+    with pytest.raises(ValueError):
+        get_max_workers({"RTT_MAX_WORKERS": "0"})
+
+
+@patch("extract.get_cache_store")
+@patch("extract.get_service_arrival_details")
+@patch("extract.get_service_details")
+def test_extract_concurrent_output(mock_services, mock_arrivals, mock_store, tmp_path):
+    mock_store.return_value = LocalCacheStore(str(tmp_path))
+    mock_services.side_effect = lambda session, station_crs, run_date=None, window_start=None: [
+        {"service_uid": "A1", "origin_station": "X",
+         "destination_station": "Y", "operator_name": "Southern"},
+        {"service_uid": f"{station_crs}1", "origin_station": "X",
+         "destination_station": "Y", "operator_name": "Southern"}
+    ]
+    mock_arrivals.side_effect = lambda session, service, cache=None, run_date=None, schedule=None: [] if service["service_uid"] == "LBG1" else [
+        {"crs": "LBG", "service_uid": service["service_uid"]}]
+
+    data = extract({"RTT_USER": "u", "RTT_PASSWORD": "p"},
+                   ["LBG", "KGX"], max_workers=4)
+
+    assert sorted(s["service_uid"] for s in data["services"]) == ["A1", "KGX1"]
+    assert sorted(a["service_uid"] for a in data["arrivals"]) == ["A1", "KGX1"]
+
+
+def test_get_projected_services(test_mock_rtt_api_crs_call):
+    stream = BytesIO(bytes(test_mock_rtt_api_crs_call, encoding="utf-8"))
+
+    assert list(get_projected_services(stream)) == [
+        {
+            "service_uid": "P72907",
+            "origin_station": "London Cannon Street",
+            "destination_station": "London Cannon Street",
+            "operator_name": "Southeastern"
+        }
+    ]
+
+
+def test_get_projected_services_null_services():
+    stream = BytesIO(b'{"location": {"crs": "LBG"}, "services": null}')
+
+    assert list(get_projected_services(stream)) == []
+
+
+@patch.object(Session, "get")
+def test_get_service_details_stream_parse(mock_get, test_mock_rtt_api_crs_call):
+    response = Response()
+    response.raw = BytesIO(bytes(test_mock_rtt_api_crs_call, encoding="utf-8"))
+    mock_get.return_value = response
+
+    session = Session()
+    session.stream_parse = True
+
+    assert get_service_details(session, "LBG") == [
+        {
+            "service_uid": "P72907",
+            "origin_station": "London Cannon Street",
+            "destination_station": "London Cannon Street",
+            "operator_name": "Southeastern"
+        }
+    ]
+    assert mock_get.call_args.kwargs["stream"] == True
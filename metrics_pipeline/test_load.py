@@ -0,0 +1,82 @@
+"""Script for testing load.py"""
+
+# pylint:skip-file
+
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from load import load, create_service_staging_table, create_arrival_staging_table
+
+
+ARRIVALS = pd.DataFrame([{
+    "arrival_date": pd.Timestamp("2026-02-12"),
+    "scheduled_arr_time": pd.Timestamp("1900-01-01 10:49"),
+    "actual_arr_time": pd.Timestamp("1900-01-01 10:52"),
+    "platform_changed": False,
+    "location_cancelled": False,
+    "arrival_station_id": 4,
+    "service_uid": "P72907"}])
+
+SERVICES = pd.DataFrame([{
+    "service_uid": "P72907",
+    "origin_station_id": 4,
+    "destination_station_id": 5,
+    "operator_id": 1}])
+
+
+def test_staging_tables_are_temporary():
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+
+    create_service_staging_table(conn)
+    create_arrival_staging_table(conn)
+
+    for call in cur.execute.call_args_list:
+        assert "CREATE TEMPORARY TABLE" in call[0][0]
+        assert "ON COMMIT DROP" in call[0][0]
+    conn.commit.assert_not_called()
+
+
+@patch("load.upload_service_staging_data")
+@patch("load.upload_arrival_staging_data")
+def test_load_commits_once(mock_upload_arrivals, mock_upload_services):
+    conn = MagicMock()
+
+    load({}, conn, {"services": SERVICES, "arrivals": ARRIVALS.copy()})
+
+    mock_upload_services.assert_called_once()
+    mock_upload_arrivals.assert_called_once()
+    conn.commit.assert_called_once()
+    conn.rollback.assert_not_called()
+
+
+@patch("load.upload_service_staging_data")
+@patch("load.upload_arrival_staging_data")
+def test_load_rolls_back_on_failure(mock_upload_arrivals, mock_upload_services):
+    mock_upload_arrivals.side_effect = RuntimeError("connection lost")
+    conn = MagicMock()
+
+    with pytest.raises(RuntimeError):
+        load({}, conn, {"services": SERVICES, "arrivals": ARRIVALS.copy()})
+
+    conn.commit.assert_not_called()
+    conn.rollback.assert_called_once()
+
+
+@patch("load.upload_service_staging_data")
+@patch("load.upload_arrival_staging_data")
+def test_load_resolves_service_ids_in_the_database(mock_upload_arrivals, mock_upload_services):
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchone.side_effect = [{"staged": 1, "new": 1}, {"touched": 1}]
+
+    load({}, conn, {"services": SERVICES, "arrivals": ARRIVALS.copy()})
+
+    assert "service_id" not in mock_upload_arrivals.call_args[0][0].columns
+    assert mock_upload_arrivals.call_args[0][0]["service_uid"].tolist() == ["P72907"]
+    merge_sql = [call[0][0] for call in cur.execute.call_args_list
+                 if "MERGE INTO arrival" in call[0][0]][0]
+    assert "JOIN service AS SV ON SV.service_uid = ST.service_uid" in merge_sql
+    cur.fetchall.assert_not_called()
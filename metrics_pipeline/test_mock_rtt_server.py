@@ -0,0 +1,66 @@
+"""Script for testing mock_rtt_server.py"""
+
+# pylint:skip-file
+
+import json
+
+import requests
+
+from mock_rtt_server import RecordedResponses, start_mock_rtt_server
+
+
+def test_recorded_responses_replay_recordings(tmp_path, test_mock_rtt_api_crs_call):
+    (tmp_path / "search").mkdir()
+    (tmp_path / "search" / "LBG.json").write_text(test_mock_rtt_api_crs_call)
+
+    responses = RecordedResponses(str(tmp_path))
+
+    assert responses.get_search("LBG")["services"][0]["serviceUid"] == "P72907"
+
+
+def test_recorded_responses_scale_searches():
+    responses = RecordedResponses(scale=3, services_per_station=2)
+
+    uids = [s["serviceUid"] for s in responses.get_search("KGX")["services"]]
+
+    assert len(uids) == 6
+    assert len(set(uids)) == 6
+    assert all(len(uid) == 6 for uid in uids)
+
+
+def test_recorded_responses_map_scaled_services_back():
+    responses = RecordedResponses(scale=2, services_per_station=1, stops=3)
+
+    scaled_uid = responses.get_search("KGX")["services"][1]["serviceUid"]
+    service = responses.get_service(scaled_uid)
+
+    assert service["serviceUid"] == scaled_uid
+    assert len(service["locations"]) == 3
+
+
+def test_server_answers_like_rtt():
+    server, url, stats = start_mock_rtt_server(
+        RecordedResponses(services_per_station=2), latency=0)
+
+    try:
+        search = requests.get(f"{url}/api/v1/json/search/LBG", timeout=5).json()
+        service = requests.get(
+            f"{url}/api/v1/json/service/LB0000/2026/03/01", timeout=5).json()
+    finally:
+        server.shutdown()
+
+    assert len(search["services"]) == 2
+    assert service["serviceUid"] == "LB0000"
+    assert stats["requests"] == 2
+
+
+def test_server_fails_at_error_rate():
+    server, url, _ = start_mock_rtt_server(
+        RecordedResponses(), latency=0, error_rate=1.0)
+
+    try:
+        response = requests.get(f"{url}/api/v1/json/search/LBG", timeout=5)
+    finally:
+        server.shutdown()
+
+    assert response.status_code == 503
@@ -0,0 +1,73 @@
+"""Script for testing network.py"""
+
+# pylint:skip-file
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from network import (get_station_crs_list, get_shard, get_shard_stations,
+                     claim_services, get_claim_expiry_minutes, DEFAULT_STATIONS)
+
+
+def test_get_station_crs_list_default():
+    assert get_station_crs_list({}) == DEFAULT_STATIONS
+
+
+def test_get_station_crs_list_file(tmp_path):
+    station_file = tmp_path / "crs.csv"
+    station_file.write_text(
+        "name,lat,long,crs\nAbbey Wood,51.49,0.12,ABW\nAber,51.57,-3.23,ABE\n")
+
+    assert get_station_crs_list({"STATION_SOURCE": "file",
+                                 "STATION_FILE": str(station_file)}) == ["ABE", "ABW"]
+
+
+def test_get_station_crs_list_invalid():
+    with pytest.raises(ValueError):
+        get_station_crs_list({"STATION_SOURCE": "nope"})
+
+
+def test_get_shard_from_event():
+    assert get_shard({"SHARD_COUNT": "2"}, {"shard_index": 3, "shard_count": 4}) == (3, 4)
+
+
+def test_get_shard_default():
+    assert get_shard({}) == (0, 1)
+
+
+def test_get_shard_invalid():
+    with pytest.raises(ValueError):
+        get_shard({}, {"shard_index": 4, "shard_count": 4})
+
+
+def test_get_shard_stations_partitions_every_station():
+    stations = [f"S{i:02d}" for i in range(50)]
+
+    shards = [get_shard_stations(stations, i, 4) for i in range(4)]
+
+    assert sorted(sum(shards, [])) == stations
+    assert all(shards)
+
+
+@patch("network.execute_values")
+def test_claim_services_keeps_claimed(mock_execute_values):
+    mock_execute_values.return_value = [{"service_uid": "A1"}]
+    conn = MagicMock()
+
+    services = [{"service_uid": "A1"}, {"service_uid": "A2"}]
+
+    assert claim_services(conn, services, 0) == [{"service_uid": "A1"}]
+    conn.commit.assert_called_once()
+
+
+def test_claim_services_empty():
+    assert claim_services(MagicMock(), [], 0) == []
+
+
+@pytest.mark.parametrize("config, expiry", [
+    ({}, 75),
+    ({"POLL_SCHEDULE": "adaptive"}, 30),
+    ({"POLL_SCHEDULE": "adaptive", "POLL_MIN_INTERVAL": "20"}, 35),
+    ({"CLAIM_EXPIRY_MINUTES": "90"}, 90)])
+def test_get_claim_expiry_minutes_outlasts_one_run(config, expiry):
+    assert get_claim_expiry_minutes(config) == expiry
@@ -0,0 +1,112 @@
+"""Script for testing partitions.py"""
+
+# pylint:skip-file
+
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from partitions import (get_month_start, get_months, get_partition_month,
+                        get_expired_partitions, create_partitions, manage_partitions,
+                        get_archived_days)
+
+
+def get_conn(partitions: list[str]) -> tuple[MagicMock, MagicMock]:
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchall.return_value = [{"partition_name": name} for name in partitions]
+    return conn, cur
+
+
+def get_statements(cur: MagicMock) -> list[str]:
+    return [" ".join(call[0][0].split()) for call in cur.execute.call_args_list]
+
+
+def test_get_month_start_crosses_years():
+    assert get_month_start(date(2026, 11, 17), 2) == date(2027, 1, 1)
+    assert get_month_start(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert get_month_start(date(2026, 3, 5)) == date(2026, 3, 1)
+
+
+def test_get_months():
+    assert get_months(date(2026, 11, 17), date(2027, 1, 1)) == [
+        date(2026, 11, 1), date(2026, 12, 1), date(2027, 1, 1)]
+
+
+def test_get_partition_month():
+    assert get_partition_month("arrival_2026_02") == date(2026, 2, 1)
+    assert get_partition_month("arrival_unpartitioned") is None
+
+
+def test_get_expired_partitions_ignores_other_tables():
+    partitions = ["arrival_2026_03", "arrival_2026_01", "arrival_old", "arrival_2026_02"]
+
+    assert get_expired_partitions(partitions, date(2026, 3, 1)) == [
+        "arrival_2026_01", "arrival_2026_02"]
+
+
+def test_create_partitions_only_creates_missing_months():
+    conn, cur = get_conn(["arrival_2026_10"])
+
+    created = create_partitions(conn, [date(2026, 10, 1), date(2026, 11, 1)])
+
+    assert created == ["arrival_2026_11"]
+    assert ("CREATE TABLE IF NOT EXISTS arrival_2026_11 PARTITION OF arrival "
+            "FOR VALUES FROM ('2026-11-01') TO ('2026-12-01');") in get_statements(cur)
+    conn.commit.assert_not_called()
+
+
+def test_manage_partitions_does_nothing_when_up_to_date():
+    conn, cur = get_conn(["arrival_2026_10", "arrival_2026_11", "arrival_2026_12"])
+
+    manage_partitions({}, conn, date(2026, 10, 17))
+
+    assert len(cur.execute.call_args_list) == 1
+    conn.commit.assert_not_called()
+    conn.rollback.assert_called_once()
+
+
+def test_manage_partitions_creates_ahead_and_archives_old_months():
+    conn, cur = get_conn(["arrival_2026_07", "arrival_2026_08", "arrival_2026_09",
+                          "arrival_2026_10"])
+
+    manage_partitions({"PARTITION_MONTHS_AHEAD": "1", "PARTITION_RETENTION_MONTHS": "3"},
+                      conn, date(2026, 10, 17))
+
+    statements = get_statements(cur)
+    assert "SELECT pg_advisory_xact_lock(%s);" in statements
+    assert any(s.startswith("CREATE TABLE IF NOT EXISTS arrival_2026_11") for s in statements)
+    assert "ALTER TABLE arrival DETACH PARTITION arrival_2026_07;" in statements
+    assert "ALTER TABLE arrival_2026_07 SET SCHEMA arrival_archive;" in statements
+    assert not any("arrival_2026_08" in s for s in statements)
+    conn.commit.assert_called_once()
+
+
+def test_manage_partitions_rolls_back_on_failure():
+    conn, cur = get_conn([])
+    cur.execute.side_effect = [None, None, None, RuntimeError("lock timeout")]
+
+    with pytest.raises(RuntimeError):
+        manage_partitions({}, conn, date(2026, 10, 17))
+
+    conn.rollback.assert_called_once()
+    conn.commit.assert_not_called()
+
+
+def test_manage_partitions_rejects_negative_settings():
+    with pytest.raises(ValueError):
+        manage_partitions({"PARTITION_RETENTION_MONTHS": "-1"}, MagicMock())
+
+
+def test_get_archived_days_skips_expired_and_archived_months():
+    conn, _ = get_conn(["arrival_2025_11"])
+    days = [date(2025, 9, 30), date(2025, 11, 3), date(2026, 9, 1)]
+
+    with patch("partitions.date") as mock_date:
+        mock_date.today.return_value = date(2026, 10, 17)
+        mock_date.side_effect = date
+
+        assert get_archived_days({"PARTITION_RETENTION_MONTHS": "12"}, conn, days) == [
+            date(2025, 9, 30), date(2025, 11, 3)]
+        assert get_archived_days({}, conn, days) == [date(2025, 11, 3)]
@@ -0,0 +1,106 @@
+"""Script for testing rollup.py"""
+
+# pylint:skip-file
+
+from datetime import date
+from unittest.mock import MagicMock, patch, call
+
+import pandas as pd
+import pytest
+
+from rollup import get_rollup_query, refresh_touched_hours, rebuild_rollup, ROLLUP_LOCK_ID
+from load import load
+
+
+def get_statements(cur: MagicMock) -> list[str]:
+    return [" ".join(c[0][0].split()) for c in cur.execute.call_args_list]
+
+
+def test_get_rollup_query_applies_filter_and_bands():
+    query = " ".join(get_rollup_query("WHERE A.arrival_date = CURRENT_DATE").split())
+
+    assert "JOIN service AS SV USING (service_id) WHERE A.arrival_date = CURRENT_DATE" in query
+    assert "COUNT(*) FILTER (WHERE delay >= 5 AND delay < 15) AS delayed_5_to_14" in query
+    assert "GROUP BY arrival_date, arrival_hour, station_id, operator_id" in query
+
+
+def test_get_rollup_query_leaves_out_unknown_stations_and_wraps_midnight():
+    query = " ".join(get_rollup_query("").split())
+
+    assert "WHERE arrival_hour IS NOT NULL AND station_id IS NOT NULL" in query
+    assert ("MOD(EXTRACT(EPOCH FROM A.actual_time - A.scheduled_time)::NUMERIC / 60 + 2160, 1440)"
+            " - 720 END AS delay") in query
+
+
+def test_refresh_touched_hours_locks_then_replaces_the_hours():
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.fetchone.return_value = {"touched": 3}
+
+    assert refresh_touched_hours(conn) == 3
+
+    statements = get_statements(cur)
+    assert statements[0].startswith("SELECT pg_advisory_xact_lock(%s, station_id)")
+    assert cur.execute.call_args_list[0][0][1] == (ROLLUP_LOCK_ID,)
+    assert statements[1].startswith("DELETE FROM arrival_hourly AS H USING rollup_touched AS T")
+    assert statements[2].startswith("INSERT INTO arrival_hourly")
+    assert "JOIN rollup_touched AS T" in statements[2]
+    conn.commit.assert_not_called()
+
+
+def test_rebuild_rollup_replaces_the_date_range():
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.rowcount = 120
+
+    assert rebuild_rollup(conn, date(2026, 2, 1), date(2026, 2, 28)) == 120
+
+    statements = get_statements(cur)
+    assert statements[0] == "LOCK TABLE arrival_hourly IN SHARE ROW EXCLUSIVE MODE;"
+    assert statements[1].startswith("DELETE FROM arrival_hourly")
+    assert statements[2].startswith("INSERT INTO arrival_hourly")
+    assert cur.execute.call_args_list[2][0][1] == {
+        "start": date(2026, 2, 1), "end": date(2026, 2, 28)}
+    conn.commit.assert_called_once()
+
+
+def test_rebuild_rollup_rolls_back_on_failure():
+    conn = MagicMock()
+    cur = conn.cursor.return_value.__enter__.return_value
+    cur.execute.side_effect = [None, RuntimeError("lock timeout")]
+
+    with pytest.raises(RuntimeError):
+        rebuild_rollup(conn)
+
+    conn.rollback.assert_called_once()
+    conn.commit.assert_not_called()
+
+
+@patch("load.upload_arrival_staging_data")
+@patch("load.create_arrival_staging_table")
+@patch("load.get_staged_arrival_counts")
+@patch("load.refresh_touched_hours")
+@patch("load.merge_arrival_tables")
+@patch("load.stage_touched_hours")
+def test_load_refreshes_the_hours_around_the_merge(mock_stage, mock_merge, mock_refresh,
+                                                    mock_counts, mock_create, mock_upload):
+    steps = MagicMock()
+    steps.attach_mock(mock_stage, "stage")
+    steps.attach_mock(mock_merge, "merge")
+    steps.attach_mock(mock_refresh, "refresh")
+    mock_counts.return_value = {"staged": 1, "new": 1}
+    mock_merge.return_value = 1
+    conn = MagicMock()
+    arrivals = pd.DataFrame([{
+        "arrival_date": pd.Timestamp("2026-02-12"),
+        "scheduled_arr_time": pd.Timestamp("1900-01-01 10:49"),
+        "actual_arr_time": pd.Timestamp("1900-01-01 10:52"),
+        "platform_changed": False,
+        "location_cancelled": False,
+        "arrival_station_id": 4,
+        "service_uid": "P72907"}])
+
+    load({}, conn, {"services": pd.DataFrame(), "arrivals": arrivals})
+
+    assert steps.mock_calls == [call.stage(conn), call.merge(conn), call.refresh(conn)]
+    conn.commit.assert_called_once()
@@ -0,0 +1,126 @@
+"""Script for testing rtt_client.py"""
+
+# pylint:skip-file
+
+from io import BytesIO
+
+import pytest
+from unittest.mock import patch
+
+from requests import Session, Response, HTTPError, ConnectionError as RequestsConnectionError
+
+from rtt_client import (TokenBucket, CircuitBreaker, CircuitOpenError,
+                        RTTSession, get_retry_after, get_rtt_session)
+
+
+def make_response(status_code: int, headers: dict = None) -> Response:
+    response = Response()
+    response.status_code = status_code
+    response._content = b"{}"
+    response.raw = BytesIO()
+    response.headers.update(headers or {})
+    return response
+
+
+def test_token_bucket_no_wait_within_capacity():
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+
+
+def test_token_bucket_slow_down_and_speed_up():
+    bucket = TokenBucket(rate=8, capacity=1)
+
+    bucket.slow_down()
+    assert bucket.rate == 4
+
+    for _ in range(100):
+        bucket.speed_up()
+    assert bucket.rate == 8
+
+
+def test_circuit_breaker_opens_at_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_circuit_breaker_half_open_after_reset():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+
+    breaker.record_failure()
+    breaker.check()
+
+    breaker.record_failure()
+    assert breaker.opened_at is not None
+
+
+def test_get_retry_after_seconds():
+    assert get_retry_after(make_response(429, {"Retry-After": "3"})) == 3
+
+
+def test_get_retry_after_missing():
+    assert get_retry_after(make_response(429)) == 0
+
+
+@patch("rtt_client.sleep")
+@patch.object(Session, "request")
+def test_rtt_session_retries_throttle(mock_request, mock_sleep):
+    mock_request.side_effect = [make_response(429, {"Retry-After": "2"}),
+                                make_response(200)]
+    session = RTTSession(rate=1000, burst=1000)
+
+    assert session.get("http://rtt").status_code == 200
+    assert session.stats["retries"] == 1
+    assert session.stats["throttles"] == 1
+    assert mock_sleep.call_args[0][0] >= 2
+
+
+@patch("rtt_client.sleep")
+@patch.object(Session, "request")
+def test_rtt_session_sets_timeout(mock_request, mock_sleep):
+    mock_request.return_value = make_response(200)
+    session = RTTSession(rate=1000, burst=1000, timeout=5)
+
+    session.get("http://rtt")
+
+    assert mock_request.call_args.kwargs["timeout"] == 5
+
+
+@patch("rtt_client.sleep")
+@patch.object(Session, "request")
+def test_rtt_session_gives_up_after_retries(mock_request, mock_sleep):
+    mock_request.return_value = make_response(503)
+    session = RTTSession(rate=1000, burst=1000, max_retries=2)
+
+    with pytest.raises(HTTPError):
+        session.get("http://rtt")
+
+    assert mock_request.call_count == 3
+    assert session.stats["failures"] == 1
+
+
+@patch("rtt_client.sleep")
+@patch.object(Session, "request")
+def test_rtt_session_circuit_breaker_stops_requests(mock_request, mock_sleep):
+    mock_request.side_effect = RequestsConnectionError()
+    session = RTTSession(rate=1000, burst=1000, max_retries=5,
+                         failure_threshold=2, reset_seconds=60)
+
+    with pytest.raises(CircuitOpenError):
+        session.get("http://rtt")
+
+    assert mock_request.call_count == 2
+    assert session.stats["rejected"] == 1
+
+
+def test_get_rtt_session_from_config():
+    session = get_rtt_session({"RTT_RATE_LIMIT": "5", "RTT_TIMEOUT": "3"})
+
+    assert session.bucket.rate == 5
+    assert session.timeout == 3
@@ -0,0 +1,111 @@
+"""Script for testing schedule_cache.py"""
+
+# pylint:skip-file
+
+from datetime import date
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+
+from cache_store import LocalCacheStore
+from extract import ArrivalRecord, extract_batches, get_service_arrival_details
+from schedule_cache import get_service_schedule, get_booked_times, ScheduleCache
+from load import load
+
+
+SERVICE = {"service_uid": "P72907", "origin_station": "London Cannon Street",
+           "destination_station": "Dartford", "operator_name": "Southeastern"}
+
+ARRIVALS = [ArrivalRecord("LBG", "1049", "1052", "2026-02-12", False, False, "P72907"),
+            ArrivalRecord("DFD", "1120", None, "2026-02-12", False, True, "P72907")]
+
+
+def test_get_service_schedule():
+    assert get_service_schedule(SERVICE, ARRIVALS) == {
+        "origin_station": "London Cannon Street",
+        "destination_station": "Dartford",
+        "operator_name": "Southeastern",
+        "booked": {"LBG": ["1049"], "DFD": ["1120"]}
+    }
+
+
+def test_get_booked_times_matches_repeated_calls_in_order():
+    arrivals = [ARRIVALS[0], ARRIVALS[1], ARRIVALS[0]._replace(scheduled_arr_time="1150")]
+    schedule = get_service_schedule(SERVICE, arrivals)
+
+    assert get_booked_times(schedule, ["LBG", "DFD", "LBG", "LBG"]) == [
+        "1049", "1120", "1150", None]
+
+
+def test_schedule_cache_saves_pending_only(tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    cache = ScheduleCache(store, date(2026, 2, 12))
+
+    cache.add({"P72907": get_service_schedule(SERVICE, ARRIVALS)})
+    assert ScheduleCache(store, date(2026, 2, 12)).get("P72907") is None
+
+    cache.save()
+    reloaded = ScheduleCache(store, date(2026, 2, 12))
+
+    assert reloaded.get("P72907")["booked"] == {"LBG": ["1049"], "DFD": ["1120"]}
+    assert reloaded.get("P72908") is None
+    assert reloaded.stats == {"known": 1, "new": 1}
+
+
+def test_schedule_cache_is_per_run_date(tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    cache = ScheduleCache(store, date(2026, 2, 12))
+    cache.add({"P72907": get_service_schedule(SERVICE, ARRIVALS)})
+    cache.save()
+
+    assert ScheduleCache(store, date(2026, 2, 13)).get("P72907") is None
+
+
+def test_get_service_arrival_details_uses_booked_times():
+    session = MagicMock()
+    session.get.return_value.json.return_value = {
+        "runDate": "2026-02-12",
+        "locations": [{"crs": "LBG", "gbttBookedArrival": "9999", "realtimeArrival": "1055"}]
+    }
+
+    arrivals = get_service_arrival_details(
+        session, SERVICE, schedule={"booked": {"LBG": ["1049"]}})
+
+    assert arrivals[0].scheduled_arr_time == "1049"
+    assert arrivals[0].actual_arr_time == "1055"
+
+
+@patch("extract.get_cache_store")
+@patch("extract.get_service_arrival_details")
+@patch("extract.get_service_details")
+def test_extract_batches_skips_known_services(mock_services, mock_arrivals, mock_store, tmp_path):
+    mock_store.return_value = LocalCacheStore(str(tmp_path / "responses"))
+    mock_services.return_value = [SERVICE, {**SERVICE, "service_uid": "P72908"}]
+    mock_arrivals.side_effect = lambda session, service, cache=None, run_date=None, schedule=None: [
+        ARRIVALS[0]._replace(service_uid=service["service_uid"])]
+
+    schedule_cache = ScheduleCache(LocalCacheStore(str(tmp_path / "schedules")))
+    schedule_cache.known["P72907"] = get_service_schedule(SERVICE, ARRIVALS)
+
+    batches = list(extract_batches({"RTT_USER": "u", "RTT_PASSWORD": "p"}, ["LBG"],
+                                   max_workers=2, schedule_cache=schedule_cache))
+
+    assert [s["service_uid"] for s in batches[0]["services"]] == ["P72908"]
+    assert [a.service_uid for a in batches[0]["arrivals"]] == ["P72907", "P72908"]
+    assert list(batches[0]["schedules"]) == ["P72908"]
+    assert schedule_cache.pending == {}
+
+
+@patch("load.create_service_staging_table")
+@patch("load.create_arrival_staging_table")
+@patch("load.upload_arrival_staging_data")
+@patch("load.merge_arrival_tables")
+def test_load_skips_service_staging_without_new_services(
+        mock_merge, mock_upload, mock_create_arrival, mock_create_service):
+    arrivals = pd.DataFrame([{**ARRIVALS[0]._asdict(), "arrival_station_id": 4}])
+
+    load({}, MagicMock(), {"services": pd.DataFrame(), "arrivals": arrivals})
+
+    mock_create_service.assert_not_called()
+    mock_upload.assert_called_once()
+    assert mock_upload.call_args[0][0]["service_uid"].tolist() == ["P72907"]
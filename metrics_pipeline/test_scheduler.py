@@ -0,0 +1,80 @@
+"""Script for testing scheduler.py"""
+
+# pylint:skip-file
+
+from datetime import datetime
+
+import pytest
+
+from cache_store import LocalCacheStore
+from scheduler import (allocate_poll_intervals, get_station_weight, get_poll_cost,
+                       PollSchedule)
+
+
+VOLATILITY = [
+    {"station_crs": "LBG", "delay_variance": 64.0,
+     "services_per_day": 480.0, "in_progress_share": 0.5},
+    {"station_crs": "WFJ", "delay_variance": 1.0,
+     "services_per_day": 120.0, "in_progress_share": 0.1},
+    {"station_crs": "SHF", "delay_variance": None,
+     "services_per_day": 48.0, "in_progress_share": None}
+]
+
+
+def test_get_station_weight():
+    assert get_station_weight(VOLATILITY[0]) == pytest.approx(9 * 0.6)
+    assert get_station_weight(VOLATILITY[2]) == pytest.approx(0.1)
+
+
+def test_get_poll_cost():
+    assert get_poll_cost(VOLATILITY[0]) == 21
+
+
+def test_allocate_poll_intervals_favours_volatile_stations():
+    intervals = allocate_poll_intervals(VOLATILITY, ["LBG", "WFJ", "SHF"], 2500)
+
+    assert intervals["LBG"] < intervals["WFJ"] < intervals["SHF"]
+
+
+def test_allocate_poll_intervals_within_budget():
+    stations = ["LBG", "WFJ", "SHF"]
+    intervals = allocate_poll_intervals(VOLATILITY, stations, 2500)
+    costs = {entry["station_crs"]: get_poll_cost(entry) for entry in VOLATILITY}
+
+    requests = sum(1440 / intervals[crs] * costs[crs] for crs in stations)
+
+    assert requests <= 2500 * 1.05
+
+
+def test_allocate_poll_intervals_clamped():
+    intervals = allocate_poll_intervals(VOLATILITY, ["LBG", "WFJ", "SHF"], 10 ** 7,
+                                        min_interval=15, max_interval=240)
+
+    assert set(intervals.values()) == {15}
+
+    intervals = allocate_poll_intervals(VOLATILITY, ["LBG", "WFJ", "SHF"], 1,
+                                        min_interval=15, max_interval=240)
+
+    assert set(intervals.values()) == {240}
+
+
+def test_allocate_poll_intervals_unknown_station():
+    intervals = allocate_poll_intervals(VOLATILITY, ["LBG", "ABW"], 3000)
+
+    assert set(intervals) == {"LBG", "ABW"}
+
+
+def test_allocate_poll_intervals_invalid():
+    with pytest.raises(ValueError):
+        allocate_poll_intervals(VOLATILITY, ["LBG"], 3000, min_interval=60, max_interval=30)
+
+
+def test_poll_schedule_due_stations(tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    schedule = PollSchedule(store, tick_minutes=15)
+    schedule.record(["LBG", "WFJ"], datetime(2026, 2, 12, 10, 0, 5))
+
+    due = PollSchedule(store, tick_minutes=15).get_due_stations(
+        {"LBG": 30, "WFJ": 60, "SHF": 60}, datetime(2026, 2, 12, 10, 30, 1))
+
+    assert due == ["LBG", "SHF"]
@@ -0,0 +1,97 @@
+"""Script for testing service_cache.py"""
+
+# pylint:skip-file
+
+from unittest.mock import MagicMock
+
+from cache_store import LocalCacheStore
+from service_cache import is_service_terminal, ServiceResponseCache
+from extract import get_service_arrival_details
+
+
+FINISHED_SERVICE = {
+    "serviceUid": "P72907",
+    "runDate": "2026-02-12",
+    "locations": [
+        {"crs": "CST", "gbttBookedDeparture": "0926"},
+        {"crs": "LBG", "gbttBookedArrival": "1049",
+         "realtimeArrival": "1052", "realtimeArrivalActual": True},
+        {"crs": "DFD", "gbttBookedArrival": "1120", "cancelReasonCode": "TG"}
+    ]
+}
+
+RUNNING_SERVICE = {
+    "serviceUid": "P72908",
+    "runDate": "2026-02-12",
+    "locations": [
+        {"crs": "CST", "gbttBookedDeparture": "0926"},
+        {"crs": "LBG", "gbttBookedArrival": "1049",
+         "realtimeArrival": "1052", "realtimeArrivalActual": False}
+    ]
+}
+
+
+def test_is_service_terminal_finished():
+    assert is_service_terminal(FINISHED_SERVICE) == True
+
+
+def test_is_service_terminal_running():
+    assert is_service_terminal(RUNNING_SERVICE) == False
+
+
+def test_is_service_terminal_error():
+    assert is_service_terminal({"error": "No schedule found"}) == False
+
+
+def test_cache_stores_terminal_services(tmp_path):
+    cache = ServiceResponseCache(LocalCacheStore(str(tmp_path)))
+
+    cache.put("P72907", "2026-02-12", FINISHED_SERVICE)
+
+    assert cache.get("P72907", "2026-02-12") == FINISHED_SERVICE
+    assert cache.stats["hits"] == 1
+    assert cache.stats["bytes_saved"] > 0
+
+
+def test_cache_skips_running_services(tmp_path):
+    cache = ServiceResponseCache(LocalCacheStore(str(tmp_path)))
+
+    cache.put("P72908", "2026-02-12", RUNNING_SERVICE)
+
+    assert cache.get("P72908", "2026-02-12") is None
+    assert cache.stats["misses"] == 1
+
+
+def test_get_service_arrival_details_uses_cache(tmp_path):
+    cache = MagicMock()
+    cache.get.return_value = FINISHED_SERVICE
+    session = MagicMock()
+
+    arrivals = get_service_arrival_details(
+        session, {"service_uid": "P72907"}, cache)
+
+    session.get.assert_not_called()
+    assert [a.crs for a in arrivals] == ["CST", "LBG", "DFD"]
+
+
+def test_cache_lists_each_run_date_once_instead_of_getting_misses():
+    store = MagicMock()
+    store.list_keys.return_value = ["services/2026-02-12/P72907.json"]
+    store.get.return_value = b"{}"
+    cache = ServiceResponseCache(store)
+
+    assert cache.get("P72908", "2026-02-12") is None
+    assert cache.get("P72909", "2026-02-12") is None
+    assert cache.get("P72907", "2026-02-12") == {}
+
+    store.list_keys.assert_called_once_with("services/2026-02-12")
+    store.get.assert_called_once_with("services/2026-02-12/P72907.json")
+
+
+def test_local_store_lists_keys_under_a_prefix(tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    store.put("services/2026-02-12/P72907.json", b"{}")
+    store.put("services/2026-02-13/P72908.json", b"{}")
+
+    assert store.list_keys("services/2026-02-12") == ["services/2026-02-12/P72907.json"]
+    assert store.list_keys("services/2026-02-14") == []
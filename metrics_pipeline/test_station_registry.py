@@ -0,0 +1,59 @@
+"""Script for testing station_registry.py"""
+
+# pylint:skip-file
+
+import json
+
+import pytest
+
+from station_registry import StationRegistry, normalise_station_name
+
+
+@pytest.fixture
+def registry(test_mock_crs_file):
+    stations = json.loads(test_mock_crs_file)
+    stations.append({"name": "London King's Cross Rail Station", "crs": "KGX"})
+    stations.append({"name": "Kew Bridge Rail Station", "crs": "KWB"})
+    return StationRegistry(stations)
+
+
+def test_normalise_station_name():
+    assert normalise_station_name(
+        "London King's Cross Rail Station") == "london kings cross"
+
+
+def test_normalise_station_name_ampersand():
+    assert normalise_station_name(
+        "Abergele & Pensarn Rail Station") == "abergele and pensarn"
+
+
+def test_find_exact(registry):
+    assert registry.find_exact("kew gardens") == ["KWG"]
+
+
+def test_find_prefix(registry):
+    assert registry.find_prefix("Kew") == ["KWG", "KWB"]
+
+
+def test_find_substring(registry):
+    assert registry.find_substring("Kings Cross") == ["KGX"]
+
+
+def test_find_substring_short_query(registry):
+    assert registry.find_substring("er") == ["RTR", "RTR", "YET"]
+
+
+def test_get_crs_prefers_exact(registry):
+    assert registry.get_crs("London Bridge") == "LBG"
+
+
+def test_get_crs_ambiguous(registry):
+    with pytest.raises(ValueError) as e:
+        registry.get_crs("Kew")
+    assert "matches with more than 1 station" in str(e.value)
+
+
+def test_get_crs_missing(registry):
+    with pytest.raises(ValueError) as e:
+        registry.get_crs("Nowhere")
+    assert "does not match any existing station" in str(e.value)
@@ -0,0 +1,82 @@
+"""Script for testing streaming.py"""
+
+# pylint:skip-file
+
+import pytest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from cache_store import LocalCacheStore
+from extract import extract_batches
+from schedule_cache import ScheduleCache
+from streaming import prefetch_batches, run_streaming_pipeline
+
+
+def test_prefetch_batches_keeps_order():
+    assert list(prefetch_batches(iter(range(10)), 2)) == list(range(10))
+
+
+def test_prefetch_batches_raises_errors():
+    def batches():
+        yield 1
+        raise RuntimeError("API down")
+
+    with pytest.raises(RuntimeError):
+        list(prefetch_batches(batches(), 2))
+
+
+def test_prefetch_batches_stops_producer_early():
+    closed = []
+
+    def batches():
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed.append(True)
+
+    for batch in prefetch_batches(batches(), 1):
+        break
+
+    assert closed == [True]
+
+
+@patch("extract.get_cache_store")
+@patch("extract.get_service_arrival_details")
+@patch("extract.get_service_details")
+def test_extract_batches_dedupes_across_stations(mock_services, mock_arrivals, mock_store, tmp_path):
+    mock_store.return_value = LocalCacheStore(str(tmp_path))
+    mock_services.side_effect = lambda session, station_crs, run_date=None, window_start=None: [
+        {"service_uid": uid, "origin_station": "X",
+         "destination_station": "Y", "operator_name": "Southern"}
+        for uid in ["A1", "A2", f"{station_crs}1"]
+    ]
+    mock_arrivals.side_effect = lambda session, service, cache=None, run_date=None, schedule=None: [
+        {"crs": "LBG", "service_uid": service["service_uid"]}]
+
+    batches = list(extract_batches({"RTT_USER": "u", "RTT_PASSWORD": "p"},
+                                   ["LBG", "KGX"], max_workers=2, batch_size=2))
+
+    assert [[s["service_uid"] for s in batch["services"]] for batch in batches] == [
+        ["A1", "A2"], ["LBG1"], ["KGX1"]]
+
+
+@patch("streaming.load")
+@patch("streaming.transform")
+@patch("streaming.extract_batches")
+def test_run_streaming_pipeline_adds_schedules_once_loaded(mock_batches, mock_transform,
+                                                           mock_load, tmp_path):
+    store = LocalCacheStore(str(tmp_path))
+    schedule_cache = ScheduleCache(store, date(2026, 2, 12))
+    mock_batches.return_value = iter([
+        {"services": [], "arrivals": [], "schedules": {f"A{i}": {"booked": {}}}}
+        for i in range(3)])
+    saved_when_loading = []
+    mock_load.side_effect = lambda *args: saved_when_loading.append(
+        set(ScheduleCache(store, date(2026, 2, 12)).known))
+
+    run_streaming_pipeline({"STREAM_MAX_PENDING": "3"}, MagicMock(), ["LBG"],
+                           schedule_cache=schedule_cache)
+
+    assert saved_when_loading == [set(), {"A0"}, {"A0", "A1"}]
+    assert set(ScheduleCache(store, date(2026, 2, 12)).known) == {"A0", "A1", "A2"}
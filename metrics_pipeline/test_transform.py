@@ -4,7 +4,14 @@
 
 import pandas as pd
 
-from transform import get_station_name_dict, assign_station_id_to_arrival, assign_operator_id_to_service
+from datetime import datetime
+
+from extract import ArrivalRecord
+from unittest.mock import MagicMock
+
+from transform import (get_station_name_dict, assign_station_id_to_arrival,
+                       assign_operator_id_to_service, parse_arrival_times,
+                       get_station_name_index, resolve_station_names)
 
 
 def test_get_station_name_dict_valid():
@@ -127,3 +134,52 @@ def test_assign_operator_id_to_service_valid_2():
 
     assert pd.concat([assign_operator_id_to_service(
         test_df, test_operator_name_list), target_df]).drop_duplicates(keep=False).empty == True
+
+
+def test_parse_arrival_times():
+    test_df = pd.DataFrame([
+        ArrivalRecord("LBG", "1049", "1052", "2026-02-12", False, False, "P72907"),
+        ArrivalRecord("CST", None, None, "2026-02-12", False, True, "P72907")
+    ])
+
+    result = parse_arrival_times(test_df)
+
+    assert result["scheduled_arr_time"][0] == datetime(1900, 1, 1, 10, 49)
+    assert result["actual_arr_time"][0] == datetime(1900, 1, 1, 10, 52)
+    assert pd.isna(result["scheduled_arr_time"][1])
+    assert result["arrival_date"][1] == datetime(2026, 2, 12)
+
+
+def get_test_dimensions():
+    dimensions = MagicMock()
+    dimensions.stations = [
+        {"station_name": "London Kings Cross", "station_id": 1},
+        {"station_name": "St Pancras International", "station_id": 2},
+        {"station_name": "Highbury & Islington", "station_id": 3}
+    ]
+    dimensions.aliases = [
+        {"alias_name": "London St Pancras International", "station_id": 2},
+        {"alias_name": "Kings Cross", "station_id": 9}
+    ]
+    return dimensions
+
+
+def test_get_station_name_index_prefers_station_names():
+    index = get_station_name_index(get_test_dimensions())
+
+    assert index.loc["london kings cross", "station_id"] == 1
+    assert index.loc["london st pancras international", "is_alias"] == True
+    assert index.loc["kings cross", "station_id"] == 9
+
+
+def test_resolve_station_names_spelling_variants():
+    index = get_station_name_index(get_test_dimensions())
+    service_df = pd.DataFrame({
+        "origin_station": ["London King's Cross", "Highbury and Islington", "Nowhere"],
+        "destination_station": ["London St Pancras International", None, "London Kings Cross"]})
+
+    result = resolve_station_names(service_df, index)
+
+    assert result["origin_station_id"].tolist() == [1, 3, pd.NA]
+    assert result["destination_station_id"].tolist() == [2, pd.NA, 1]
+
@@ -6,13 +6,17 @@
 from logging import getLogger, basicConfig, INFO
 from os import environ as ENV, _Environ
 
+import numpy as np
 import pandas as pd
 from psycopg2 import connect
 from psycopg2.extensions import connection
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
-from extract import extract
+from extract import extract, ArrivalRecord
+from cache_store import get_cache_dir
+from dimension_cache import get_dimension_cache, DimensionCache
+from station_registry import normalise_station_name
 
 logger = getLogger(__name__)
 
@@ -30,47 +34,111 @@ def get_db_connection(config: _Environ) -> connection:
     )
 
 
-def get_station_id_list(conn: connection) -> list[dict]:
-    """Returns a list of dictionaries with \
-        station_crs codes along with the station ids and names."""
+def get_station_name_dict(station_crs_list: list[dict]) -> dict:
+    """Gets the station crs dictionary, containing the name and station_id"""
 
-    sql = """SELECT station_id, station_crs, station_name
-             FROM station;
-             """
+    station_name_dict = {}
+    for entry in station_crs_list:
+        station_name = entry["station_name"].replace(" Rail Station", "")
+        station_id = entry["station_id"]
+        station_name_dict[station_name] = station_id
 
-    with conn.cursor() as cur:
-        cur.execute(sql)
+    return station_name_dict
 
-        result = cur.fetchall()
 
-    return result
+def map_ids(values: pd.Series, ids: dict) -> pd.Series:
+    """Returns the id of each value as Int32, or NA if it has none. Categorical
+       columns are mapped once per category, then gathered by their codes."""
 
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        category_ids = pd.array(values.cat.categories.map(ids), dtype="Int32")
 
-def get_operator_id_list(conn: connection) -> list[dict]:
-    """Returns a list of dictionaries with the operator name and it's ID in the database."""
+        return pd.Series(category_ids.take(values.cat.codes.to_numpy(), allow_fill=True),
+                         index=values.index)
 
-    sql = """SELECT operator_id, operator_name
-             FROM operator;
-             """
+    return values.map(ids).astype("Int32")
 
-    with conn.cursor() as cur:
-        cur.execute(sql)
 
-        result = cur.fetchall()
+def get_service_frame(services: list[dict]) -> pd.DataFrame:
+    """Returns the services as a DataFrame, with the repeated
+       station and operator names stored as categoricals."""
 
-    return result
+    service_df = pd.DataFrame(services, columns=[
+        "service_uid", "origin_station", "destination_station", "operator_name"])
 
+    return service_df.astype({"origin_station": "category",
+                              "destination_station": "category",
+                              "operator_name": "category"})
 
-def get_station_name_dict(station_crs_list: list[dict]) -> dict:
-    """Gets the station crs dictionary, containing the name and station_id"""
 
-    station_name_dict = {}
-    for entry in station_crs_list:
-        station_name = entry["station_name"].replace(" Rail Station", "")
-        station_id = entry["station_id"]
-        station_name_dict[station_name] = station_id
+def get_categorical(values: list) -> pd.Categorical:
+    """Returns the values as a categorical, with None as missing."""
+
+    codes, categories = pd.factorize(np.array(values, dtype=object))
+
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def get_arrival_frame(arrivals: list[ArrivalRecord]) -> pd.DataFrame:
+    """Returns the arrivals as a DataFrame built a column at a time in compact dtypes.
+       The crs, service UID and raw time columns repeat a few distinct values, so they're
+       stored as categoricals and the times parsed once per distinct value.
+       The flags are nullable booleans."""
+
+    arrival_df = pd.DataFrame({
+        "crs": get_categorical([arrival.crs for arrival in arrivals]),
+        "scheduled_arr_time": get_categorical(
+            [arrival.scheduled_arr_time for arrival in arrivals]),
+        "actual_arr_time": get_categorical([arrival.actual_arr_time for arrival in arrivals]),
+        "arrival_date": get_categorical([arrival.arrival_date for arrival in arrivals]),
+        "platform_changed": pd.array(np.array(
+            [arrival.platform_changed for arrival in arrivals], dtype=bool), dtype="boolean"),
+        "location_cancelled": pd.array(np.array(
+            [arrival.location_cancelled for arrival in arrivals], dtype=bool), dtype="boolean"),
+        "service_uid": get_categorical([arrival.service_uid for arrival in arrivals])
+    })
+
+    return parse_arrival_times(arrival_df)
+
+
+def get_station_name_index(dimensions: DimensionCache) -> pd.DataFrame:
+    """Returns the station id of every normalised station name and alias, indexed by name.
+       A station's own name wins over an alias spelt the same way."""
+
+    aliases = pd.DataFrame({
+        "name": [alias["alias_name"] for alias in dimensions.aliases],
+        "station_id": [alias["station_id"] for alias in dimensions.aliases],
+        "is_alias": True})
+    station_name_dict = get_station_name_dict(dimensions.stations)
+    names = pd.DataFrame({
+        "name": list(station_name_dict),
+        "station_id": list(station_name_dict.values()),
+        "is_alias": False})
+
+    index = pd.concat([aliases, names], ignore_index=True)
+    index["name"] = index["name"].map(normalise_station_name)
+
+    return index.drop_duplicates("name", keep="last").set_index("name")
 
-    return station_name_dict
+
+def resolve_station_names(service_df: pd.DataFrame, name_index: pd.DataFrame) -> pd.DataFrame:
+    """Assigns the origin and destination station ids, normalising each distinct
+       name once and looking them all up in the name index together."""
+
+    names = pd.Series(pd.unique(pd.concat([
+        service_df["origin_station"], service_df["destination_station"]]).dropna()))
+    matches = name_index.reindex(names.map(normalise_station_name))
+
+    station_ids = dict(zip(names, matches["station_id"]))
+
+    service_df["origin_station_id"] = map_ids(service_df["origin_station"], station_ids)
+    service_df["destination_station_id"] = map_ids(
+        service_df["destination_station"], station_ids)
+
+    logger.info(f"Resolved {matches['station_id'].notna().sum()} of {len(names)} station names, "
+                f"{matches['is_alias'].eq(True).sum()} through aliases")
+
+    return service_df
 
 
 def assign_station_id_to_arrival(df: pd.DataFrame, station_crs_list: list[dict]) -> pd.DataFrame:
@@ -82,7 +150,7 @@ def assign_station_id_to_arrival(df: pd.DataFrame, station_crs_list: list[dict])
         station_id = entry["station_id"]
         station_crs_dict[station_crs] = station_id
 
-    df["arrival_station_id"] = df["crs"].map(station_crs_dict).astype("Int64")
+    df["arrival_station_id"] = map_ids(df["crs"], station_crs_dict)
 
     return df
 
@@ -96,49 +164,101 @@ def assign_operator_id_to_service(df: pd.DataFrame, operator_name_list: list[dic
         operator_id = entry["operator_id"]
         operator_name_dict[operator_name] = operator_id
 
-    df["operator_id"] = df["operator_name"].map(
-        operator_name_dict).astype("Int64")
+    df["operator_id"] = map_ids(df["operator_name"], operator_name_dict)
+
+    return df
+
+
+def log_unknown_stations(service_df: pd.DataFrame, arrival_df: pd.DataFrame) -> None:
+    """Logs the station names and crs codes which couldn't be resolved, most common first,
+       so they can be added to station_alias. Unlike operators, stations aren't added
+       automatically, as a station needs its coordinates."""
+
+    unresolved_names = pd.concat([
+        service_df.loc[service_df["origin_station_id"].isna(), "origin_station"],
+        service_df.loc[service_df["destination_station_id"].isna(), "destination_station"]
+    ]).dropna().value_counts()
+    unresolved_crs = arrival_df.loc[
+        arrival_df["arrival_station_id"].isna(), "crs"].value_counts()
+
+    if len(unresolved_names):
+        logger.warning(f"Unresolved station names in {unresolved_names.sum()} services: " +
+                       ", ".join(f"{name} ({count})"
+                                 for name, count in unresolved_names.head(10).items()))
+    if len(unresolved_crs):
+        logger.warning(f"Unresolved crs codes in {unresolved_crs.sum()} arrivals: " +
+                       ", ".join(f"{crs} ({count})"
+                                 for crs, count in unresolved_crs.head(10).items()))
+
+
+def parse_column(values: pd.Series, time_format: str) -> pd.Series:
+    """Parses a column of raw RTT times. Categorical columns are parsed
+       once per distinct value, then gathered by their codes."""
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        parsed = pd.DatetimeIndex(pd.to_datetime(values.cat.categories, format=time_format))
+
+        return pd.Series(parsed.take(values.cat.codes.to_numpy(), allow_fill=True,
+                                     fill_value=pd.NaT), index=values.index)
+
+    return pd.to_datetime(values, format=time_format)
+
+
+def parse_arrival_times(df: pd.DataFrame) -> pd.DataFrame:
+    """Parses the raw RTT arrival times (HHMM) and run dates (YYYY-MM-DD)
+       a whole column at a time."""
+
+    df["scheduled_arr_time"] = parse_column(df["scheduled_arr_time"], "%H%M")
+    df["actual_arr_time"] = parse_column(df["actual_arr_time"], "%H%M")
+    df["arrival_date"] = parse_column(df["arrival_date"], "%Y-%m-%d")
 
     return df
 
 
 def transform(config: _Environ, data: dict, conn: connection) -> dict:
     """Returns a dictionary containing the transformed service and arrival data.
-       Apart from service_id in arrival, which needs to be loaded first to access."""
+       Apart from service_id in arrival, which is resolved from service_uid during the load."""
 
     basicConfig(level=INFO)
 
-    if not data["services"]:
+    if not data["arrivals"]:
         return {"services": pd.DataFrame(), "arrivals": pd.DataFrame()}
 
-    service_df = pd.DataFrame(data["services"])
+    # services already in the schedule cache only bring their arrivals,
+    # so the list of new services can be empty
+    service_df = get_service_frame(data["services"])
     logger.info("Converted services to DataFrame")
-    arrival_df = pd.DataFrame(data["arrivals"])
+    arrival_df = get_arrival_frame(data["arrivals"])
     logger.info("Converted arrivals to DataFrame")
 
-    db_station_ids = get_station_id_list(conn=conn)
-    logger.info("Retrieved station ids from RDS")
+    # the dimension tables are only re-read when their version has changed
+    dimensions = get_dimension_cache(config.get("CACHE_DIR", get_cache_dir()))
+    dimensions.refresh(conn)
+    logger.info("Checked the cached station and operator ids")
+
+    db_station_ids = dimensions.stations
 
-    station_name_dict = get_station_name_dict(db_station_ids)
+    # the name index is only rebuilt when the cached rows change
+    name_index = dimensions.get_index("station_names", get_station_name_index)
 
-    service_df["origin_station_id"] = service_df["origin_station"].map(
-        station_name_dict).astype("Int64")
-    service_df["destination_station_id"] = service_df["destination_station"].map(
-        station_name_dict).astype("Int64")
+    service_df = resolve_station_names(service_df, name_index)
     logger.info("Assigned service station ids")
 
-    db_operator_ids = get_operator_id_list(conn=conn)
-    logger.info("Retrieved operator ids from RDS")
+    # new operators are written through, so their services don't get a NULL operator_id
+    dimensions.add_operators(conn, set(service_df["operator_name"].dropna()))
+    db_operator_ids = dimensions.operators
 
     service_df = assign_operator_id_to_service(service_df, db_operator_ids)
     logger.info("Assigned operator ids to services")
 
-    service_df = service_df[[
-        "service_uid", "origin_station_id", "destination_station_id", "operator_id"]]
-
     arrival_df = assign_station_id_to_arrival(arrival_df, db_station_ids)
     logger.info("Assigned operator ids to arrivals")
 
+    log_unknown_stations(service_df, arrival_df)
+
+    service_df = service_df[[
+        "service_uid", "origin_station_id", "destination_station_id", "operator_id"]]
+
     result = {}
 
     result["services"] = service_df
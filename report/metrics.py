@@ -166,20 +166,19 @@ def get_most_delayed_service(conn: connection) -> dict:
 
 
 def get_most_delayed_lines(conn: connection, limit: int = 5) -> list[dict]:
-    """Returns a list of the most delayed lines and their minutes delayed today."""
+    """Returns a list of the most delayed lines and their minutes delayed today,
+    read from the hourly rollup rather than every arrival."""
 
     query = """
             SELECT
             	operator_name,
-            	SUM(EXTRACT(MINUTE FROM (actual_time - scheduled_time))) AS total_delay_mins
-            FROM arrival
-            JOIN service
-            	USING (service_id)
+            	ROUND(SUM(delay_minutes))::INT AS total_delay_mins
+            FROM arrival_hourly
             JOIN operator
             	USING (operator_id)
-            WHERE arrival_date = CURRENT_DATE AND actual_time >= scheduled_time
+            WHERE arrival_date = CURRENT_DATE
             GROUP BY operator_id, operator_name
-            ORDER BY SUM(EXTRACT(MINUTE FROM (actual_time - scheduled_time))) DESC
+            ORDER BY SUM(delay_minutes) DESC
             LIMIT {}
             ;
             """.format(limit)
@@ -188,18 +187,19 @@ def get_most_delayed_lines(conn: connection, limit: int = 5) -> list[dict]:
 
 
 def get_most_delayed_stations(conn: connection, limit: int = 5) -> list[dict]:
-    """Returns a list of the most delayed stations with the number of services delayed today."""
+    """Returns a list of the most delayed stations with their minutes delayed today,
+    read from the hourly rollup rather than every arrival."""
 
     query = """
             SELECT
             	station_name,
-            	SUM(EXTRACT(MINUTE FROM (actual_time - scheduled_time))) AS total_delay_mins
-            FROM arrival A
-            JOIN station S
-            	ON (A.arrival_station_id = S.station_id)
-            WHERE arrival_date = CURRENT_DATE AND actual_time >= scheduled_time
+            	ROUND(SUM(delay_minutes))::INT AS total_delay_mins
+            FROM arrival_hourly
+            JOIN station
+            	USING (station_id)
+            WHERE arrival_date = CURRENT_DATE
             GROUP BY station_id, station_name
-            ORDER BY SUM(EXTRACT(MINUTE FROM (actual_time - scheduled_time))) DESC
+            ORDER BY SUM(delay_minutes) DESC
             LIMIT {}
             ;
             """.format(limit)
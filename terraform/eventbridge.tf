@@ -43,17 +43,22 @@ resource "aws_iam_role_policy" "eventbridge-metrics-role" {
 ################### Eventbridge Schedules ###################
 
 resource "aws_scheduler_schedule" "metrics-schedule" {
-  name = "c21-railway-tracker-metrics-schedule"
+  count = var.METRICS_SHARD_COUNT
+  name  = "c21-railway-tracker-metrics-schedule-${count.index}"
 
   flexible_time_window {
     mode = "OFF"
   }
   
-  schedule_expression = "cron(0 * * * ? *)"
+  schedule_expression = var.METRICS_SCHEDULE_EXPRESSION
 
   target {
     arn = aws_lambda_function.c21-railway-tracker-metrics-lambda.arn
     role_arn = aws_iam_role.eventbridge-scheduler-role.arn
+    input = jsonencode({
+      shard_index = count.index
+      shard_count = var.METRICS_SHARD_COUNT
+    })
   }
 }
 
@@ -22,6 +22,17 @@ resource "aws_iam_role_policy_attachment" "lambda_basic_logs" {
   policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
 }
 
+# The metrics pipeline has its own role, so it can only reach the cache bucket
+resource "aws_iam_role" "metrics_lambda_exec_role" {
+  name               = "c21-railway-metrics-lambda-exec-role"
+  assume_role_policy = data.aws_iam_policy_document.lambda_assume_role.json
+}
+
+resource "aws_iam_role_policy_attachment" "metrics_lambda_basic_logs" {
+  role       = aws_iam_role.metrics_lambda_exec_role.name
+  policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
+}
+
 ################### S3 Read/Write Policies ###################
 
 data "aws_iam_policy_document" "lambda_s3_policy" {
@@ -58,11 +69,45 @@ resource "aws_iam_role_policy_attachment" "lambda_s3_attach" {
   policy_arn = aws_iam_policy.lambda_s3.arn
 }
 
+data "aws_iam_policy_document" "metrics_lambda_cache_policy" {
+  statement {
+    effect = "Allow"
+    actions = [
+      "s3:ListBucket"
+    ]
+    resources = [
+      aws_s3_bucket.rail_tracker_cache_bucket.arn
+    ]
+  }
+
+  statement {
+    effect = "Allow"
+    actions = [
+      "s3:GetObject",
+      "s3:PutObject",
+      "s3:DeleteObject"
+    ]
+    resources = [
+      "${aws_s3_bucket.rail_tracker_cache_bucket.arn}/*"
+    ]
+  }
+}
+
+resource "aws_iam_policy" "metrics_lambda_cache" {
+  name   = "c21-railway-tracker-metrics-lambda-cache"
+  policy = data.aws_iam_policy_document.metrics_lambda_cache_policy.json
+}
+
+resource "aws_iam_role_policy_attachment" "metrics_lambda_cache_attach" {
+  role       = aws_iam_role.metrics_lambda_exec_role.name
+  policy_arn = aws_iam_policy.metrics_lambda_cache.arn
+}
+
 ################### Lambda 1: Metrics Pipeline ###################
 
 resource "aws_lambda_function" "metrics" {
   function_name = "c21-railway-tracker-metrics-lambda"
-  role          = aws_iam_role.lambda_exec_role.arn
+  role          = aws_iam_role.metrics_lambda_exec_role.arn
   package_type = "Image"
   image_uri    = var.METRICS_LAMBDA_IMAGE_URI
   timeout     = 300
@@ -75,6 +120,10 @@ resource "aws_lambda_function" "metrics" {
       DB_HOST     = var.DB_HOST
       DB_NAME     = var.DB_NAME
       DB_PORT     = var.DB_PORT
+      CACHE_BUCKET = aws_s3_bucket.rail_tracker_cache_bucket.id
+      STATION_SOURCE = var.METRICS_STATION_SOURCE
+      POLL_SCHEDULE = var.METRICS_POLL_SCHEDULE
+      RTT_DAILY_BUDGET = var.METRICS_DAILY_BUDGET
     }
   }
 }
@@ -38,3 +38,51 @@ resource "aws_s3_bucket_policy" "rail_tracker_archive_bucket_policy" {
 
   depends_on = [aws_s3_bucket_public_access_block.rail_tracker_archive_bucket_block]
 }
+
+################### S3 Cache Bucket ###################
+
+# the metrics pipeline's cache holds raw RTT responses and run state, so it's
+# kept out of the public archive bucket
+resource "aws_s3_bucket" "rail_tracker_cache_bucket" {
+  bucket        = var.CACHE_BUCKET_NAME
+  force_destroy = true
+
+  tags = {
+    Name    = var.CACHE_BUCKET_NAME
+  }
+}
+
+################### S3 Cache Bucket Public Access Block ###################
+
+resource "aws_s3_bucket_public_access_block" "rail_tracker_cache_bucket_block" {
+  bucket = aws_s3_bucket.rail_tracker_cache_bucket.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+################### S3 Cache Bucket Lifecycle ###################
+
+# the service responses, timetables and digests are only read on their run date
+resource "aws_s3_bucket_lifecycle_configuration" "rail_tracker_cache_bucket_lifecycle" {
+  bucket = aws_s3_bucket.rail_tracker_cache_bucket.id
+
+  dynamic "rule" {
+    for_each = ["services", "schedules", "digests"]
+
+    content {
+      id     = "expire-${rule.value}"
+      status = "Enabled"
+
+      filter {
+        prefix = "metrics-cache/${rule.value}/"
+      }
+
+      expiration {
+        days = var.CACHE_EXPIRY_DAYS
+      }
+    }
+  }
+}
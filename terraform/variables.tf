@@ -19,6 +19,15 @@ variable "S3_BUCKET_NAME" {
   type = string
 }
 
+variable "CACHE_BUCKET_NAME" {
+  type = string
+}
+
+variable "CACHE_EXPIRY_DAYS" {
+  type    = number
+  default = 7
+}
+
 
 variable "LISTENER_IMAGE_URI" {
   type = string
@@ -86,3 +95,28 @@ variable "AWS_ECR_REPORT_REPO" {
 variable "SOURCE_EMAIL" {
   type = string
 }
+
+variable "METRICS_SHARD_COUNT" {
+  type    = number
+  default = 1
+}
+
+variable "METRICS_STATION_SOURCE" {
+  type    = string
+  default = "default"
+}
+
+variable "METRICS_SCHEDULE_EXPRESSION" {
+  type    = string
+  default = "cron(0 * * * ? *)"
+}
+
+variable "METRICS_POLL_SCHEDULE" {
+  type    = string
+  default = "hourly"
+}
+
+variable "METRICS_DAILY_BUDGET" {
+  type    = number
+  default = 50000
+}